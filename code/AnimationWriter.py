@@ -0,0 +1,268 @@
+from PIL import Image
+import io
+import numpy as np
+import shutil
+import struct
+import subprocess
+import zlib
+from configurations import *
+
+GIF_TRANSPARENT_INDEX=255 # les 255 autres couleurs de la palette globale sont réservées aux images
+
+def _changedRegion(pixels,previous_pixels):
+    """
+    Déterminer le plus petit rectangle contenant tous les pixels modifiés depuis l'image précédente
+    :param pixels: numpy array (hauteur, largeur, ...) de l'image courante
+    :param previous_pixels: numpy array de l'image précédente, None pour la première image
+    :return: (x0, y0, x1, y1) du rectangle, masque des pixels modifiés dans ce rectangle (None si toute l'image est neuve)
+    """
+    if previous_pixels is None:
+        return (0,0,pixels.shape[1],pixels.shape[0]),None
+    changed=pixels!=previous_pixels
+    if changed.ndim==3:
+        changed=changed.any(axis=2)
+    rows,columns=np.flatnonzero(changed.any(axis=1)),np.flatnonzero(changed.any(axis=0))
+    if len(rows)==0: # image identique : un seul pixel transparent pour conserver la durée de l'image
+        return (0,0,1,1),np.zeros((1,1),dtype=bool)
+    x0,y0,x1,y1=columns[0],rows[0],columns[-1]+1,rows[-1]+1
+    return (x0,y0,x1,y1),changed[y0:y1,x0:x1]
+
+class GIFStreamWriter:
+    """
+    Encoder un GIF image par image : chaque image n'encode que le rectangle modifié depuis la précédente, les pixels
+    inchangés y étant transparents. Seules l'image courante et la précédente sont gardées en mémoire
+    La palette globale est calculée sur la première image et sur les couleurs attendues d'après la configuration
+    (parties emergée et immergée, bords, tirant d'eau), qui apparaissent souvent après la première image ; une image
+    dont les pixels modifiés s'écartent trop de la palette globale reçoit sa propre palette (table de couleurs locale)
+    Les données compressées de chaque image sont produites par Image.save de Pillow (GIF d'une seule image), les blocs
+    du fichier étant écrits ici d'après la spécification GIF89a
+    """
+    def __init__(self,path,duration):
+        """
+        :param path: chemin du fichier GIF
+        :param duration: durée d'affichage de chaque image (ms)
+        """
+        self.file=open(path,'wb')
+        self.duration=duration
+        self.palette=None # numpy array (256,3) de la palette globale
+        self.palette_image=None
+        self.previous_pixels=None
+
+    @staticmethod
+    def getSeedColors():
+        """
+        :return: numpy array (n,3) des couleurs que les images peuvent contenir d'après la configuration : teintes des
+        couleurs configurées (ombrage des facettes), mélangées en proportions variables à une autre de ces couleurs
+        ou au blanc du fond (lissage des bords et des traits)
+        """
+        colors=np.array([[int(color[i:i+2],16) for i in (1,3,5)] for color in dict.fromkeys(GIF_PALETTE_SEED_COLORS)],dtype=np.float64)
+        shades=np.linspace(GIF_PALETTE_DARKEST_SHADE,1,GIF_PALETTE_SEED_SHADES)
+        shaded_colors=(colors[:,np.newaxis,:]*shades[np.newaxis,:,np.newaxis]).reshape(-1,3)
+        mixed_colors=np.concatenate([colors,[[255,255,255]]])
+        mixes=np.linspace(0,1,GIF_PALETTE_SEED_MIXES,endpoint=False)[:,np.newaxis,np.newaxis,np.newaxis]
+        seed_colors=shaded_colors[np.newaxis,:,np.newaxis,:]*(1-mixes)+mixed_colors[np.newaxis,np.newaxis,:,:]*mixes
+        return np.round(seed_colors).reshape(-1,3).astype(np.uint8)
+
+    def _buildPalette(self,image):
+        """
+        Calculer la palette globale sur la première image et sur les couleurs attendues (getSeedColors), ces dernières
+        pesant autant que l'image ; la dernière entrée est réservée à la transparence
+        :param image: première image (mode RGB)
+        """
+        seed_colors=self.getSeedColors()
+        repeats=max(1,image.width*image.height//len(seed_colors))
+        samples=np.concatenate([np.asarray(image).reshape(-1,3),np.repeat(seed_colors,repeats,axis=0)])
+        samples_image=Image.fromarray(samples.reshape(1,-1,3)) if len(samples)<=65535 else Image.fromarray(samples[:len(samples)//256*256].reshape(-1,256,3))
+        palette=np.array(samples_image.quantize(colors=GIF_TRANSPARENT_INDEX,method=Image.MEDIANCUT).getpalette()[:3*GIF_TRANSPARENT_INDEX],dtype=np.uint8).reshape(-1,3)
+        self.palette=np.zeros((256,3),dtype=np.uint8)
+        self.palette[:len(palette)]=palette
+        # l'entrée transparente reprend une couleur de la palette : les pixels qui y sont associés sont ramenés à celle-ci
+        self.palette[GIF_TRANSPARENT_INDEX]=self.palette[0]
+        self.palette_image=Image.new('P',(1,1))
+        self.palette_image.putpalette(self.palette.tobytes())
+
+    def _writeHeader(self,width,height):
+        self.file.write(b'GIF89a'+struct.pack('<HHBBB',width,height,0xf7,0,0)+self.palette.tobytes())
+        self.file.write(b'!\xff\x0bNETSCAPE2.0\x03\x01'+struct.pack('<H',0)+b'\0') # boucle infinie
+
+    def _mapToPalette(self,region):
+        """
+        Associer chaque pixel d'un rectangle à la couleur la plus proche de la palette globale
+        :param region: image du rectangle (mode RGB)
+        :return: numpy array des indices dans la palette globale
+        """
+        indices=np.array(region.quantize(palette=self.palette_image,dither=Image.NONE))
+        indices[indices==GIF_TRANSPARENT_INDEX]=0
+        return indices
+
+    @staticmethod
+    def _encodeImageData(image):
+        """
+        Compresser (LZW) les indices d'une image en mode P avec l'API publique de Pillow : l'image est enregistrée seule
+        dans un GIF en mémoire, dont sont extraites la palette et les données de l'image
+        :param image: image en mode P dont la palette a 256 couleurs
+        :return: octets de la palette, octets des données compressées (taille minimale des codes puis sous-blocs)
+        """
+        output=io.BytesIO()
+        image.save(output,format='GIF',optimize=False,interlace=False) # descripteurs d'images écrits ici sans entrelacement
+        data=output.getvalue()
+        palette_size=3<<((data[10]&7)+1) if data[10]&0x80 else 0
+        palette=data[13:13+palette_size] # palette globale, sauf si l'image a sa propre table
+        position=13+palette_size
+        while data[position]==0x21: # extensions
+            position+=2
+            while data[position]!=0:
+                position+=data[position]+1
+            position+=1
+        flags=data[position+9]
+        position+=10
+        if flags&0x80:
+            palette_size=3<<((flags&7)+1)
+            palette=data[position:position+palette_size]
+            position+=palette_size
+        start=position
+        position+=1
+        while data[position]!=0:
+            position+=data[position]+1
+        return palette,data[start:position+1]
+
+    def addFrame(self,frame):
+        """
+        Encoder et écrire une image
+        :param frame: tuple (largeur, hauteur, octets RGBA)
+        """
+        width,height,pixels=frame
+        pixels=np.frombuffer(pixels,dtype=np.uint8).reshape(height,width,4)[:,:,:3]
+        if self.palette is None:
+            self._buildPalette(Image.fromarray(pixels))
+            self._writeHeader(width,height)
+
+        (x0,y0,x1,y1),changed=_changedRegion(pixels,self.previous_pixels)
+        region=np.ascontiguousarray(pixels[y0:y1,x0:x1])
+        indices=self._mapToPalette(Image.fromarray(region))
+        local_palette=None
+        changed_pixels=region if changed is None else region[changed]
+        if len(changed_pixels)>0 and np.abs(self.palette[indices if changed is None else indices[changed]].astype(np.int16)-changed_pixels).mean()>GIF_LOCAL_PALETTE_THRESHOLD:
+            # couleurs absentes de la palette globale : palette propre au rectangle
+            quantized=Image.fromarray(region).quantize(colors=GIF_TRANSPARENT_INDEX,method=Image.MEDIANCUT)
+            indices=np.array(quantized)
+            local_palette=bytes(quantized.getpalette()[:3*GIF_TRANSPARENT_INDEX]).ljust(768,b'\0')
+        if changed is not None:
+            indices[~changed]=GIF_TRANSPARENT_INDEX
+        region_image=Image.fromarray(indices.astype(np.uint8),'P')
+        region_image.putpalette(local_palette if local_palette is not None else self.palette.tobytes())
+        palette,image_data=self._encodeImageData(region_image)
+
+        # extension de contrôle graphique : disposition 1 (image conservée), durée en centièmes de seconde, transparence
+        self.file.write(b'!\xf9\x04'+struct.pack('<BHBB',(1<<2)|(changed is not None),int(round(self.duration/10)),GIF_TRANSPARENT_INDEX,0))
+        if local_palette is None:
+            self.file.write(b','+struct.pack('<HHHHB',int(x0),int(y0),int(x1-x0),int(y1-y0),0))
+        else:
+            self.file.write(b','+struct.pack('<HHHHB',int(x0),int(y0),int(x1-x0),int(y1-y0),0x80|((len(palette)//3).bit_length()-2))+palette)
+        self.file.write(image_data)
+        self.previous_pixels=pixels
+
+    def close(self):
+        self.file.write(b';')
+        self.file.close()
+
+class APNGStreamWriter:
+    """
+    Encoder un PNG animé image par image, sans perte de couleurs : chaque image n'encode que le rectangle modifié depuis
+    la précédente ; le nombre d'images, inconnu au départ, est réécrit dans l'en-tête à la fermeture
+    """
+    def __init__(self,path,duration):
+        """
+        :param path: chemin du fichier PNG
+        :param duration: durée d'affichage de chaque image (ms)
+        """
+        self.file=open(path,'wb')
+        self.duration=duration
+        self.sequence_number=0
+        self.frames_number=0
+        self.animation_control_offset=None
+        self.previous_pixels=None
+
+    def _writeChunk(self,chunk_type,data):
+        self.file.write(struct.pack('>I',len(data))+chunk_type+data+struct.pack('>I',zlib.crc32(chunk_type+data)&0xffffffff))
+
+    def addFrame(self,frame):
+        """
+        Encoder et écrire une image
+        :param frame: tuple (largeur, hauteur, octets RGBA)
+        """
+        width,height,pixels=frame
+        pixels=np.frombuffer(pixels,dtype=np.uint8).reshape(height,width,4)
+        if self.previous_pixels is None:
+            self.file.write(b'\x89PNG\r\n\x1a\n')
+            self._writeChunk(b'IHDR',struct.pack('>IIBBBBB',width,height,8,6,0,0,0))
+            self.animation_control_offset=self.file.tell()
+            self._writeChunk(b'acTL',struct.pack('>II',0,0))
+
+        (x0,y0,x1,y1),changed=_changedRegion(pixels,self.previous_pixels)
+        region=pixels[y0:y1,x0:x1]
+        self._writeChunk(b'fcTL',struct.pack('>IIIIIHHBB',self.sequence_number,x1-x0,y1-y0,x0,y0,self.duration,1000,0,0))
+        self.sequence_number+=1
+        # filtre PNG 0 (aucun) en tête de chaque ligne
+        scanlines=np.concatenate([np.zeros((y1-y0,1),dtype=np.uint8),region.reshape(y1-y0,-1)],axis=1)
+        data=zlib.compress(scanlines.tobytes())
+        if self.previous_pixels is None:
+            self._writeChunk(b'IDAT',data)
+        else:
+            self._writeChunk(b'fdAT',struct.pack('>I',self.sequence_number)+data)
+            self.sequence_number+=1
+        self.frames_number+=1
+        self.previous_pixels=pixels
+
+    def close(self):
+        self._writeChunk(b'IEND',b'')
+        if self.animation_control_offset is not None:
+            self.file.seek(self.animation_control_offset)
+            self._writeChunk(b'acTL',struct.pack('>II',self.frames_number,0))
+        self.file.close()
+
+class FFmpegStreamWriter:
+    """
+    Encoder une vidéo (MP4, WebM...) en envoyant les images brutes une à une au programme ffmpeg
+    """
+    def __init__(self,path,duration):
+        """
+        :param path: chemin du fichier vidéo, dont l'extension détermine le format
+        :param duration: durée d'affichage de chaque image (ms)
+        """
+        self.path=path
+        self.duration=duration
+        self.process=None
+
+    def addFrame(self,frame):
+        """
+        Envoyer une image à ffmpeg
+        :param frame: tuple (largeur, hauteur, octets RGBA)
+        """
+        width,height,pixels=frame
+        if self.process is None:
+            self.process=subprocess.Popen([shutil.which('ffmpeg'),'-y','-loglevel','error',
+                                           '-f','rawvideo','-pix_fmt','rgba','-s',str(width)+'x'+str(height),'-framerate',str(1000/self.duration),'-i','-',
+                                           '-vf','pad=ceil(iw/2)*2:ceil(ih/2)*2','-pix_fmt','yuv420p',self.path],stdin=subprocess.PIPE)
+        self.process.stdin.write(pixels)
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+
+def openAnimationWriter(path,animation_format,duration):
+    """
+    Créer l'encodeur correspondant au format d'animation
+    :param path: chemin du fichier, sans extension
+    :param animation_format: 'gif', 'apng', 'mp4' ou 'webm'
+    :param duration: durée d'affichage de chaque image (ms)
+    :return: l'encodeur et le chemin complet du fichier, ou (None, None) si le format n'est pas disponible
+    """
+    if animation_format=='gif':
+        return GIFStreamWriter(path+'.gif',duration),path+'.gif'
+    if animation_format=='apng':
+        return APNGStreamWriter(path+'.png',duration),path+'.png'
+    if animation_format in ['mp4','webm'] and shutil.which('ffmpeg') is not None:
+        return FFmpegStreamWriter(path+'.'+animation_format,duration),path+'.'+animation_format
+    return None,None
@@ -0,0 +1,360 @@
+import argparse
+import csv
+import json
+import logging
+import math
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import sys
+
+from ModelCache import *
+from Profiler import *
+from STLModel import *
+from STLModelEquilibrium import *
+from STLModelHydrostatics import *
+from STLModelPressure import *
+from configurations import *
+
+BATCH_LOGGING_LEVELS={TERMINAL_VERBOSITY_ERRORS:logging.ERROR,TERMINAL_VERBOSITY_PROCESSES:logging.INFO,TERMINAL_VERBOSITY_DETAILS:logging.DEBUG}
+BATCH_RESULTS_FIELDS=['stl_file','object_mass','fluid_density','draught_solver','draught','iterations','displaced_volume','buoyancy']
+BATCH_EQUILIBRIUM_FIELDS=['equilibrium_draught','heel','trim'] # ajoutés quand le centre de gravité est donné
+BATCH_GZ_CURVE_FIELDS=['stl_file','object_mass','fluid_density','heel','righting_lever','draught','displaced_volume']
+BATCH_HYDROSTATICS_FIELDS=['stl_file','fluid_density']+HYDROSTATICS_FIELDS
+
+class BatchTerminal:
+    """
+    Remplacer le widget Terminal hors interface graphique : les messages sont transmis au module logging
+    """
+    def __init__(self,logger_name='Ship_Model'):
+        self.logger=logging.getLogger(logger_name)
+
+    def setVerbosity(self,verbosity):
+        self.logger.setLevel(BATCH_LOGGING_LEVELS[verbosity])
+
+    def isVerbose(self,verbosity):
+        return self.logger.isEnabledFor(BATCH_LOGGING_LEVELS[verbosity])
+
+    def addErrorMessage(self,error_message):
+        self.logger.error(error_message.strip())
+
+    def addSuccessMessage(self,success_message):
+        self.logger.info(success_message.strip())
+
+    def addProcessMessage(self,process_message):
+        self.logger.info(process_message.strip())
+
+    def addSubProcessMessage(self, sub_process_message):
+        self.logger.debug(sub_process_message.strip())
+
+    def addInformativeMessage(self,informative_message):
+        self.logger.debug(informative_message.strip())
+
+def compute_draughts(filepath,masses,fluid_densities,dichotomy_precision=DEFAULT_DICHOTOMY_PRECISION,draught_solver=DEFAULT_DRAUGHT_SOLVER,term=None,cache=None,gravity_centre=None):
+    """
+    Charger un fichier STL une seule fois et calculer le tirant d'eau pour chaque couple (masse, densité du fluide)
+    :param filepath: chemin du fichier STL
+    :param masses: liste des masses de l'objet (kg)
+    :param fluid_densities: liste des densités du fluide (kg/m3)
+    :param dichotomy_precision: précision souhaitée sur le tirant d'eau
+    :param draught_solver: méthode de résolution ('newton' ou 'dichotomy')
+    :param term: terminal recevant les messages (BatchTerminal par défaut)
+    :param cache: objet ModelCache où le maillage est recherché avant de lire le fichier
+    :param gravity_centre: centre de gravité (x, y, z) dans le repère du fichier STL, pour calculer aussi gîte et assiette
+    :return: liste de dictionnaires de résultats, un par couple (masse, densité du fluide)
+    """
+    term=term if term is not None else BatchTerminal()
+    stl_model=STLModel(filepath,term,cache=cache)
+    if stl_model.facets_number==0:
+        return []
+    initial_bottom_ref=stl_model.bottom_ref
+    stl_model_pressure=STLModelPressure(stl_model,term)
+    stl_model_pressure.setDraughtSolver(draught_solver)
+    if gravity_centre is not None:
+        stl_model_equilibrium=STLModelEquilibrium(stl_model_pressure,term)
+        stl_model_equilibrium.setGravityCentre(gravity_centre)
+
+    results=[]
+    for fluid_density in fluid_densities:
+        stl_model_pressure.setFluidDensity(fluid_density)
+        for mass in masses:
+            if stl_model.bottom_ref!=initial_bottom_ref: # seule la dichotomie déplace le modèle
+                stl_model.translateZ(initial_bottom_ref-stl_model.bottom_ref)
+            stl_model_pressure.reset_draught_range()
+            stl_model.setMass(mass)
+            draughts=stl_model_pressure.solve_draught(dichotomy_precision)
+            draught=draughts[-1] if draughts else 0
+            displaced_volume=stl_model_pressure.calc_displaced_volume(draught)[0]
+            results.append({
+                'stl_file':filepath,
+                'object_mass':mass,
+                'fluid_density':fluid_density,
+                'draught_solver':draught_solver,
+                'draught':draught,
+                'iterations':len(draughts),
+                'displaced_volume':displaced_volume,
+                'buoyancy':fluid_density*GRAVITY*displaced_volume
+            })
+            if gravity_centre is not None:
+                positions=stl_model_equilibrium.solve_equilibrium()
+                results[-1].update(zip(BATCH_EQUILIBRIUM_FIELDS,positions[-1] if positions else ['','','']))
+    return results
+
+_sweep_worker=None # état propre à chaque processus de calcul : mémoires partagées, modèle et calcul de pression
+
+def _init_sweep_worker(filepath,memories_description,draught_solver):
+    """
+    Initialiser un processus de calcul : rattacher le maillage indexé en mémoire partagée et préparer le modèle
+    :param filepath: chemin du fichier STL (uniquement informatif, le fichier n'est pas relu)
+    :param memories_description: liste des (nom du bloc de mémoire partagée, forme, type) de la table des sommets, des
+    indices des triangles et des normales
+    :param draught_solver: méthode de résolution ('newton' ou 'dichotomy')
+    """
+    global _sweep_worker
+    memories=[shared_memory.SharedMemory(name=name) for name,shape,dtype in memories_description]
+    # jamais modifié, même par la dichotomie qui ne change que le décalage vertical du modèle
+    mesh_data=[np.ndarray(shape,dtype=dtype,buffer=memory.buf) for memory,(name,shape,dtype) in zip(memories,memories_description)]
+
+    term=BatchTerminal()
+    stl_model=STLModel(filepath,term,mesh_data)
+    stl_model_pressure=STLModelPressure(stl_model,term)
+    stl_model_pressure.setDraughtSolver(draught_solver)
+    _sweep_worker=(memories,stl_model,stl_model_pressure,stl_model.bottom_ref)
+
+def _solve_sweep_point(parameters):
+    """
+    Calculer dans un processus de calcul le tirant d'eau pour un couple (masse, densité du fluide)
+    :param parameters: tuple (masse, densité du fluide, précision)
+    :return: dictionnaire de résultats
+    """
+    mass,fluid_density,dichotomy_precision=parameters
+    stl_model,stl_model_pressure,initial_bottom_ref=_sweep_worker[1:]
+    if stl_model.bottom_ref!=initial_bottom_ref: # seule la dichotomie déplace le modèle
+        stl_model.translateZ(initial_bottom_ref-stl_model.bottom_ref)
+    stl_model_pressure.reset_draught_range()
+    stl_model.setMass(mass)
+    stl_model_pressure.setFluidDensity(fluid_density)
+    draughts=stl_model_pressure.solve_draught(dichotomy_precision)
+    draught=draughts[-1] if draughts else 0
+    displaced_volume=stl_model_pressure.calc_displaced_volume(draught)[0]
+    return {
+        'stl_file':stl_model.filepath,
+        'object_mass':mass,
+        'fluid_density':fluid_density,
+        'draught_solver':stl_model_pressure.draught_solver,
+        'draught':draught,
+        'iterations':len(draughts),
+        'displaced_volume':displaced_volume,
+        'buoyancy':fluid_density*GRAVITY*displaced_volume
+    }
+
+def sweep_draughts(filepath,masses,fluid_densities,dichotomy_precision=DEFAULT_DICHOTOMY_PRECISION,draught_solver=DEFAULT_DRAUGHT_SOLVER,processes=None,term=None,cache=None):
+    """
+    Calculer le tableau hydrostatique (tirant d'eau, volume déplacé, poussée) sur la grille masses x densités en
+    répartissant les couples sur un groupe de processus qui partagent le maillage indexé du modèle, chargé une seule fois
+    :param filepath: chemin du fichier STL
+    :param masses: liste des masses de l'objet (kg)
+    :param fluid_densities: liste des densités du fluide (kg/m3)
+    :param dichotomy_precision: précision souhaitée sur le tirant d'eau
+    :param draught_solver: méthode de résolution ('newton' ou 'dichotomy')
+    :param processes: nombre de processus (nombre de coeurs par défaut)
+    :param term: terminal recevant les messages (BatchTerminal par défaut)
+    :param cache: objet ModelCache où le maillage est recherché avant de lire le fichier
+    :return: liste de dictionnaires de résultats, dans le même ordre que compute_draughts
+    """
+    term=term if term is not None else BatchTerminal()
+    stl_model=STLModel(filepath,term,cache=cache)
+    if stl_model.facets_number==0:
+        return []
+    grid=[(mass,fluid_density,dichotomy_precision) for fluid_density in fluid_densities for mass in masses]
+    processes=min(processes if processes is not None else multiprocessing.cpu_count(),len(grid))
+
+    term.addProcessMessage('Sharing the 3d model with '+str(processes)+' processes')
+    mesh_data=[stl_model.vertices,stl_model.triangles,stl_model.facet_normal]
+    memories=[shared_memory.SharedMemory(create=True,size=max(1,array.nbytes)) for array in mesh_data]
+    try:
+        for memory,array in zip(memories,mesh_data):
+            np.ndarray(array.shape,dtype=array.dtype,buffer=memory.buf)[:]=array
+        memories_description=[(memory.name,array.shape,array.dtype.str) for memory,array in zip(memories,mesh_data)]
+        del stl_model,mesh_data
+
+        with multiprocessing.Pool(processes,initializer=_init_sweep_worker,initargs=(filepath,memories_description,draught_solver)) as pool:
+            results=pool.map(_solve_sweep_point,grid,chunksize=max(1,math.ceil(len(grid)/(4*processes))))
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+    term.addSuccessMessage('Sweep over '+str(len(grid))+' parameters complete')
+    return results
+
+def compute_GZ_curves(filepath,masses,fluid_densities,gravity_centre=None,heels=None,processes=GZ_CURVE_PROCESSES,save_graphs=False,term=None,cache=None):
+    """
+    Charger un fichier STL une seule fois et calculer la courbe de stabilité pour chaque couple (masse, densité du fluide)
+    :param filepath: chemin du fichier STL
+    :param masses: liste des masses de l'objet (kg)
+    :param fluid_densities: liste des densités du fluide (kg/m3)
+    :param gravity_centre: centre de gravité (x, y, z) dans le repère du fichier STL (centre du volume par défaut)
+    :param heels: liste des gîtes en degrés (de 0 à GZ_CURVE_MAX_HEEL par pas de GZ_CURVE_HEEL_STEP par défaut)
+    :param processes: nombre de processus se partageant les gîtes (0 pour tous les coeurs, 1 pour un calcul sans processus)
+    :param save_graphs: enregistrer aussi le graphique de chaque courbe dans GZ_GRAPHS_FOLDER (nécessite matplotlib)
+    :param term: terminal recevant les messages (BatchTerminal par défaut)
+    :param cache: objet ModelCache où le maillage est recherché avant de lire le fichier
+    :return: liste de dictionnaires de résultats, un par gîte et par couple (masse, densité du fluide)
+    """
+    term=term if term is not None else BatchTerminal()
+    stl_model=STLModel(filepath,term,cache=cache)
+    if stl_model.facets_number==0:
+        return []
+    stl_model_pressure=STLModelPressure(stl_model,term)
+    stl_model_equilibrium=STLModelEquilibrium(stl_model_pressure,term,gravity_centre)
+    if save_graphs:
+        from STLModelDisplay import STLModelDisplay # import local : matplotlib n'est nécessaire que pour les graphiques
+        stl_model_display=STLModelDisplay(stl_model,term)
+
+    results=[]
+    for fluid_density in fluid_densities:
+        stl_model_pressure.setFluidDensity(fluid_density)
+        for mass in masses:
+            stl_model.setMass(mass)
+            curve=stl_model_equilibrium.calc_GZ_curve(heels,processes=processes)
+            for heel,righting_lever,draught,displaced_volume in curve:
+                results.append({
+                    'stl_file':filepath,
+                    'object_mass':mass,
+                    'fluid_density':fluid_density,
+                    'heel':heel,
+                    'righting_lever':righting_lever,
+                    'draught':draught,
+                    'displaced_volume':displaced_volume
+                })
+            if save_graphs and curve:
+                filename=os.path.splitext(os.path.basename(filepath))[0]+'_GZ_'+str(mass)+'kg_'+str(fluid_density)+'kgm3'
+                stl_model_display.saveGZGraph(filename,[point[0] for point in curve],[point[1] for point in curve])
+    return results
+
+def compute_hydrostatics(filepath,fluid_densities,draughts=None,levels_number=HYDROSTATICS_LEVELS,save_graphs=False,term=None,cache=None):
+    """
+    Charger un fichier STL une seule fois et calculer le tableau hydrostatique pour chaque densité du fluide ; les
+    intégrales ne dépendant que de la géométrie, elles ne sont calculées qu'une fois
+    :param filepath: chemin du fichier STL
+    :param fluid_densities: liste des densités du fluide (kg/m3)
+    :param draughts: liste des tirants d'eau (levels_number niveaux jusqu'à la hauteur du modèle par défaut)
+    :param levels_number: nombre de tirants d'eau si draughts n'est pas donné
+    :param save_graphs: enregistrer aussi les courbes hydrostatiques dans HYDROSTATICS_GRAPHS_FOLDER (nécessite matplotlib)
+    :param term: terminal recevant les messages (BatchTerminal par défaut)
+    :param cache: objet ModelCache où le maillage et les intégrales sont recherchés avant d'être calculés
+    :return: liste de dictionnaires de résultats, un par tirant d'eau et par densité du fluide
+    """
+    term=term if term is not None else BatchTerminal()
+    stl_model=STLModel(filepath,term,cache=cache)
+    if stl_model.facets_number==0:
+        return []
+    stl_model_pressure=STLModelPressure(stl_model,term)
+    stl_model_hydrostatics=STLModelHydrostatics(stl_model_pressure,term)
+    if draughts is None:
+        draughts=stl_model_hydrostatics.get_default_draughts(levels_number)
+    if save_graphs:
+        from STLModelDisplay import STLModelDisplay # import local : matplotlib n'est nécessaire que pour les graphiques
+        stl_model_display=STLModelDisplay(stl_model,term)
+
+    results=[]
+    for fluid_density in fluid_densities:
+        stl_model_pressure.setFluidDensity(fluid_density)
+        table=stl_model_hydrostatics.calc_hydrostatics_table(draughts,cache)
+        for i in range(len(table['draught'])):
+            result={'stl_file':filepath,'fluid_density':fluid_density}
+            result.update({field:float(table[field][i]) for field in HYDROSTATICS_FIELDS})
+            results.append(result)
+        if save_graphs:
+            filename=os.path.splitext(os.path.basename(filepath))[0]+'_hydrostatics_'+str(fluid_density)+'kgm3'
+            stl_model_display.saveHydrostaticsGraph(filename,table)
+    return results
+
+def write_results(results,output,output_format):
+    """
+    Écrire les résultats au format CSV ou JSON
+    :param results: liste de dictionnaires de résultats
+    :param output: fichier ouvert en écriture
+    :param output_format: 'csv' ou 'json'
+    """
+    if output_format=='json':
+        json.dump(results,output,indent=4)
+        output.write('\n')
+    else:
+        if any('righting_lever' in result for result in results):
+            fieldnames=BATCH_GZ_CURVE_FIELDS
+        elif any('waterplane_area' in result for result in results):
+            fieldnames=BATCH_HYDROSTATICS_FIELDS
+        else:
+            fieldnames=BATCH_RESULTS_FIELDS+(BATCH_EQUILIBRIUM_FIELDS if any('heel' in result for result in results) else [])
+        writer=csv.DictWriter(output,fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
+
+def main(arguments=None):
+    """
+    Point d'entrée en ligne de commande : calculer les tirants d'eau sans interface graphique
+    :param arguments: liste des arguments (sys.argv[1:] par défaut)
+    :return: code de retour du programme
+    """
+    parser=argparse.ArgumentParser(description='Compute the draught of STL models without the graphical interface')
+    parser.add_argument('stl_files',nargs='+',help='STL files (ascii or binary)')
+    parser.add_argument('-m','--mass',type=float,nargs='+',default=[DEFAULT_OBJECT_MASS],help='object masses (kg)')
+    parser.add_argument('-d','--density',type=float,nargs='+',default=[DEFAULT_FLUID_DENSITY],help='fluid densities (kg/m3)')
+    parser.add_argument('-p','--precision',type=float,default=DEFAULT_DICHOTOMY_PRECISION,help='precision on the draught (m)')
+    parser.add_argument('-s','--solver',choices=DRAUGHT_SOLVERS,default=DEFAULT_DRAUGHT_SOLVER,help='draught solver')
+    parser.add_argument('-j','--processes',type=int,default=1,help='number of processes sharing the mass x density grid, or the heel angles of a GZ curve (0 for every core)')
+    parser.add_argument('-o','--output',help='output file (standard output by default)')
+    parser.add_argument('-f','--format',choices=['csv','json'],help='output format (deduced from the output file extension, csv by default)')
+    parser.add_argument('-g','--gravity-centre',type=float,nargs=3,metavar=('X','Y','Z'),help='centre of gravity in the STL file frame, to also compute heel and trim (single process only)')
+    parser.add_argument('-z','--gz-curve',action='store_true',help='compute the righting lever curve instead of the draught (centre of gravity given by -g, volume centre by default)')
+    parser.add_argument('--max-heel',type=float,default=GZ_CURVE_MAX_HEEL,help='largest heel angle of the GZ curve (degrees)')
+    parser.add_argument('--heel-step',type=float,default=GZ_CURVE_HEEL_STEP,help='heel angle step of the GZ curve (degrees)')
+    parser.add_argument('--gz-graph',action='store_true',help='also save the graph of each GZ curve in \''+GZ_GRAPHS_FOLDER+'\' (requires matplotlib)')
+    parser.add_argument('-y','--hydrostatics',action='store_true',help='compute the hydrostatic table of the upright model instead of the draught (one row per draught and fluid density)')
+    parser.add_argument('--levels',type=int,default=HYDROSTATICS_LEVELS,help='number of draughts of the hydrostatic table, evenly spaced up to the model height')
+    parser.add_argument('--max-draught',type=float,help='largest draught of the hydrostatic table (m, model height by default)')
+    parser.add_argument('--hydrostatics-graph',action='store_true',help='also save the hydrostatic curves in \''+HYDROSTATICS_GRAPHS_FOLDER+'\' (requires matplotlib)')
+    parser.add_argument('-c','--cache',action='store_true',help='reuse the meshes extracted by previous runs (cache folder \''+MODEL_CACHE_FOLDER+'\')')
+    parser.add_argument('--profile',metavar='TRACE',help='measure every stage, save the Chrome trace (JSON) in TRACE and print a summary on the error output')
+    parser.add_argument('-v','--verbose',action='count',default=0,help='show the running process (-vv for every step)')
+    arguments=parser.parse_args(arguments)
+
+    logging.basicConfig(format='%(levelname)s %(message)s',level=[logging.WARNING,logging.INFO,logging.DEBUG][min(arguments.verbose,2)])
+    output_format=arguments.format
+    if output_format is None:
+        output_format='json' if arguments.output is not None and arguments.output.lower().endswith('.json') else 'csv'
+
+    if arguments.profile is not None:
+        profiler.enable()
+        profiler.reset()
+    cache=ModelCache() if arguments.cache else None
+    results=[]
+    for stl_file in arguments.stl_files:
+        if arguments.hydrostatics:
+            draughts=np.linspace(0,arguments.max_draught,arguments.levels+1)[1:] if arguments.max_draught is not None else None
+            stl_results=compute_hydrostatics(stl_file,arguments.density,draughts,arguments.levels,arguments.hydrostatics_graph,cache=cache)
+        elif arguments.gz_curve:
+            heels=np.arange(0,arguments.max_heel+arguments.heel_step/2,arguments.heel_step)
+            stl_results=compute_GZ_curves(stl_file,arguments.mass,arguments.density,arguments.gravity_centre,heels,arguments.processes,arguments.gz_graph,cache=cache)
+        elif arguments.processes==1 or arguments.gravity_centre is not None:
+            stl_results=compute_draughts(stl_file,arguments.mass,arguments.density,arguments.precision,arguments.solver,cache=cache,gravity_centre=arguments.gravity_centre)
+        else:
+            stl_results=sweep_draughts(stl_file,arguments.mass,arguments.density,arguments.precision,arguments.solver,arguments.processes if arguments.processes>0 else None,cache=cache)
+        if len(stl_results)==0:
+            logging.getLogger('Ship_Model').error('No result for \''+stl_file+'\'')
+        results+=stl_results
+
+    if arguments.output is None:
+        write_results(results,sys.stdout,output_format)
+    else:
+        with open(arguments.output,'w',newline='') as output:
+            write_results(results,output,output_format)
+    if arguments.profile is not None:
+        # les étapes exécutées dans les processus de calcul (-j) ne sont pas mesurées
+        profiler.exportTrace(arguments.profile)
+        sys.stderr.write('\n'.join(profiler.getSummary())+'\n')
+    return 0 if len(results)>0 else 1
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from Batch import BatchTerminal
+from HullGenerator import *
+from STLModel import *
+from STLModelDisplay import *
+from STLModelPressure import *
+from configurations import *
+
+BENCHMARK_STAGES=['write','load','clip_first','clip','prepare_volume_function','force_first','force','solve','render_first','render']
+
+def get_commit():
+    """
+    :return: identifiant court du commit courant suivi de '+' si l'arbre de travail est modifié, '' hors d'un dépôt git
+    """
+    try:
+        commit=subprocess.run(['git','rev-parse','--short','HEAD'],capture_output=True,text=True,check=True).stdout.strip()
+        modified=subprocess.run(['git','status','--porcelain','--untracked-files=no'],capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return ''
+    return commit+('+' if modified else '')
+
+def measure(function,repeat):
+    """
+    Mesurer la durée d'une fonction, en gardant la meilleure de plusieurs exécutions
+    :param function: fonction sans paramètre
+    :param repeat: nombre d'exécutions
+    :return: durée minimale (s), résultat de la dernière exécution
+    """
+    best_duration=float('inf')
+    for i in range(repeat):
+        start=time.perf_counter()
+        result=function()
+        best_duration=min(best_duration,time.perf_counter()-start)
+    return best_duration,result
+
+def benchmark_case(shape,facets_number,stl_format,repeat=1,render_max_facets=BENCHMARK_RENDER_MAX_FACETS,regenerate=False,term=None):
+    """
+    Générer (ou relire) une coque, mesurer chaque étape du calcul et comparer les volumes aux valeurs analytiques
+    Les étapes '_first' comprennent les précalculs faits au premier appel (index des altitudes, sommes cumulées, figure)
+    :param shape: nom de la forme (clé de HULL_GENERATORS)
+    :param facets_number: nombre de facettes visé
+    :param stl_format: 'ascii' ou 'binary'
+    :param repeat: nombre d'exécutions des étapes répétables, la meilleure durée est gardée
+    :param render_max_facets: nombre de facettes au delà duquel le rendu n'est pas mesuré
+    :param regenerate: réécrire le fichier STL même s'il existe déjà
+    :param term: terminal recevant les messages (BatchTerminal par défaut)
+    :return: dictionnaire de résultats
+    """
+    term=term if term is not None else BatchTerminal()
+    hull=HULL_GENERATORS[shape](facets_number)
+    filepath=BENCHMARK_MESHES_FOLDER+shape+'_'+str(facets_number)+'_'+stl_format+'.stl'
+    timings={}
+    if regenerate or not os.path.isfile(filepath):
+        os.makedirs(BENCHMARK_MESHES_FOLDER,exist_ok=True)
+        timings['write']=measure(lambda:hull.writeSTL(filepath,stl_format),1)[0]
+
+    timings['load'],stl_model=measure(lambda:STLModel(filepath,term),repeat)
+    draught=BENCHMARK_DRAUGHT_RATIO*hull.height
+    other_draught=0.9*draught
+
+    stl_model.setDraught(draught)
+    timings['clip_first']=measure(stl_model.sort_facets,1)[0]
+    def clip():
+        for level in [other_draught,draught]:
+            stl_model.setDraught(level)
+            stl_model.sort_facets()
+    timings['clip']=measure(clip,repeat)[0]/2
+
+    timings['prepare_volume_function'],stl_model_pressure=measure(lambda:STLModelPressure(stl_model,term),1)
+    timings['force_first'],force=measure(stl_model_pressure.calc_Archimedes_push,1)
+    timings['force']=measure(stl_model_pressure.calc_Archimedes_push,repeat)[0]
+    expected_volume=float(hull.displaced_volume(draught))
+    volume=float(force[2])/(stl_model_pressure.fluid_density*GRAVITY)
+    function_volume=float(stl_model_pressure.calc_displaced_volume(draught)[0])
+
+    # résolution complète pour la masse qui donne analytiquement le tirant d'eau des mesures, sans volumes mémorisés
+    stl_model.setMass(stl_model_pressure.fluid_density*expected_volume)
+    solve_precision=DEFAULT_DICHOTOMY_PRECISION*1e-3
+    solvers=[STLModelPressure(stl_model,term) for i in range(repeat)]
+    timings['solve'],draughts=measure(lambda:solvers.pop().solve_draught(solve_precision),repeat)
+
+    if stl_model.facets_number<=render_max_facets:
+        stl_model.setDraught(draught)
+        stl_model_display=STLModelDisplay(stl_model,term)
+        timings['render_first']=measure(lambda:stl_model_display.renderSTLModelGraph(True),1)[0]
+        timings['render']=measure(lambda:stl_model_display.renderSTLModelGraph(True),repeat)[0]
+
+    volume_error=abs(volume/expected_volume-1)
+    function_volume_error=abs(function_volume/expected_volume-1)
+    # l'écart de volume du maillage déplace l'équilibre de cet écart divisé par la surface de flottaison (dV/dz exact)
+    waterplane_area=float(hull.displaced_volume(1.001*draught)-hull.displaced_volume(0.999*draught))/(0.002*draught)
+    draught_error=float(abs(draughts[-1]-draught)/hull.height)
+    draught_tolerance=(hull.tolerance*expected_volume/waterplane_area+solve_precision)/hull.height
+    return {
+        'shape':shape,
+        'facets_number':stl_model.facets_number,
+        'format':stl_format,
+        'file_size':os.path.getsize(filepath),
+        'timings':timings,
+        'expected_volume':expected_volume,
+        'volume_error':volume_error,
+        'volume_function_error':function_volume_error,
+        'draught_error':draught_error,
+        'tolerance':float(hull.tolerance),
+        'draught_tolerance':draught_tolerance,
+        'passed':bool(volume_error<=hull.tolerance and function_volume_error<=hull.tolerance and draught_error<=draught_tolerance)
+    }
+
+def run_benchmarks(shapes,sizes,stl_formats,repeat=1,render_max_facets=BENCHMARK_RENDER_MAX_FACETS,regenerate=False,term=None):
+    """
+    Mesurer toutes les combinaisons forme x taille x format
+    :return: dictionnaire de l'exécution (date, commit, versions, machine, liste des résultats)
+    """
+    cases=[]
+    for shape in shapes:
+        for facets_number in sizes:
+            for stl_format in stl_formats:
+                case=benchmark_case(shape,facets_number,stl_format,repeat,render_max_facets,regenerate,term)
+                print_case(case)
+                cases.append(case)
+    return {
+        'date':datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit':get_commit(),
+        'python':platform.python_version(),
+        'numpy':np.__version__,
+        'machine':platform.platform()+' '+platform.processor(),
+        'repeat':repeat,
+        'cases':cases
+    }
+
+def print_case(case):
+    stages=' '.join(stage+' '+format(case['timings'][stage]*1000,'.1f') for stage in BENCHMARK_STAGES if stage in case['timings'])
+    print('{:<9}{:>9} {:<7}{:<6} {} (ms) volume error {:.1e} / {:.1e} draught error {:.1e} / {:.1e}'.format(case['shape'],case['facets_number'],case['format'],'ok' if case['passed'] else 'FAIL',stages,case['volume_error'],case['tolerance'],case['draught_error'],case['draught_tolerance']))
+
+def record_run(run,results_file=BENCHMARK_RESULTS_FILE):
+    """
+    Ajouter une exécution au fichier des résultats
+    """
+    folder=os.path.dirname(results_file)
+    if folder:
+        os.makedirs(folder,exist_ok=True)
+    with open(results_file,'a') as file:
+        file.write(json.dumps(run)+'\n')
+
+def load_runs(results_file=BENCHMARK_RESULTS_FILE):
+    """
+    :return: liste des exécutions enregistrées, de la plus ancienne à la plus récente
+    """
+    if not os.path.isfile(results_file):
+        return []
+    with open(results_file) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def compare_runs(run,reference_run):
+    """
+    Afficher les durées d'une exécution rapportées à celles d'une exécution de référence, pour les cas communs
+    :return: nombre d'étapes ralenties de plus de BENCHMARK_REGRESSION_THRESHOLD
+    """
+    print('Comparison with '+(reference_run['commit'] or 'unknown commit')+' ('+reference_run['date']+')')
+    reference_cases={(case['shape'],case['facets_number'],case['format']):case for case in reference_run['cases']}
+    regressions=0
+    for case in run['cases']:
+        reference_case=reference_cases.get((case['shape'],case['facets_number'],case['format']))
+        if reference_case is None:
+            continue
+        for stage in BENCHMARK_STAGES:
+            if stage=='write' or stage not in case['timings'] or stage not in reference_case['timings']:
+                continue
+            ratio=case['timings'][stage]/max(reference_case['timings'][stage],1e-9)
+            slower=ratio>1+BENCHMARK_REGRESSION_THRESHOLD
+            regressions+=slower
+            print('{:<9}{:>9} {:<7}{:<24}{:>10.1f}{:>10.1f} ms  x{:.2f}{}'.format(case['shape'],case['facets_number'],case['format'],stage,
+                  reference_case['timings'][stage]*1000,case['timings'][stage]*1000,ratio,'  <<' if slower else ''))
+    return regressions
+
+def main(arguments=None):
+    """
+    Point d'entrée en ligne de commande : mesurer les performances sur des coques générées
+    :param arguments: liste des arguments (sys.argv[1:] par défaut)
+    :return: code de retour du programme (1 si un volume s'écarte de la valeur analytique)
+    """
+    parser=argparse.ArgumentParser(description='Benchmark the draught computation on generated hulls with known displaced volumes')
+    parser.add_argument('-s','--shapes',nargs='+',choices=list(HULL_GENERATORS),default=list(HULL_GENERATORS),help='hull shapes')
+    parser.add_argument('-n','--sizes',type=int,nargs='+',default=BENCHMARK_SIZES,help='numbers of facets (approximate)')
+    parser.add_argument('-f','--formats',nargs='+',choices=['ascii','binary'],default=['ascii','binary'],help='STL formats')
+    parser.add_argument('-r','--repeat',type=int,default=3,help='runs of each repeatable stage, the best time is kept')
+    parser.add_argument('--render-max',type=int,default=BENCHMARK_RENDER_MAX_FACETS,help='largest model whose rendering is measured')
+    parser.add_argument('--regenerate',action='store_true',help='write the STL files even if they already exist')
+    parser.add_argument('--no-record',action='store_true',help='do not append the run to \''+BENCHMARK_RESULTS_FILE+'\'')
+    parser.add_argument('-c','--compare',nargs='?',const='previous',metavar='COMMIT',help='compare with the last recorded run of a commit (previous run by default)')
+    arguments=parser.parse_args(arguments)
+
+    previous_runs=load_runs()
+    run=run_benchmarks(arguments.shapes,arguments.sizes,arguments.formats,max(1,arguments.repeat),arguments.render_max,arguments.regenerate)
+    if not arguments.no_record:
+        record_run(run)
+    if arguments.compare is not None:
+        references=[previous_run for previous_run in previous_runs if arguments.compare=='previous' or previous_run['commit'].startswith(arguments.compare)]
+        if references:
+            compare_runs(run,references[-1])
+        else:
+            print('No recorded run to compare with')
+    return 0 if all(case['passed'] for case in run['cases']) else 1
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+from PIL import Image
+import os
+import queue
+import threading
+from Profiler import *
+from configurations import *
+
+class FrameStore:
+    """
+    Conserver en mémoire les images d'une animation sous forme de pixels RGBA bruts (largeur, hauteur, octets)
+    La lecture, la boucle et l'export GIF utilisent ces images sans passer par le disque ; l'écriture des images en PNG
+    peut être activée à part et se fait alors dans un thread dédié
+    """
+    def __init__(self,spill_folder=None):
+        self.frames=[]
+        self.spill_folder=None
+        self.spill_queue=queue.Queue()
+        self.spill_thread=None
+        if spill_folder is not None:
+            self.enableSpill(spill_folder)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self,index):
+        return self.frames[index]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def enableSpill(self,spill_folder):
+        """
+        Activer l'écriture asynchrone des images ajoutées dans un dossier
+        :param spill_folder: dossier destiné à accueillir les images PNG
+        """
+        os.makedirs(spill_folder,exist_ok=True)
+        self.spill_folder=spill_folder
+        if self.spill_thread is None:
+            self.spill_thread=threading.Thread(target=self._spillFrames,daemon=True)
+            self.spill_thread.start()
+
+    def clear(self):
+        """
+        Supprimer toutes les images, ainsi que celles déjà écrites dans le dossier si l'écriture est activée
+        """
+        self.frames=[]
+        if self.spill_folder is not None:
+            self.waitForSpill()
+            for frame in os.listdir(self.spill_folder):
+                os.remove(self.spill_folder+frame)
+
+    def append(self,frame):
+        """
+        Ajouter une image à la fin de l'animation
+        :param frame: tuple (largeur, hauteur, octets RGBA)
+        """
+        self.frames.append(frame)
+        if self.spill_folder is not None:
+            self.spill_queue.put((self.spill_folder+FRAMES_BASENAME+str(len(self.frames)-1)+'.png',frame))
+
+    def waitForSpill(self):
+        """
+        Attendre que toutes les images ajoutées aient été écrites sur le disque
+        """
+        self.spill_queue.join()
+
+    def _spillFrames(self):
+        """
+        Écrire en tâche de fond les images mises en attente
+        """
+        while True:
+            path,(width,height,pixels)=self.spill_queue.get()
+            try:
+                with profiler.span('FrameStore.write_PNG','io'):
+                    Image.frombuffer('RGBA',(width,height),pixels,'raw','RGBA',0,1).save(path)
+                profiler.count('frames written')
+            finally:
+                self.spill_queue.task_done()
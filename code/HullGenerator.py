@@ -0,0 +1,165 @@
+import numpy as np
+from STLModel import STL_BINARY_FACET_DTYPE,STL_BINARY_HEADER_SIZE
+from configurations import *
+
+HULL_ASCII_FACET_TEMPLATE=' facet normal %.9g %.9g %.9g\n  outer loop\n   vertex %.17g %.17g %.17g\n   vertex %.17g %.17g %.17g\n   vertex %.17g %.17g %.17g\n  endloop\n endfacet\n'
+HULL_ASCII_CHUNK_SIZE=100000 # facettes formatées à la fois lors de l'écriture d'un STL ascii
+
+def _circle_deficit(segments_number):
+    """
+    :return: défaut relatif de surface d'un polygone régulier inscrit dans un cercle, (2pi/n)²/6 au premier ordre
+    """
+    angle=2*np.pi/segments_number
+    return 1-np.sin(angle)/angle
+
+def _grid_triangles(points):
+    """
+    Trianguler une grille de points (les quadrilatères voisins en 2 triangles), orientée par l'ordre des indices
+    :param points: numpy array (n,m,3) des points de la grille
+    :return: numpy array (2(n-1)(m-1),3,3) des triangles
+    """
+    a,b,c,d=points[:-1,:-1],points[1:,:-1],points[1:,1:],points[:-1,1:]
+    return np.concatenate([np.stack([a,b,c],axis=-2).reshape(-1,3,3),np.stack([a,c,d],axis=-2).reshape(-1,3,3)])
+
+class SyntheticHull:
+    """
+    Coque générée par programme : facettes orientées vers l'extérieur, bas de la coque en z=0, et volume déplacé
+    connu analytiquement en fonction du tirant d'eau pour vérifier les calculs
+    """
+    def __init__(self,name,vertex,height,displaced_volume,tolerance):
+        """
+        :param name: nom de la forme
+        :param vertex: numpy array (n,3,3) des sommets des facettes
+        :param height: hauteur de la coque
+        :param displaced_volume: fonction du tirant d'eau donnant le volume déplacé par la forme exacte
+        :param tolerance: écart relatif toléré entre le volume de la forme exacte et celui du maillage (discrétisation)
+        """
+        self.name=name
+        normal=np.cross(vertex[:,1]-vertex[:,0],vertex[:,2]-vertex[:,0])
+        norms=np.linalg.norm(normal,axis=1)
+        kept=norms>0 # les triangles dégénérés (pointes de la coque) sont retirés
+        self.vertex=vertex[kept]
+        self.facet_normal=normal[kept]/norms[kept,np.newaxis]
+        self.facets_number=len(self.vertex)
+        self.height=height
+        self.displaced_volume=displaced_volume
+        self.tolerance=tolerance
+
+    def writeBinarySTL(self,filepath):
+        """
+        Écrire la coque dans un fichier STL binaire
+        :param filepath: chemin du fichier
+        """
+        facets=np.zeros(self.facets_number,dtype=STL_BINARY_FACET_DTYPE)
+        facets['normal']=self.facet_normal
+        facets['vertex']=self.vertex
+        with open(filepath,'wb') as file:
+            file.write(('binary STL '+self.name).encode().ljust(STL_BINARY_HEADER_SIZE,b' '))
+            file.write(np.array([self.facets_number],dtype='<u4').tobytes())
+            facets.tofile(file)
+
+    def writeAsciiSTL(self,filepath):
+        """
+        Écrire la coque dans un fichier STL ascii, par blocs de facettes formatées ensemble
+        :param filepath: chemin du fichier
+        """
+        values=np.concatenate([self.facet_normal,self.vertex.reshape(-1,9)],axis=1)
+        with open(filepath,'w') as file:
+            file.write('solid '+self.name+'\n')
+            for start in range(0,self.facets_number,HULL_ASCII_CHUNK_SIZE):
+                chunk=values[start:start+HULL_ASCII_CHUNK_SIZE]
+                file.write((HULL_ASCII_FACET_TEMPLATE*len(chunk))%tuple(chunk.ravel().tolist()))
+            file.write('endsolid '+self.name+'\n')
+
+    def writeSTL(self,filepath,stl_format):
+        """
+        :param stl_format: 'ascii' ou 'binary'
+        """
+        if stl_format=='ascii':
+            self.writeAsciiSTL(filepath)
+        else:
+            self.writeBinarySTL(filepath)
+
+def generate_box(facets_number,length=2.0,width=1.0,height=1.0):
+    """
+    Parallélépipède dont chaque face est découpée en n x n carrés, soit 12n² facettes
+    """
+    n=max(1,int(round(np.sqrt(facets_number/12))))
+    u=np.linspace(0,1,n+1)
+    U,V=np.meshgrid(u,u,indexing='ij')
+    zeros,ones=np.zeros_like(U),np.ones_like(U)
+    faces=[(V,U,zeros),(U,V,ones),(U,zeros,V),(V,ones,U),(zeros,V,U),(ones,U,V)] # ordre des paramètres : normale sortante
+    vertex=np.concatenate([_grid_triangles(np.stack([X*length,Y*width,Z*height],axis=-1)) for X,Y,Z in faces])
+    return SyntheticHull('box',vertex,height,lambda draught:length*width*min(max(draught,0),height),1e-6)
+
+def generate_cylinder(facets_number,radius=0.5,length=2.0):
+    """
+    Cylindre couché d'axe x, découpé en n segments sur la circonférence et n/4 tronçons, fermé par deux disques
+    """
+    segments_number=max(8,int(round(np.sqrt(2*facets_number))))
+    sections_number=max(1,segments_number//4)
+    theta=np.linspace(0,2*np.pi,segments_number+1)
+    theta[-1]=0 # le dernier point coïncide exactement avec le premier
+    x=np.linspace(0,length,sections_number+1)
+    X,T=np.meshgrid(x,theta,indexing='ij')
+    side=_grid_triangles(np.stack([X,radius*np.cos(T),radius+radius*np.sin(T)],axis=-1))[:,::-1]
+    circle=np.stack([radius*np.cos(theta[:-1]),radius+radius*np.sin(theta[:-1])],axis=-1)
+    following=np.roll(circle,-1,axis=0)
+    centre=np.array([0,radius])
+    caps=[]
+    for cap_x,orientation in [(0,-1),(length,1)]:
+        first,second=(following,circle) if orientation<0 else (circle,following)
+        caps.append(np.stack([np.column_stack([np.full(segments_number,cap_x),np.tile(centre,(segments_number,1))]),
+                              np.column_stack([np.full(segments_number,cap_x),first]),
+                              np.column_stack([np.full(segments_number,cap_x),second])],axis=1))
+
+    def displaced_volume(draught):
+        h=min(max(draught,0),2*radius)
+        return length*(radius*radius*np.arccos((radius-h)/radius)-(radius-h)*np.sqrt(2*radius*h-h*h))
+    return SyntheticHull('cylinder',np.concatenate([side]+caps),2*radius,displaced_volume,2*_circle_deficit(segments_number)+1e-6)
+
+def generate_wigley(facets_number,length=2.0,beam=0.2,depth=0.125):
+    """
+    Coque de Wigley y=B/2*(1-(2x/L)²)(1-(z/T)²) pour z de -T à 0, fermée par un pont plat et translatée pour que la
+    quille soit en z=0 ; n x n/4 quadrilatères sur chaque bordé, soit environ n² facettes
+    """
+    sections_number=max(4,int(round(np.sqrt(facets_number))))
+    levels_number=max(2,sections_number//4)
+    x=np.linspace(-length/2,length/2,sections_number+1)
+    z=np.linspace(-depth,0,levels_number+1)
+    X,Z=np.meshgrid(x,z,indexing='ij')
+    Y=beam/2*(1-(2*X/length)**2)*(1-(Z/depth)**2)
+    starboard=_grid_triangles(np.stack([X,-Y,Z+depth],axis=-1))
+    port=_grid_triangles(np.stack([X,Y,Z+depth],axis=-1))[:,::-1]
+    deck_y=beam/2*(1-(2*x/length)**2)
+    deck=np.stack([x,-deck_y,np.full_like(x,depth)],axis=-1)
+    deck=_grid_triangles(np.stack([deck,deck*[1,-1,1]],axis=1))
+
+    def displaced_volume(draught):
+        # intégrale de 2y sur x dans [-L/2,L/2] et z dans [-T,h-T]
+        h=min(max(draught,0),depth)
+        return beam*2*length/3*(h-((h-depth)**3+depth**3)/(3*depth*depth))
+    tolerance=2*(1/sections_number**2+1/(4*levels_number**2))+1e-6 # interpolation linéaire des paraboles
+    return SyntheticHull('wigley',np.concatenate([starboard,port,deck]),depth,displaced_volume,tolerance)
+
+def generate_sphere(facets_number,radius=0.5):
+    """
+    Sphère en latitudes et longitudes (n parallèles, 2n méridiens, soit environ 4n² facettes), bas en z=0
+    """
+    parallels_number=max(4,int(round(np.sqrt(facets_number/4))))
+    meridians_number=2*parallels_number
+    latitude=np.linspace(-np.pi/2,np.pi/2,parallels_number+1)
+    longitude=np.linspace(0,2*np.pi,meridians_number+1)
+    longitude[-1]=0
+    Lat,Lon=np.meshgrid(latitude,longitude,indexing='ij')
+    points=np.stack([radius*np.cos(Lat)*np.cos(Lon),radius*np.cos(Lat)*np.sin(Lon),radius+radius*np.sin(Lat)],axis=-1)
+    points[0]=[0,0,0] # pôles exactement confondus
+    points[-1]=[0,0,2*radius]
+
+    def displaced_volume(draught):
+        h=min(max(draught,0),2*radius)
+        return np.pi*h*h*(3*radius-h)/3
+    tolerance=2*(_circle_deficit(meridians_number)+_circle_deficit(2*parallels_number))+1e-6
+    return SyntheticHull('sphere',_grid_triangles(points)[:,::-1],2*radius,displaced_volume,tolerance)
+
+HULL_GENERATORS={'box':generate_box,'cylinder':generate_cylinder,'wigley':generate_wigley,'sphere':generate_sphere}
@@ -1,12 +1,16 @@
-from PySide2.QtWidgets import QApplication,QWidget,QVBoxLayout,QGridLayout,QPushButton, QLabel,QFileDialog,QLineEdit,QCheckBox, QComboBox
-from PySide2.QtGui import QIcon, QPixmap, Qt
-from PySide2.QtCore import QSize
-import threading
+from PySide2.QtWidgets import QApplication,QWidget,QVBoxLayout,QGridLayout,QPushButton, QLabel,QFileDialog,QLineEdit,QCheckBox, QComboBox, QSlider
+from PySide2.QtGui import QIcon, QPixmap, QImage, Qt
+from PySide2.QtCore import QSize, QCoreApplication, QTimer, QEvent
 import time
 
 from STLModel import *
 from STLModelPressure import *
 from STLModelDisplay import *
+from FrameStore import *
+from ModelCache import *
+from PlaybackEngine import *
+from SimulationPipeline import *
+from Profiler import *
 from Terminal import *
 from configurations import *
 
@@ -26,12 +30,22 @@ class MainWindow(QWidget):
         self.stl_model = None
         self.stl_model_pressure = None
         self.stl_model_display = None
+        self.model_cache = ModelCache() if MODEL_CACHE_ENABLED else None
+        self.simulation_pipeline = None
+        self.draughts_recovered = False
+        self.pipeline_timer = QTimer(self)
+        self.pipeline_timer.timeout.connect(self.showPipelineFrames)
+
+        self.stl_model_frames = FrameStore(STL_MODEL_GRAPHS_FOLDER if SPILL_FRAMES_TO_DISK else None)
+        self.draught_frames = FrameStore(DRAUGHT_GRAPHS_FOLDER if SPILL_FRAMES_TO_DISK else None)
 
         self.object_mass = DEFAULT_OBJECT_MASS
         self.dichotomy_precision = DEFAULT_DICHOTOMY_PRECISION
         self.fluid_density = DEFAULT_FLUID_DENSITY
+        self.draught_solver = DEFAULT_DRAUGHT_SOLVER
 
         self.show_draught = DEFAULT_SHOW_DRAUGHT
+        self.playback_fps = PLAYBACK_FPS
 
         self.setWindowTitle("G5 SIMULATION OBJECT FLOTABILITY")
         self.setFixedSize(1280,1024)
@@ -79,6 +93,9 @@ class MainWindow(QWidget):
         self.stl_model_graph=QLabel()
         self.stl_model_graph.setPixmap(QPixmap(DEFAULT_STL_MODEL_GRAPH_FOLDER))
         self.stl_model_graph.setFixedSize(640,480)
+        # rotation du point de vue en faisant glisser la souris sur l'aperçu
+        self.stl_model_graph.installEventFilter(self)
+        self.orbit_position=None
 
         self.draught_graph=QLabel()
         self.draught_graph.setPixmap(QPixmap(DEFAULT_DRAUGHT_GRAPH_FOLDER))
@@ -98,6 +115,14 @@ class MainWindow(QWidget):
         self.draught_legend.hide()
         self.body_layout.addWidget(self.draught_legend, 2, 0, 1, 2)
 
+        # déplacement dans l'animation, une position par image
+        self.playback_slider=QSlider(Qt.Horizontal)
+        self.playback_slider.setDisabled(True)
+        self.playback_slider.setStyleSheet('margin : 0 24px; background : #fff')
+        self.playback_slider.sliderMoved.connect(self.seekSimulation)
+        self.body_layout.addWidget(self.playback_slider, 3, 0, 1, 2)
+        self.playback=PlaybackEngine([self.stl_model_graph,self.draught_graph],self.playback_fps,self.updatePlaybackSlider,self.endSimulation)
+
         self.term.setFixedWidth(1280)
         self.main_layout.addLayout(self.body_layout)
         self.main_layout.addWidget(self.term)
@@ -105,10 +130,32 @@ class MainWindow(QWidget):
         self.show()
 
     def updatePreview(self,show_draught=False):
-        self.stl_model_display.emptyFolder(STL_MODEL_LOADED_VIEW_FOLDER)
-        self.stl_model_display.saveSTLModelGraph(STL_MODEL_LOADED_VIEW_FOLDER, 'preview',show_draught)
+        frame=self.stl_model_display.renderSTLModelGraph(show_draught)
         self.term.addProcessMessage('Displaying of the updated preview of the STL model')
-        self.stl_model_graph.setPixmap(QPixmap(STL_MODEL_LOADED_VIEW_FOLDER + 'preview.png'))
+        self.stl_model_graph.setPixmap(QPixmap.fromImage(frame_to_image(frame)))
+
+    def eventFilter(self,watched,event):
+        """
+        Tourner le point de vue de l'aperçu en faisant glisser la souris, sauf pendant la préparation (le modèle est
+        déplacé par le thread de calcul) et la lecture de la simulation
+        """
+        if watched is self.stl_model_graph and self.stl_model_display is not None:
+            if event.type()==QEvent.MouseButtonPress and event.button()==Qt.LeftButton:
+                self.orbit_position=event.pos()
+                return True
+            if event.type()==QEvent.MouseMove and self.orbit_position is not None:
+                preparing=self.simulation_pipeline is not None and self.pipeline_timer.isActive()
+                if not preparing and not self.playback.isPlaying():
+                    delta=event.pos()-self.orbit_position
+                    self.stl_model_display.orbit(-delta.x()*ORBIT_SENSITIVITY,delta.y()*ORBIT_SENSITIVITY)
+                    frame=self.stl_model_display.renderSTLModelGraph(self.show_draught)
+                    self.stl_model_graph.setPixmap(QPixmap.fromImage(frame_to_image(frame)))
+                self.orbit_position=event.pos()
+                return True
+            if event.type()==QEvent.MouseButtonRelease and event.button()==Qt.LeftButton:
+                self.orbit_position=None
+                return True
+        return QWidget.eventFilter(self,watched,event)
 
     def loadSTLModel(self):
         """
@@ -121,7 +168,9 @@ class MainWindow(QWidget):
         self.explorer = QFileDialog()
         self.explorer.setNameFilter("*.stl")
         if self.explorer.exec_():
-            self.stl_model=STLModel(self.explorer.selectedFiles()[0],self.term)
+            profiler.reset() # les mesures d'un calcul commencent au chargement du modèle
+            self.stl_model=STLModel(self.explorer.selectedFiles()[0],self.term,cache=self.model_cache)
+            self.stl_model_pressure=None
             if self.stl_model.facets_number!=0:
                 self.initial_bottom_ref=self.stl_model.bottom_ref
                 self.stl_model_display=STLModelDisplay(self.stl_model,self.term)
@@ -142,10 +191,12 @@ class MainWindow(QWidget):
 
     def prepareSimulation(self):
         """
-        Lancer l'algorithme de dichotomie et enregistrer les graphiques étape par étape
+        Lancer la préparation de la simulation en flux : le tirant d'eau est résolu dans un thread de calcul, chaque étape
+        est rendue dans un thread de rendu puis affichée en direct par showPipelineFrames ; le bouton d'arrêt l'annule
         """
         ### BEFORE_PROCESS
         self.buttons[2].setDisabled(True)
+        self.preparation_start=time.perf_counter()
 
         # reset
         self.stl_model.translateZ(self.initial_bottom_ref-self.stl_model.bottom_ref)
@@ -155,75 +206,148 @@ class MainWindow(QWidget):
             self.parameters_window.close()
         for i in range(7):
             if i!=2: self.buttons[i].setDisabled(True)
-        X,Y=[0],[-self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0]
-
-        self.stl_model_display.emptyFolder(STL_MODEL_GRAPHS_FOLDER)
-        self.stl_model_display.emptyFolder(DRAUGHT_GRAPHS_FOLDER)
 
-        self.stl_model_display.saveSTLModelGraph(STL_MODEL_GRAPHS_FOLDER,FRAMES_BASENAME+'0')
-        self.stl_model_display.saveDraughGraph(FRAMES_BASENAME+'0', X,Y,self.dichotomy_precision)
-
-        self.stl_model_pressure=STLModelPressure(self.stl_model,self.term)
+        # conservé d'une préparation à l'autre : les volumes déjà calculés accélèrent les résolutions suivantes
+        if self.stl_model_pressure is None:
+            self.stl_model_pressure=STLModelPressure(self.stl_model,self.term)
+        self.stl_model_pressure.reset_draught_range()
 
         self.stl_model.setMass(self.object_mass)
         self.stl_model_pressure.setFluidDensity(self.fluid_density)
+        self.stl_model_pressure.setDraughtSolver(self.draught_solver)
         ### START_PROCESS
-        self.term.addProcessMessage('Launching the dichotomy algorithm')
-        while self.stl_model_pressure.draught_range[1]-self.stl_model_pressure.draught_range[0]>self.dichotomy_precision:
-            Y.append(self.stl_model_pressure.dichotomy())
-            X.append(self.stl_model_pressure.dichotomy_achieved)
-            self.stl_model_display.saveSTLModelGraph(STL_MODEL_GRAPHS_FOLDER,FRAMES_BASENAME + str(self.stl_model_pressure.dichotomy_achieved),self.show_draught)
-            self.stl_model_display.saveDraughGraph(FRAMES_BASENAME + str(self.stl_model_pressure.dichotomy_achieved), X, Y,self.dichotomy_precision)
+        self.playback.clear()
+        self.playback_slider.setDisabled(True)
+        self.stl_model_frames.clear()
+        self.draught_frames.clear()
+        # instantanés des maillages simplifiés affichés : ni le rendu ni la mémoire des étapes ne dépendent de la taille du fichier
+        self.simulation_pipeline=SimulationPipeline(self.stl_model,self.stl_model_pressure,self.term,self.solveDraught,self.dichotomy_precision,
+                                                    self.show_draught,self.stl_model_display.max_facets,self.stl_model_frames,self.draught_frames)
+        self.simulation_pipeline.start()
+        self.buttons[5].setToolTip('Cancel the preparation of the simulation')
+        self.buttons[5].setDisabled(False)
+        self.pipeline_timer.start(PIPELINE_DISPLAY_INTERVAL)
+
+    def showPipelineFrames(self):
+        """
+        Afficher en direct la prochaine image rendue pendant la préparation (appelée par un minuteur du thread de
+        l'interface, une image par appel), puis terminer la préparation quand le calcul et le rendu sont finis
+        """
+        frame=self.simulation_pipeline.getFrame()
+        if frame is not None:
+            step,stl_model_frame,draught_frame=frame
+            self.stl_model_graph.setPixmap(QPixmap.fromImage(frame_to_image(stl_model_frame)))
+            self.draught_graph.setPixmap(QPixmap.fromImage(frame_to_image(draught_frame)))
+            self.setWindowTitle('G5 SIMULATION OBJECT FLOTABILITY - step '+str(step.index+1)+'/'+str(self.simulation_pipeline.steps_number)+' - draught '+format(step.draughts[-1],'.6g')+' m')
+        elif self.simulation_pipeline.isFinished():
+            self.pipeline_timer.stop()
+            self.finishPreparation()
+
+    def finishPreparation(self):
+        """
+        Terminer la préparation de la simulation, complète ou annulée, et réactiver les boutons
+        """
+        self.setWindowTitle('G5 SIMULATION OBJECT FLOTABILITY')
+        self.buttons[5].setToolTip('Stop the simulation')
+        self.buttons[5].setDisabled(True)
+        if self.simulation_pipeline.cancelled:
+            # images incomplètes : la simulation doit être préparée à nouveau
+            self.stl_model_frames.clear()
+            self.draught_frames.clear()
+            self.term.addErrorMessage('Preparation of the simulation cancelled after '+str(self.simulation_pipeline.rendered_steps_number)+' rendered steps')
+            for i in range(3):
+                self.buttons[i].setDisabled(False)
+            return
+        if self.model_cache is not None and not self.draughts_recovered:
+            self.model_cache.storeArrays(self.stl_model.filepath,'draughts',self.getSolverParameters(),{'draughts':np.array(self.simulation_pipeline.draughts,dtype=np.float64)})
+        if len(self.stl_model_frames)!=len(self.draught_frames):
+            self.term.addErrorMessage('An error occurred during frames synchronization')
+        # images converties une seule fois pour toutes les lectures de l'animation
+        self.playback.load([self.stl_model_frames,self.draught_frames])
+        self.playback_slider.setRange(0,max(self.playback.frames_number-1,0))
+        self.playback_slider.setValue(self.playback.frames_number-1)
+        self.playback_slider.setDisabled(False)
         self.term.addSuccessMessage('Preparation of the simulation complete')
+        if profiler.enabled:
+            profiler.recordSpan('IHM.prepareSimulation','interface',self.preparation_start,time.perf_counter())
+            self.reportProfiling()
         ### END_PROCESS
         for i in range(7):
             if i!=5: self.buttons[i].setDisabled(False)
             if i==2: self.buttons[i].setDisabled(True)
 
-    def startSimulation(self):
+    def getSolverParameters(self):
         """
-        Lancer l'animation des graphiques en asynchrone pour ne pas bloquer les clicked event
+        :return: paramètres dont dépendent les tirants d'eau successifs, clé de leur entrée dans le cache
         """
-        thread=threading.Thread(target=self._startSimulation)
-        thread.start()
+        return {'object_mass':self.object_mass,'fluid_density':self.fluid_density,'dichotomy_precision':self.dichotomy_precision,'draught_solver':self.draught_solver}
 
-    def _startSimulation(self):
+    def solveDraught(self,step_callback=None):
+        """
+        Résoudre le tirant d'eau, ou relire depuis le cache les tirants d'eau successifs d'une résolution identique
+        Appelée depuis le thread de calcul de la préparation ; les tirants d'eau ne sont enregistrés dans le cache qu'à
+        la fin d'une préparation complète (finishPreparation)
+        :param step_callback: fonction appelée avec chaque tirant d'eau, la résolution s'arrêtant si elle renvoie False
+        :return: liste des tirants d'eau successifs, le dernier étant la solution
+        """
+        self.draughts_recovered=False
+        if self.model_cache is not None:
+            cached_draughts=self.model_cache.loadArrays(self.stl_model.filepath,'draughts',self.getSolverParameters(),['draughts'])
+            if cached_draughts is not None:
+                self.term.addSuccessMessage('Draughts recovered from the cache')
+                self.draughts_recovered=True
+                draughts=cached_draughts[0].tolist()
+                if step_callback is not None:
+                    for draught in draughts:
+                        if step_callback(draught) is False:
+                            break
+                return draughts
+        return self.stl_model_pressure.solve_draught(self.dichotomy_precision,step_callback)
+
+    def startSimulation(self):
         """
-        Recuperer et afficher avec une temporisation les images des graphiques afin de constituer l'animation
+        Lancer la lecture de l'animation, cadencée par le minuteur du moteur de lecture dans le thread de l'interface
         """
         ### BEFORE PROCESS
         for i in range(7):
-            if i!=5: self.buttons[i].setDisabled(True)
-
-        self.term.addProcessMessage('Recovery of all the images needed for the animation')
-        stl_model_frames = os.listdir(STL_MODEL_GRAPHS_FOLDER)
-        stl_model_frames = sorted(stl_model_frames, key=lambda frame: int(frame.replace(FRAMES_BASENAME, '').split('.')[0]))
-        stl_draught_frames = os.listdir(DRAUGHT_GRAPHS_FOLDER)
-        stl_draught_frames = sorted(stl_draught_frames, key=lambda frame: int(frame.replace(FRAMES_BASENAME, '').split('.')[0]))
-        self.term.addSuccessMessage('All the images have been recovered')
-        self.term.addInformativeMessage('Launching simulation animation')
-        frames_number = len(stl_model_frames)
-        if frames_number == len(stl_draught_frames):
-            for i in range(frames_number):
-                self.stl_model_graph.setPixmap(STL_MODEL_GRAPHS_FOLDER + stl_model_frames[i])
-                self.draught_graph.setPixmap(DRAUGHT_GRAPHS_FOLDER + stl_draught_frames[i])
-                time.sleep(.1)
-            while self.loop_simulation:
-                for i in range(frames_number):
-                    self.stl_model_graph.setPixmap(STL_MODEL_GRAPHS_FOLDER + stl_model_frames[i])
-                    self.draught_graph.setPixmap(DRAUGHT_GRAPHS_FOLDER + stl_draught_frames[i])
-                    time.sleep(.1)
-            self.term.addSuccessMessage('Animation of the simulation correctly carried out')
-            for i in range(7):
-                if i in [0,1,3,4,6]: self.buttons[i].setDisabled(False)
-        else:
-            self.term.addErrorMessage('An error occurred during frames synchronization')
+            if i not in [4,5]: self.buttons[i].setDisabled(True)
+        self.buttons[5].setDisabled(False)
+
+        self.term.addInformativeMessage('Launching simulation animation at '+str(self.playback_fps)+' frames per second')
+        if not self.playback.play(self.loop_simulation):
+            self.term.addErrorMessage('Impossible to play the animation : no prepared frames')
+            self.endSimulation()
+
+    def endSimulation(self):
+        """
+        Réactiver les boutons à la fin de la lecture de l'animation
+        """
+        self.term.addSuccessMessage('Animation of the simulation correctly carried out')
+        for i in range(7):
+            if i in [0,1,3,4,6]: self.buttons[i].setDisabled(False)
+        self.buttons[5].setDisabled(not self.loop_simulation)
+
+    def seekSimulation(self,index):
+        """
+        Afficher l'image de l'animation choisie avec le curseur, la lecture en cours continuant depuis celle-ci
+        :param index: numéro de l'image
+        """
+        self.playback.seek(index)
+
+    def updatePlaybackSlider(self,index):
+        """
+        Suivre l'image affichée avec le curseur, sauf pendant que l'utilisateur le déplace
+        :param index: numéro de l'image affichée
+        """
+        if not self.playback_slider.isSliderDown():
+            self.playback_slider.setValue(index)
 
     def loopSimulation(self):
         """
         Activer ou désactive la répétition infinie de l'animation
         """
         self.loop_simulation=not self.loop_simulation
+        self.playback.loop=self.loop_simulation
         loop_button=self.buttons[4]
         stop_button=self.buttons[5]
         loop_icon='loop_simulation_icon.png'
@@ -232,26 +356,53 @@ class MainWindow(QWidget):
             stop_button.setDisabled(False)
             self.term.addInformativeMessage('The displayed simulation will now be looped')
         else:
-            stop_button.setDisabled(True)
+            stop_button.setDisabled(not self.playback.isPlaying())
             self.term.addInformativeMessage('The displayed simulation will now be played only once')
         loop_button.setIcon(QIcon(ICONS_FOLDER+loop_icon))
 
     def stopSimulation(self):
         """
-        Interrompre la boucle pour arrêter l'animation
+        Arrêter l'animation sur l'image affichée et désactiver la boucle, ou annuler la préparation de la simulation en cours
         """
+        if self.simulation_pipeline is not None and self.pipeline_timer.isActive():
+            self.simulation_pipeline.cancel()
+            self.buttons[5].setDisabled(True)
+            self.term.addInformativeMessage('Cancelling the preparation of the simulation')
+            return
+        was_playing=self.playback.isPlaying()
+        self.playback.stop()
         self.loop_simulation=False
+        self.playback.loop=False
         loop_button=self.buttons[4]
         stop_button = self.buttons[5]
         loop_button.setIcon(QIcon(ICONS_FOLDER+'loop_simulation_icon.png'))
         stop_button.setDisabled(True)
-        self.term.addInformativeMessage('Simulation properly stopped')
+        if was_playing:
+            for i in [0,1,3,4,6]:
+                self.buttons[i].setDisabled(False)
+            self.term.addInformativeMessage('Simulation properly stopped at frame '+str(self.playback.current_index+1)+'/'+str(self.playback.frames_number))
+        else:
+            self.term.addInformativeMessage('Simulation properly stopped')
 
     def generateAnimationsGIF(self):
         """
         Générer et télécharger des GIF de la simulation produite
         """
-        self.stl_model_display.generateGIFAnimations()
+        self.stl_model_display.generateGIFAnimations(self.stl_model_frames,self.draught_frames)
+        if profiler.enabled:
+            self.reportProfiling()
+
+    def reportProfiling(self):
+        """
+        Exporter la trace des mesures du calcul au format Chrome trace, en afficher le résumé puis repartir de zéro
+        """
+        self.stl_model_frames.waitForSpill()
+        self.draught_frames.waitForSpill()
+        trace_path=PROFILING_TRACES_FOLDER+'trace_'+time.strftime('%Y%m%d_%H%M%S')+'.json'
+        profiler.exportTrace(trace_path)
+        profiler.showSummary(self.term)
+        self.term.addSuccessMessage('Profiling trace saved in \''+trace_path+'\'')
+        profiler.reset()
 
 class ParametersWindow(QWidget):
     """
@@ -262,7 +413,7 @@ class ParametersWindow(QWidget):
         self.settings=settings
 
         self.setWindowTitle('PARAMETERS')
-        self.setFixedSize(360,500)
+        self.setFixedSize(360,540)
 
         self.main_layout=QGridLayout()
         self.main_layout.setAlignment(Qt.AlignTop)
@@ -321,20 +472,44 @@ class ParametersWindow(QWidget):
             self.fluid_density_input.setText(str(self.settings.fluid_density))
         self.main_layout.addWidget(self.fluid_density_input, 4, 1, 1, 1)
 
+        draught_solver_label=QLabel('Draught solver')
+        draught_solver_label.setFixedHeight(32)
+        draught_solver_label.setStyleSheet('font-family: Calibri; font-size : 10pt; color: #2C3E50;')
+        self.main_layout.addWidget(draught_solver_label, 5, 0, 1, 1)
+
+        self.draught_solver_options=QComboBox()
+        self.draught_solver_options.addItem(self.settings.draught_solver)
+        for draught_solver in DRAUGHT_SOLVERS:
+            if draught_solver!=self.settings.draught_solver:
+                self.draught_solver_options.addItem(draught_solver)
+        self.draught_solver_options.activated.connect(self.updateDraughtSolver)
+        self.main_layout.addWidget(self.draught_solver_options, 5, 1, 1, 1)
+
         display_parameters_label = QLabel('DISPLAY PARAMETERS')
         display_parameters_label.setAlignment(Qt.AlignCenter)
         display_parameters_label.setFixedHeight(58)
         display_parameters_label.setStyleSheet('font-family: Calibri; font-size : 10pt; color: #2C3E50;')
-        self.main_layout.addWidget(display_parameters_label, 5, 0, 1, 2)
+        self.main_layout.addWidget(display_parameters_label, 6, 0, 1, 2)
 
         show_draught_label=QLabel('Show draught')
         show_draught_label.setFixedHeight(32)
         show_draught_label.setStyleSheet('font-family: Calibri; font-size : 10pt; color: #2C3E50;')
-        self.main_layout.addWidget(show_draught_label, 6, 0, 1, 1)
+        self.main_layout.addWidget(show_draught_label, 7, 0, 1, 1)
         self.show_draught_checkbox=QCheckBox()
         self.show_draught_checkbox.stateChanged.connect(self.updateShowDraught)
         self.show_draught_checkbox.setCheckState(Qt.CheckState.Checked if self.settings.show_draught else Qt.CheckState.Unchecked)
-        self.main_layout.addWidget(self.show_draught_checkbox, 6, 1, 1, 1)
+        self.main_layout.addWidget(self.show_draught_checkbox, 7, 1, 1, 1)
+
+        playback_fps_label=QLabel('Animation speed (frames/s)')
+        playback_fps_label.setFixedHeight(32)
+        playback_fps_label.setStyleSheet('font-family: Calibri; font-size : 10pt; color: #2C3E50;')
+        self.main_layout.addWidget(playback_fps_label, 8, 0, 1, 1)
+
+        self.playback_fps_input=QLineEdit()
+        self.playback_fps_input.setAlignment(Qt.AlignRight)
+        self.playback_fps_input.setText(str(self.settings.playback_fps))
+        self.playback_fps_input.textChanged.connect(self.updatePlaybackFPS)
+        self.main_layout.addWidget(self.playback_fps_input, 8, 1, 1, 1)
 
         self.show()
 
@@ -399,6 +574,15 @@ class ParametersWindow(QWidget):
         finally:
             pass
 
+    def updateDraughtSolver(self):
+        """
+        Mettre à jour la méthode de résolution du tirant d'eau sélectionnée par l'utilisateur
+        """
+        if self.draught_solver_options.currentText()!=self.settings.draught_solver:
+            self.settings.draught_solver=self.draught_solver_options.currentText()
+            self.lockSimulationButtons()
+            self.settings.term.addSuccessMessage('The draught solver has correctly been changed')
+
     def updateShowDraught(self):
         """
         Afficher le tirant d'eau si l'utilisateur le désire
@@ -414,6 +598,21 @@ class ParametersWindow(QWidget):
 
             self.settings.updatePreview(self.settings.show_draught)
 
+    def updatePlaybackFPS(self):
+        """
+        Mettre à jour la vitesse de lecture de l'animation entrée par l'utilisateur, sans préparer à nouveau la simulation
+        """
+        try:
+            playback_fps=float(self.playback_fps_input.text())
+            if playback_fps<=0:
+                raise ValueError
+            if playback_fps!=self.settings.playback_fps:
+                self.settings.playback_fps=playback_fps
+                self.settings.playback.setFPS(playback_fps)
+                self.settings.term.addSuccessMessage('The animation speed you entered is in a valid format')
+        except Exception:
+            self.settings.term.addErrorMessage('The animation speed you entered is not in a valid format')
+
     def lockSimulationButtons(self):
         """
         Désactiver certains boutons lors de la modification des paramètres
@@ -0,0 +1,73 @@
+import numpy as np
+from configurations import *
+
+def calc_triangles_normals(vertices,triangles):
+    """
+    :param vertices: numpy array (m,3) de la table des sommets
+    :param triangles: numpy array (n,3) des indices des sommets des triangles
+    :return: numpy array (n,3) des vecteurs normaux non normalisés (norme égale au double de la surface)
+    """
+    facets=vertices[triangles]
+    return np.cross(facets[:,1]-facets[:,0],facets[:,2]-facets[:,0])
+
+def cluster_vertices(vertices,triangles,cell_size):
+    """
+    Simplifier un maillage en regroupant les sommets d'une même cellule d'une grille régulière : chaque groupe est
+    remplacé par la moyenne de ses sommets, les triangles dont deux sommets sont regroupés disparaissent
+    :param vertices: numpy array (m,3) de la table des sommets
+    :param triangles: numpy array (n,3) des indices des sommets des triangles
+    :param cell_size: côté des cellules de la grille
+    :return: table des sommets regroupés, indices des triangles restants, vecteurs normaux unitaires des triangles
+    """
+    cells=np.floor((vertices-vertices.min(axis=0))/cell_size).astype(np.int64)
+    dimensions=cells.max(axis=0)+1
+    keys=(cells[:,0]*dimensions[1]+cells[:,1])*dimensions[2]+cells[:,2]
+    cluster_keys,cluster=np.unique(keys,return_inverse=True)
+    cluster=cluster.ravel() # np.unique ne garde pas toujours la forme à 1 dimension de return_inverse
+    counts=np.bincount(cluster,minlength=len(cluster_keys))
+    clustered_vertices=np.stack([np.bincount(cluster,weights=vertices[:,axis],minlength=len(cluster_keys)) for axis in range(3)],axis=1)/counts[:,np.newaxis]
+
+    clustered_triangles=cluster[triangles]
+    A,B,C=clustered_triangles[:,0],clustered_triangles[:,1],clustered_triangles[:,2]
+    clustered_triangles=clustered_triangles[(A!=B)&(B!=C)&(A!=C)]
+
+    # triangles regroupés sur les mêmes sommets : un seul est gardé
+    sorted_triangles=np.sort(clustered_triangles,axis=1)
+    order=np.lexsort((sorted_triangles[:,2],sorted_triangles[:,1],sorted_triangles[:,0]))
+    sorted_triangles=sorted_triangles[order]
+    is_new=np.ones(len(order),dtype=bool)
+    np.any(sorted_triangles[1:]!=sorted_triangles[:-1],axis=1,out=is_new[1:])
+    clustered_triangles=clustered_triangles[np.sort(order[is_new])]
+
+    normals=calc_triangles_normals(clustered_vertices,clustered_triangles)
+    norms=np.linalg.norm(normals,axis=1)
+    kept=norms>0 # triangles aplatis par le regroupement
+    return clustered_vertices,clustered_triangles[kept].astype(np.int32),normals[kept]/norms[kept,np.newaxis]
+
+def decimate_mesh(vertices,triangles,target_facets_number,iterations=LOD_CLUSTERING_ITERATIONS):
+    """
+    Simplifier un maillage jusqu'à environ target_facets_number facettes, en ajustant le côté des cellules du
+    regroupement des sommets : un maillage fermé ayant 2 fois plus de facettes que de sommets, le côté initial donne
+    environ une cellule occupée pour 2 facettes visées
+    :param vertices: numpy array (m,3) de la table des sommets
+    :param triangles: numpy array (n,3) des indices des sommets des triangles
+    :param target_facets_number: nombre de facettes visé
+    :param iterations: nombre maximal de regroupements essayés
+    :return: table des sommets, indices des triangles et normales du maillage simplifié le plus détaillé ne dépassant
+    pas target_facets_number facettes (le moins détaillé essayé si aucun ne convient)
+    """
+    area=np.linalg.norm(calc_triangles_normals(vertices.astype(np.float64,copy=False),triangles),axis=1).sum()/2
+    cell_size=np.sqrt(2*area/target_facets_number)
+    best_mesh,coarsest_mesh=None,None
+    for i in range(iterations):
+        mesh=cluster_vertices(vertices,triangles,cell_size)
+        facets_number=len(mesh[1])
+        if facets_number<=target_facets_number and (best_mesh is None or facets_number>len(best_mesh[1])):
+            best_mesh=mesh
+        if coarsest_mesh is None or facets_number<len(coarsest_mesh[1]):
+            coarsest_mesh=mesh
+        ratio=facets_number/target_facets_number
+        if LOD_TARGET_TOLERANCE<=ratio<=1 or facets_number==0:
+            break
+        cell_size*=np.sqrt(ratio)
+    return best_mesh if best_mesh is not None else coarsest_mesh
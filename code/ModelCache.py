@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from Profiler import *
+from configurations import *
+
+MODEL_CACHE_HASH_CHUNK_SIZE=1<<20 # octets lus à la fois pour calculer l'empreinte d'un fichier
+
+class ModelCache:
+    """
+    Cache disque des maillages extraits des fichiers STL et des résultats calculés sur ces maillages
+    Chaque fichier STL est identifié par l'empreinte SHA-256 de son contenu et dispose d'un dossier où chaque groupe de
+    tableaux est enregistré en .npy sous un nom dépendant des paramètres du calcul ; les tableaux sont relus projetés en
+    mémoire. L'empreinte d'un chemin est réutilisée tant que la taille et la date de modification du fichier ne changent
+    pas, et les entrées les moins récemment utilisées sont supprimées au delà de la taille maximale du cache
+    """
+    def __init__(self,folder=MODEL_CACHE_FOLDER,max_size=MODEL_CACHE_MAX_SIZE):
+        """
+        :param folder: dossier du cache
+        :param max_size: taille maximale du cache (Mo)
+        """
+        os.makedirs(folder,exist_ok=True)
+        self.folder=folder
+        self.max_size=max_size*1024*1024
+        self.index_path=folder+'index.json'
+        self.index={'files':{},'entries':{}}
+        if os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path) as index_file:
+                    self.index=json.load(index_file)
+            except (OSError,ValueError):
+                pass
+
+    def _writeIndex(self):
+        temporary_path=self.index_path+'.tmp'
+        with open(temporary_path,'w') as index_file:
+            json.dump(self.index,index_file)
+        os.replace(temporary_path,self.index_path)
+
+    @profiled('ModelCache.getFileHash','io')
+    def getFileHash(self,filepath):
+        """
+        Obtenir l'empreinte du contenu d'un fichier, recalculée seulement si le fichier a changé depuis le dernier appel
+        L'entrée correspondant à l'ancien contenu est supprimée si aucun autre fichier connu ne la partage
+        :param filepath: chemin du fichier
+        :return: empreinte SHA-256 en hexadécimal
+        """
+        path=os.path.abspath(filepath)
+        status=os.stat(path)
+        known_file=self.index['files'].get(path)
+        if known_file is not None and known_file['size']==status.st_size and known_file['mtime']==status.st_mtime_ns:
+            return known_file['hash']
+
+        file_hash=hashlib.sha256()
+        with open(path,'rb') as file:
+            for chunk in iter(lambda:file.read(MODEL_CACHE_HASH_CHUNK_SIZE),b''):
+                file_hash.update(chunk)
+        file_hash=file_hash.hexdigest()
+        self.index['files'][path]={'size':status.st_size,'mtime':status.st_mtime_ns,'hash':file_hash}
+        if known_file is not None and known_file['hash']!=file_hash and all(known['hash']!=known_file['hash'] for known in self.index['files'].values()):
+            self.removeEntry(known_file['hash'])
+        self._writeIndex()
+        return file_hash
+
+    def _arrayPath(self,file_hash,name,parameters,array_name):
+        parameters_hash=hashlib.sha1(json.dumps(parameters,sort_keys=True).encode()).hexdigest()[:16]
+        return self.folder+file_hash+'/'+name+'_'+parameters_hash+'_'+array_name+'.npy'
+
+    @profiled('ModelCache.loadArrays','io')
+    def loadArrays(self,filepath,name,parameters,array_names):
+        """
+        Relire un groupe de tableaux enregistré pour un fichier et des paramètres donnés
+        :param filepath: chemin du fichier STL
+        :param name: nom du groupe de tableaux ('mesh', 'draughts'...)
+        :param parameters: dictionnaire des paramètres du calcul (sérialisable en JSON)
+        :param array_names: noms des tableaux du groupe
+        :return: liste des tableaux projetés en mémoire en lecture seule, None si le groupe n'est pas dans le cache
+        """
+        file_hash=self.getFileHash(filepath)
+        paths=[self._arrayPath(file_hash,name,parameters,array_name) for array_name in array_names]
+        if not all(os.path.isfile(path) for path in paths):
+            return None
+        try:
+            arrays=[np.load(path,mmap_mode='r') for path in paths]
+        except (OSError,ValueError):
+            return None
+        self.index['entries'][file_hash]=time.time()
+        self._writeIndex()
+        return arrays
+
+    @profiled('ModelCache.storeArrays','io')
+    def storeArrays(self,filepath,name,parameters,arrays):
+        """
+        Enregistrer un groupe de tableaux pour un fichier et des paramètres donnés, puis réduire le cache à sa taille maximale
+        :param filepath: chemin du fichier STL
+        :param name: nom du groupe de tableaux
+        :param parameters: dictionnaire des paramètres du calcul (sérialisable en JSON)
+        :param arrays: dictionnaire {nom du tableau: numpy array}
+        """
+        file_hash=self.getFileHash(filepath)
+        os.makedirs(self.folder+file_hash,exist_ok=True)
+        for array_name,array in arrays.items():
+            path=self._arrayPath(file_hash,name,parameters,array_name)
+            with open(path+'.tmp','wb') as array_file:
+                np.save(array_file,np.asarray(array))
+            os.replace(path+'.tmp',path)
+        self.index['entries'][file_hash]=time.time()
+        self.evict()
+        self._writeIndex()
+
+    def loadMesh(self,filepath,indexed_mesh):
+        """
+        :return: table des sommets, indices des triangles, normales, ou None si le maillage n'est pas dans le cache
+        """
+        return self.loadArrays(filepath,'mesh',{'indexed_mesh':indexed_mesh,'dtype':INDEXED_MESH_DTYPE},['vertices','triangles','facet_normal'])
+
+    def storeMesh(self,filepath,indexed_mesh,vertices,triangles,facet_normal):
+        self.storeArrays(filepath,'mesh',{'indexed_mesh':indexed_mesh,'dtype':INDEXED_MESH_DTYPE},{'vertices':vertices,'triangles':triangles,'facet_normal':facet_normal})
+
+    def getEntrySize(self,file_hash):
+        entry_folder=self.folder+file_hash
+        if not os.path.isdir(entry_folder):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(entry_folder) if entry.is_file())
+
+    def removeEntry(self,file_hash):
+        """
+        Supprimer tous les tableaux enregistrés pour une empreinte
+        Un tableau encore projeté en mémoire peut ne pas être supprimable (Windows) : il le sera lors d'une prochaine réduction
+        """
+        shutil.rmtree(self.folder+file_hash,ignore_errors=True)
+        if not os.path.isdir(self.folder+file_hash):
+            self.index['entries'].pop(file_hash,None)
+
+    def evict(self):
+        """
+        Supprimer les entrées les moins récemment utilisées tant que le cache dépasse sa taille maximale
+        """
+        entries=sorted(self.index['entries'].items(),key=lambda entry:entry[1])
+        sizes={file_hash:self.getEntrySize(file_hash) for file_hash,last_use in entries}
+        cache_size=sum(sizes.values())
+        for file_hash,last_use in entries[:-1]: # l'entrée la plus récente est conservée
+            if cache_size<=self.max_size:
+                break
+            self.removeEntry(file_hash)
+            cache_size-=sizes[file_hash]-self.getEntrySize(file_hash)
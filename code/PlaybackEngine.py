@@ -0,0 +1,138 @@
+from PySide2.QtCore import QTimer, QElapsedTimer, Qt
+from PySide2.QtGui import QImage, QPixmap
+from Profiler import *
+from configurations import *
+
+def frame_to_image(frame):
+    """
+    Convertir une image en mémoire (largeur, hauteur, octets RGBA) en QImage, sans copie des pixels
+    :param frame: tuple (largeur, hauteur, octets RGBA)
+    :return: l'objet QImage
+    """
+    width,height,pixels=frame
+    return QImage(pixels,width,height,4*width,QImage.Format_RGBA8888)
+
+class PlaybackEngine:
+    """
+    Lire l'animation de la simulation dans le thread de l'interface, cadencée par un minuteur
+    Les images sont converties une seule fois en QPixmap, si bien qu'une lecture en boucle ne fait ni lecture de
+    fichier ni conversion ; l'image affichée est déduite du temps écoulé depuis le début de la lecture : quand un
+    affichage prend du retard, des images sont sautées au lieu de ralentir l'animation
+    """
+    def __init__(self,labels,fps=PLAYBACK_FPS,frame_callback=None,finished_callback=None):
+        """
+        :param labels: liste des QLabel affichant chacun une animation, en même temps
+        :param fps: nombre d'images par seconde
+        :param frame_callback: fonction appelée avec le numéro de chaque image affichée
+        :param finished_callback: fonction appelée à la fin d'une lecture sans boucle
+        """
+        self.labels=labels
+        self.fps=fps
+        self.frame_callback=frame_callback
+        self.finished_callback=finished_callback
+        self.loop=False
+        self.pixmaps=[]
+        self.frames_number=0
+        self.current_index=-1 # image affichée
+        self.start_index=0 # image affichée au dernier départ de l'horloge
+        self.clock=QElapsedTimer()
+        self.timer=QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+
+    def load(self,frame_stores):
+        """
+        Convertir une seule fois en QPixmap toutes les images à lire
+        :param frame_stores: une liste d'images (FrameStore) par QLabel, dans le même ordre que labels
+        """
+        self.stop()
+        with profiler.span('PlaybackEngine.load','display'):
+            self.pixmaps=[[QPixmap.fromImage(frame_to_image(frame)) for frame in frames] for frames in frame_stores]
+        self.frames_number=min(len(pixmaps) for pixmaps in self.pixmaps) if self.pixmaps else 0
+        self.current_index=-1
+
+    def clear(self):
+        self.stop()
+        self.pixmaps=[]
+        self.frames_number=0
+        self.current_index=-1
+
+    def isPlaying(self):
+        return self.timer.isActive()
+
+    def play(self,loop=None):
+        """
+        Lancer la lecture depuis l'image affichée, ou depuis la première si la dernière est affichée
+        :param loop: lire en boucle (réglage précédent si None)
+        :return: False s'il n'y a aucune image à lire
+        """
+        if self.frames_number==0:
+            return False
+        if loop is not None:
+            self.loop=loop
+        start_index=self.current_index if 0<=self.current_index<self.frames_number-1 else 0
+        self._startClock(start_index)
+        self._showFrame(start_index)
+        self.timer.start(max(1,round(1000/self.fps)))
+        return True
+
+    def stop(self):
+        """
+        Arrêter la lecture sur l'image affichée
+        """
+        self.timer.stop()
+
+    def seek(self,index):
+        """
+        Afficher une image donnée (déplacement dans l'animation), la lecture en cours continuant depuis celle-ci
+        :param index: numéro de l'image
+        """
+        if self.frames_number==0:
+            return
+        index=min(max(int(index),0),self.frames_number-1)
+        if self.isPlaying():
+            self._startClock(index)
+        self._showFrame(index)
+
+    def setFPS(self,fps):
+        """
+        Changer la vitesse de lecture, la lecture en cours continuant depuis l'image affichée
+        :param fps: nombre d'images par seconde
+        """
+        self.fps=fps
+        if self.isPlaying():
+            self._startClock(self.current_index)
+            self.timer.setInterval(max(1,round(1000/fps)))
+
+    def _startClock(self,index):
+        self.start_index=index
+        self.clock.restart()
+
+    def _tick(self):
+        """
+        Afficher l'image correspondant au temps écoulé : rien n'est fait si c'est déjà l'image affichée
+        """
+        index=self.start_index+self.clock.elapsed()*self.fps//1000
+        if index>=self.frames_number:
+            if not self.loop:
+                self._showFrame(self.frames_number-1)
+                self.stop()
+                if self.finished_callback is not None:
+                    self.finished_callback()
+                return
+            # le départ de l'horloge est reculé d'un nombre entier de boucles : pas de dérive d'une boucle à l'autre
+            loops_number=int(index//self.frames_number)
+            self.start_index-=loops_number*self.frames_number
+            index-=loops_number*self.frames_number
+        self._showFrame(int(index))
+
+    def _showFrame(self,index):
+        if index==self.current_index:
+            return
+        if self.current_index>=0 and index>self.current_index+1:
+            profiler.count('frames dropped',index-self.current_index-1)
+        for label,pixmaps in zip(self.labels,self.pixmaps):
+            label.setPixmap(pixmaps[index])
+        self.current_index=index
+        if self.frame_callback is not None:
+            self.frame_callback(index)
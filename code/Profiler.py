@@ -0,0 +1,183 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from configurations import *
+
+class _Span:
+    """
+    Étape mesurée : enregistrée dans le profileur à la sortie du bloc with
+    """
+    __slots__=('profiler','name','category','start')
+
+    def __init__(self,profiler,name,category):
+        self.profiler=profiler
+        self.name=name
+        self.category=category
+
+    def __enter__(self):
+        self.start=time.perf_counter()
+        return self
+
+    def __exit__(self,exception_type,exception,traceback):
+        self.profiler.recordSpan(self.name,self.category,self.start,time.perf_counter())
+        return False
+
+class _NoSpan:
+    """
+    Étape non mesurée, partagée par tous les blocs with quand le profileur est désactivé
+    """
+    __slots__=()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exception_type,exception,traceback):
+        return False
+
+_NO_SPAN=_NoSpan()
+
+class Profiler:
+    """
+    Mesurer la durée des étapes de la simulation, compter les éléments traités et suivre le pic de mémoire
+    Les étapes et les compteurs sont enregistrés comme des événements au format Chrome trace (chrome://tracing,
+    Perfetto), exportables en JSON, et résumés à la fin d'un calcul. Désactivé, le profileur ne fait qu'un test
+    d'attribut par étape instrumentée
+    """
+    def __init__(self,enabled=PROFILING_ENABLED):
+        self.enabled=False
+        self.track_memory=False
+        self.lock=threading.Lock()
+        self.reset()
+        if enabled:
+            self.enable()
+
+    def enable(self,track_memory=PROFILING_TRACK_MEMORY):
+        """
+        Activer les mesures
+        :param track_memory: suivre aussi la mémoire allouée (tracemalloc, qui ralentit les allocations)
+        """
+        self.track_memory=track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled=True
+
+    def disable(self):
+        self.enabled=False
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.track_memory=False
+
+    def reset(self):
+        """
+        Oublier les mesures déjà faites, avant un nouveau calcul
+        """
+        with self.lock:
+            self.events=[]
+            self.counters={}
+            self.spans={} # {nom: [nombre d'appels, durée totale (s), durée maximale (s)]}
+            self.start_time=time.perf_counter()
+            self.peak_memory=0
+            if tracemalloc.is_tracing():
+                tracemalloc.clear_traces() # remet aussi le pic à zéro
+        self.process_id=os.getpid()
+
+    def span(self,name,category=PROFILING_DEFAULT_CATEGORY):
+        """
+        Mesurer la durée d'un bloc : with profiler.span('nom'): ...
+        :param name: nom de l'étape
+        :param category: catégorie de l'étape dans la trace
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self,name,category)
+
+    def _timestamp(self,instant):
+        return round((instant-self.start_time)*1e6,3) # µs depuis le début des mesures
+
+    def recordSpan(self,name,category,start,end):
+        """
+        Enregistrer une étape terminée, puis la mémoire allouée à sa fin
+        :param start: début de l'étape (time.perf_counter)
+        :param end: fin de l'étape (time.perf_counter)
+        """
+        event={'name':name,'cat':category,'ph':'X','ts':self._timestamp(start),'dur':round((end-start)*1e6,3),'pid':self.process_id,'tid':threading.get_ident()}
+        with self.lock:
+            self.events.append(event)
+            statistics=self.spans.setdefault(name,[0,0.0,0.0])
+            statistics[0]+=1
+            statistics[1]+=end-start
+            statistics[2]=max(statistics[2],end-start)
+            if self.track_memory and tracemalloc.is_tracing():
+                current_memory,peak_memory=tracemalloc.get_traced_memory()
+                self.peak_memory=max(self.peak_memory,peak_memory)
+                self.events.append({'name':'memory','ph':'C','ts':event['ts']+event['dur'],'pid':self.process_id,'args':{'allocated (Mo)':round(current_memory/1024**2,3)}})
+
+    def count(self,name,value=1):
+        """
+        Incrémenter un compteur (facettes traitées, images écrites...)
+        :param name: nom du compteur
+        :param value: valeur à ajouter
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name]=self.counters.get(name,0)+value
+            self.events.append({'name':name,'ph':'C','ts':self._timestamp(time.perf_counter()),'pid':self.process_id,'args':{name:self.counters[name]}})
+
+    def exportTrace(self,filepath):
+        """
+        Écrire les événements enregistrés au format Chrome trace
+        :param filepath: chemin du fichier JSON
+        """
+        folder=os.path.dirname(filepath)
+        if folder:
+            os.makedirs(folder,exist_ok=True)
+        with self.lock:
+            trace={'traceEvents':list(self.events),'displayTimeUnit':'ms','otherData':{'counters':dict(self.counters),'peak_memory':self.peak_memory}}
+        with open(filepath,'w') as trace_file:
+            json.dump(trace,trace_file)
+
+    def getSummary(self):
+        """
+        :return: liste des lignes du résumé : étapes triées par durée totale décroissante, compteurs et pic de mémoire
+        """
+        with self.lock:
+            spans=sorted(self.spans.items(),key=lambda span:-span[1][1])
+            counters=sorted(self.counters.items())
+            peak_memory=self.peak_memory
+        lines=['{:<56}{:>8}{:>12}{:>12}'.format('Stage','Calls','Total (ms)','Max (ms)')]
+        for name,(calls,total_duration,maximal_duration) in spans:
+            lines.append('{:<56}{:>8}{:>12.1f}{:>12.1f}'.format(name,calls,total_duration*1000,maximal_duration*1000))
+        for name,value in counters:
+            lines.append('{:<56}{:>8}'.format(name,value))
+        if self.track_memory:
+            lines.append('Peak of allocated memory : '+str(round(peak_memory/1024**2,1))+' Mo')
+        return lines
+
+    def showSummary(self,term):
+        """
+        Afficher le résumé des mesures dans le terminal
+        :param term: terminal recevant les messages
+        """
+        term.addProcessMessage('Profiling summary\n'+'\n'.join(self.getSummary()))
+
+profiler=Profiler() # profileur partagé par tous les modules du processus
+
+def profiled(name,category=PROFILING_DEFAULT_CATEGORY):
+    """
+    Décorateur mesurant chaque appel d'une fonction avec le profileur partagé
+    :param name: nom de l'étape
+    :param category: catégorie de l'étape dans la trace
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args,**kwargs):
+            if not profiler.enabled:
+                return function(*args,**kwargs)
+            with _Span(profiler,name,category):
+                return function(*args,**kwargs)
+        return wrapper
+    return decorator
@@ -1,32 +1,172 @@
 import numpy as np
+import os
+import re
+from MeshDecimation import *
+from Profiler import *
 from configurations import *
 
+STL_BINARY_HEADER_SIZE=80 # octets, suivis du nombre de facettes codé sur 4 octets
+STL_BINARY_FACET_DTYPE=np.dtype([('normal','<f4',(3,)),('vertex','<f4',(3,3)),('attribute','<u2')])
+STL_ASCII_FACET_NORMAL_PATTERN=re.compile(rb'facet\s+normal\s+(\S+)\s+(\S+)\s+(\S+)')
+STL_ASCII_VERTEX_PATTERN=re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+
 class STLModel:
-    def __init__(self,filepath,term):
+    @profiled('STLModel.load','model')
+    def __init__(self,filepath,term,facets_data=None,indexed_mesh=INDEXED_MESH,cache=None):
+        """
+        :param filepath: chemin du fichier STL
+        :param term: terminal recevant les messages
+        :param facets_data: couple (sommets, normales) déjà extrait du fichier, qui n'est alors pas relu, ou triplet
+        (table des sommets, indices des triangles, normales) d'un maillage déjà indexé, utilisé sans copie
+        :param indexed_mesh: fusionner les sommets communs aux facettes (sinon les sommets de facets_data sont utilisés sans copie)
+        :param cache: objet ModelCache où le maillage est recherché avant de lire le fichier, puis enregistré
+        """
         self.term=term
-        self.term.addProcessMessage('STL file recovery')
-        self.term.addSubProcessMessage('STL file opening')
-        file=open(filepath)
-        self.term.addSubProcessMessage('STL file reading')
-        self.file_content=file.read().split('\n')
-        file.close()
-
-        self.vertex,self.facet_normal=self.extract_facets_data()
-        self.facets_number=len(self.vertex)
+        self.filepath=filepath
+        if facets_data is not None and len(facets_data)==3:
+            mesh_data,indexed_mesh=facets_data,True
+        else:
+            mesh_data=cache.loadMesh(filepath,indexed_mesh) if cache is not None and facets_data is None else None
+            if mesh_data is not None:
+                self.term.addProcessMessage('STL model recovery from the cache')
+        if mesh_data is not None:
+            vertices,triangles,self.facet_normal=mesh_data
+            vertex=vertices.reshape(-1,3,3) if not indexed_mesh else None
+        elif facets_data is None:
+            self.term.addProcessMessage('STL file recovery')
+            self.term.addSubProcessMessage('STL file opening')
+            self.is_binary=self.is_binary_stl(filepath)
+            self.term.addSubProcessMessage('STL file reading ('+('binary' if self.is_binary else 'ascii')+' format)')
+            vertex,self.facet_normal=self.extract_facets_data()
+        else:
+            vertex,self.facet_normal=facets_data
+        self.facets_number=len(triangles) if mesh_data is not None else len(vertex)
 
         if self.facets_number==0:
-            self.term.addErrorMessage('Invalid STL : the STL file must be in ascii format')
+            self.term.addErrorMessage('Invalid STL : no facet could be extracted from the file')
+            self.dense_vertex=vertex
         else:
-            self.vertex_flatten=self.vertex.reshape(3*self.facets_number,3)
-            X,Y,Z=self.vertex_flatten[:,0],self.vertex_flatten[:,1],self.vertex_flatten[:,2]
-            self.x_range=[min(X),max(X)]
-            self.y_range=[min(Y),max(Y)]
-            self.bottom_ref=min(Z)
-            self.height=max(Z)-self.bottom_ref
+            if mesh_data is not None:
+                self.vertices,self.triangles,self.dense_vertex=vertices,triangles,vertex
+            else:
+                self.index_vertices(vertex,indexed_mesh)
+                if cache is not None and facets_data is None:
+                    cache.storeMesh(filepath,indexed_mesh,self.vertices,self.triangles,self.facet_normal)
+            X,Y,Z=self.vertices[:,0],self.vertices[:,1],self.vertices[:,2]
+            self.x_range=[float(X.min()),float(X.max())]
+            self.y_range=[float(Y.min()),float(Y.max())]
+            self.bottom_ref=float(Z.min())
+            self.height=float(Z.max())-self.bottom_ref
 
             self.weight=DEFAULT_OBJECT_MASS*GRAVITY
 
-            self.sort_facets()
+            self.z_offset=0.0 # translation verticale du modèle, ajoutée aux sommets de la table seulement à la lecture
+            self.facets_sorted=False
+            self.z_max_tree=None # index des facettes selon leur altitude, construit au premier tri
+            self.facets_areas=None # surfaces des facettes, calculées à la première utilisation
+            self.levels_of_detail=None # maillages simplifiés pour l'affichage, construits à la première demande
+            profiler.count('facets loaded',self.facets_number)
+
+    @profiled('STLModel.index_vertices','model')
+    def index_vertices(self,vertex,indexed_mesh):
+        """
+        Construire la table des sommets et le tableau des indices des 3 sommets de chaque triangle
+        :param vertex: numpy array (n,3,3) des coordonnées des sommets de triangle
+        :param indexed_mesh: True pour ne garder qu'une fois chaque sommet commun à plusieurs facettes, False pour garder
+        un sommet par coin de facette, la table étant alors une vue sur vertex
+        """
+        if indexed_mesh:
+            self.term.addSubProcessMessage('Deduplication of vertices')
+            corners=vertex.reshape(-1,3)
+            # tri lexicographique des coins : les sommets identiques deviennent consécutifs
+            order=np.lexsort((corners[:,2],corners[:,1],corners[:,0]))
+            sorted_corners=corners[order]
+            is_new=np.empty(len(corners),dtype=bool)
+            is_new[0]=True
+            np.any(sorted_corners[1:]!=sorted_corners[:-1],axis=1,out=is_new[1:])
+            self.vertices=sorted_corners[is_new].astype(INDEXED_MESH_DTYPE,copy=False)
+            triangles=np.empty(len(corners),dtype=np.int32)
+            triangles[order]=np.cumsum(is_new)-1
+            self.triangles=triangles.reshape(-1,3)
+            self.dense_vertex=None
+            self.term.addInformativeMessage(str(len(self.vertices))+' unique vertices for '+str(self.facets_number)+' facets')
+        else:
+            self.vertices=vertex.reshape(-1,3)
+            self.triangles=np.arange(3*self.facets_number,dtype=np.int32).reshape(-1,3)
+            self.dense_vertex=vertex
+
+    def get_facets_vertex(self,triangles):
+        """
+        Recopier les coordonnées des sommets de triangles depuis la table des sommets, translation verticale comprise
+        :param triangles: numpy array (n,3) des indices des sommets des triangles
+        :return: numpy array (n,3,3) des coordonnées des sommets
+        """
+        vertex=self.vertices[triangles]
+        vertex[:,:,2]+=self.z_offset
+        return vertex
+
+    def get_facets_areas(self):
+        """
+        Calculer une seule fois les surfaces des facettes, qui ne changent ni par translation ni par rotation du modèle
+        :return: numpy array des surfaces des facettes
+        """
+        if self.facets_areas is None:
+            facets=self.vertices[self.triangles].astype(np.float64,copy=False)
+            self.facets_areas=np.linalg.norm(np.cross(facets[:,1]-facets[:,0],facets[:,2]-facets[:,0]),axis=1)/2
+        return self.facets_areas
+
+    @profiled('STLModel.build_levels_of_detail','model')
+    def build_levels_of_detail(self):
+        """
+        Construire par regroupement des sommets des maillages simplifiés, chacun ayant environ LOD_REDUCTION_FACTOR fois
+        moins de facettes que le précédent, jusqu'à LOD_MIN_FACETS facettes ; chaque niveau est simplifié à partir du
+        précédent et n'est utilisé que pour l'affichage
+        """
+        self.term.addSubProcessMessage('Simplification of the mesh for the display')
+        self.levels_of_detail=[]
+        vertices,triangles=self.vertices,self.triangles
+        target_facets_number=self.facets_number//LOD_REDUCTION_FACTOR
+        while target_facets_number>=LOD_MIN_FACETS:
+            vertices,triangles,normals=decimate_mesh(vertices,triangles,target_facets_number)
+            if len(triangles)==0:
+                break
+            self.levels_of_detail.append(STLModel(self.filepath,self.term,(vertices.astype(self.vertices.dtype,copy=False),triangles,normals)))
+            target_facets_number=len(triangles)//LOD_REDUCTION_FACTOR
+        self.term.addInformativeMessage('Levels of detail : '+' '.join(str(level.facets_number) for level in self.levels_of_detail)+' facets')
+
+    def get_level_of_detail(self,max_facets):
+        """
+        Choisir le maillage le plus détaillé ne dépassant pas max_facets facettes, placé à la même hauteur que le modèle
+        :param max_facets: nombre maximal de facettes (None pour le maillage complet)
+        :return: le modèle lui-même ou l'un de ses maillages simplifiés
+        """
+        if max_facets is None or self.facets_number<=max_facets:
+            return self
+        if self.levels_of_detail is None:
+            self.build_levels_of_detail()
+        if len(self.levels_of_detail)==0:
+            return self
+        level=next((level for level in self.levels_of_detail if level.facets_number<=max_facets),self.levels_of_detail[-1])
+        if level.z_offset!=self.z_offset:
+            # même repère de table des sommets : seul le décalage vertical est recopié, sans message
+            level.bottom_ref+=self.z_offset-level.z_offset
+            level.z_offset=self.z_offset
+            level.facets_sorted=False
+        return level
+
+    @property
+    def vertex(self):
+        """
+        numpy array (n,3,3) des coordonnées des sommets de triangle, recopié depuis la table des sommets sauf si le
+        maillage n'est pas indexé et n'a pas été translaté
+        """
+        if self.dense_vertex is not None and self.z_offset==0:
+            return self.dense_vertex
+        return self.get_facets_vertex(self.triangles)
+
+    @property
+    def vertex_flatten(self):
+        return self.vertex.reshape(-1,3)
 
     def setMass(self,mass):
         """
@@ -36,6 +176,33 @@ class STLModel:
         self.term.addInformativeMessage('Mass set to '+str(mass)+' kg')
         self.weight=mass*GRAVITY
 
+    def setDraught(self,draught):
+        """
+        Placer le modèle de sorte que son point le plus bas soit à la profondeur draught sous le niveau d'eau
+        :param draught: tirant d'eau souhaité
+        """
+        self.translateZ(-draught-self.bottom_ref)
+
+    @staticmethod
+    def is_binary_stl(filepath):
+        """
+        Déterminer si le fichier STL est au format binaire
+        Un STL binaire a une taille exactement égale à l'en-tête plus le nombre de facettes annoncé, ce qui permet
+        de reconnaître aussi les fichiers binaires dont l'en-tête commence par 'solid'
+        :param filepath: chemin du fichier STL
+        :return: True si le fichier est binaire, False s'il est ascii
+        """
+        file_size=os.path.getsize(filepath)
+        if file_size<STL_BINARY_HEADER_SIZE+4:
+            return False
+        with open(filepath,'rb') as file:
+            header=file.read(STL_BINARY_HEADER_SIZE)
+            facets_number=int(np.frombuffer(file.read(4),dtype='<u4')[0])
+        if file_size==STL_BINARY_HEADER_SIZE+4+facets_number*STL_BINARY_FACET_DTYPE.itemsize:
+            return True
+        return not header.lstrip().startswith(b'solid')
+
+    @profiled('STLModel.parse_STL_file','model')
     def extract_facets_data(self):
         """
         Extraire les informations essentielles du fichier STL
@@ -44,97 +211,287 @@ class STLModel:
         self.term.addProcessMessage('Extraction of the different facets data')
         self.term.addSubProcessMessage('Extraction of vertex coordinates')
         self.term.addSubProcessMessage('Extraction of normal vectors')
-        data_types=['facet normal','vertex']
-
-        vertex=[]
-        facet_normal=[]
-        for line in self.file_content:
-            if data_types[0] in line:
-                facet_normal.append([float(i) for i in line.split(' ')[-3:]])
-                vertex.append([])
-            elif data_types[1] in line:
-                vertex[-1].append([float(i) for i in line.split(' ')[-3:]])
+        if self.is_binary:
+            vertex,facet_normal=self.extract_binary_facets_data()
+        else:
+            vertex,facet_normal=self.extract_ascii_facets_data()
         self.term.addSuccessMessage('Extraction of the different facets data complete')
-        return np.array(vertex),np.array(facet_normal)
-    
+        return vertex,facet_normal
+
+    def extract_binary_facets_data(self):
+        """
+        Lire les facettes d'un STL binaire en une seule passe grâce à un dtype structuré projeté sur le fichier
+        :return: numpy array des coordonnées des sommets de triangle, numpy array des vecteurs normaux
+        """
+        facets_number=(os.path.getsize(self.filepath)-STL_BINARY_HEADER_SIZE-4)//STL_BINARY_FACET_DTYPE.itemsize
+        if facets_number<=0:
+            return np.empty((0,3,3)),np.empty((0,3))
+        facets=np.memmap(self.filepath,dtype=STL_BINARY_FACET_DTYPE,mode='r',offset=STL_BINARY_HEADER_SIZE+4,shape=(facets_number,))
+        vertex=np.array(facets['vertex'],dtype=np.float64)
+        facet_normal=np.array(facets['normal'],dtype=np.float64)
+        del facets
+        return vertex,facet_normal
+
+    def extract_ascii_facets_data(self):
+        """
+        Lire les facettes d'un STL ascii en extrayant tous les nombres d'un même type de ligne par expression régulière
+        :return: numpy array des coordonnées des sommets de triangle, numpy array des vecteurs normaux
+        """
+        with open(self.filepath,'rb') as file:
+            file_content=file.read()
+        facet_normal=np.array(STL_ASCII_FACET_NORMAL_PATTERN.findall(file_content),dtype=np.float64).reshape(-1,3)
+        vertex=np.array(STL_ASCII_VERTEX_PATTERN.findall(file_content),dtype=np.float64).reshape(-1,3)
+        if len(vertex)!=3*len(facet_normal):
+            self.term.addErrorMessage('Invalid STL : '+str(len(vertex))+' vertices found for '+str(len(facet_normal))+' facets')
+            return np.empty((0,3,3)),np.empty((0,3))
+        return vertex.reshape(-1,3,3),facet_normal
+
     def translateZ(self,delta):
         """
         Translater verticalement toutes les facettes du modele 3d
+        Seul le décalage vertical est mis à jour : la table des sommets n'est pas modifiée et le tri des facettes est
+        refait à la prochaine lecture des facettes emergées ou immergées
         :param delta: valeur de la translation (>0 vers le haut, <0 vers le bas)
         """
-        for vertex in self.vertex:
-            vertex[:,2]+=delta
+        self.z_offset+=delta
         self.bottom_ref+=delta
-        self.term.addInformativeMessage('3d model vertically translated by '+str(delta)+' m')
-        self.sort_facets()
+        self.facets_sorted=False
+        if self.term.isVerbose(TERMINAL_VERBOSITY_DETAILS):
+            self.term.addInformativeMessage('3d model vertically translated by '+str(delta)+' m')
 
-    def get_coordinates_intersection_point_fluid_leved_facet_side(self,A,B):
+    def get_coordinates_intersection_point_fluid_leved_facet_side(self,A,B,level=0):
         """
         A et B deux points de part et d'autre du niveau d'eau
-        Calculer les coordonnées du point I, point d'intersection entre le segment AB et le plan z=0
+        Calculer les coordonnées du point I, point d'intersection entre le segment AB et le plan z=level
+        A et B peuvent aussi être des numpy array de n points (n,3), les n intersections sont alors calculées d'un coup
         :param A: coordonnées du point A
         :param B: coordonnées du point B
+        :param level: altitude du niveau d'eau
         :return: coordonnées du point I
         """
-        Ax,Ay,Az=A
-        Bx,By,Bz=B
-        k=-Az/(Bz-Az)
-        return np.array([k*(Bx-Ax)+Ax,k*(By-Ay)+Ay,0])
+        k=(level-A[...,2])/(B[...,2]-A[...,2])
+        I=A+k[...,np.newaxis]*(B-A)
+        I[...,2]=level
+        return I
+
+    @profiled('STLModel.build_z_index','model')
+    def build_z_index(self):
+        """
+        Indexer les facettes selon leur altitude, dans le repère de la table des sommets (sans le décalage vertical) :
+        ordre des facettes par z minimal, ordre par z maximal, et arbre des z maximaux par blocs de 2^k facettes
+        consécutives dans l'ordre des z minimaux, qui permet de trouver les facettes coupées par un plan sans parcourir les autres
+        """
+        self.term.addSubProcessMessage('Indexing facets by altitude')
+        z=self.vertices[:,2][self.triangles]
+        self.facets_z_min,self.facets_z_max=z.min(axis=1),z.max(axis=1)
+        self.z_min_order=np.argsort(self.facets_z_min,kind='stable').astype(np.int32)
+        self.z_max_order=np.argsort(self.facets_z_max,kind='stable').astype(np.int32)
+        self.sorted_z_min=self.facets_z_min[self.z_min_order]
+        self.sorted_z_max=self.facets_z_max[self.z_max_order]
+        self.z_max_tree=[self.facets_z_max[self.z_min_order]]
+        while len(self.z_max_tree[-1])>1:
+            maxima=self.z_max_tree[-1]
+            if len(maxima)%2:
+                maxima=np.append(maxima,-np.inf)
+            self.z_max_tree.append(np.maximum(maxima[0::2],maxima[1::2]))
 
+    def get_crossing_facets_indices(self,level):
+        """
+        Trouver les facettes coupées par le plan z=level (repère de la table des sommets) en descendant l'arbre des z
+        maximaux : seuls les blocs contenant une facette qui commence sous le plan et finit au dessus sont explorés
+        :param level: altitude du plan
+        :return: numpy array des indices des facettes de z minimal < level < z maximal
+        """
+        below_number=np.searchsorted(self.sorted_z_min,level,side='left') # facettes de z minimal < level
+        blocks=np.zeros(1,dtype=np.intp)
+        for depth in range(len(self.z_max_tree)-1,-1,-1):
+            maxima=self.z_max_tree[depth]
+            blocks=blocks[(blocks<len(maxima))&(blocks<<depth<below_number)]
+            blocks=blocks[maxima[blocks]>level]
+            if depth>0:
+                blocks=np.stack([2*blocks,2*blocks+1],axis=1).ravel()
+        return self.z_min_order[blocks]
+
+    @profiled('STLModel.sort_facets','model')
     def sort_facets(self):
         """
         Trier les facettes en 2 groupes : emergées et immergées en fonction de la position de leurs sommets
-        :return: numpay array des facettes emergées, immergées, leurs normales et leur nombre
+        Grâce à l'index des altitudes, les facettes entièrement au dessus du plan d'eau sont la fin de l'ordre des z minimaux
+        et celles entièrement en dessous le début de l'ordre des z maximaux : seules les facettes coupées par le plan sont
+        recopiées puis découpées en triangles, cas par cas, sur toutes les facettes à la fois
         """
         self.term.addProcessMessage('Separation of emerged and submerged facets')
-        emerged_facets=[]
-
-        submerged_facets=[]
-        submerged_facet_normal=[]
-
-        for i in range(self.facets_number):
-            facet=self.vertex[i]
-            z=facet[:,2]
-            true_values=np.count_nonzero(z>=0)
-            false_values=np.count_nonzero(z<=0)
-            if true_values==3:
-                emerged_facets.append(facet)
-            elif false_values==3:
-                submerged_facets.append(facet)
-                submerged_facet_normal.append(self.facet_normal[i])
-            else:
-                sup=np.array([v for v in facet if v[2]>0])
-                inf=np.array([v for v in facet if v[2]<0])
-
-                sup_number=len(sup)
-                inf_number=len(inf)
-
-                if sup_number==1 and inf_number==1: # plan z=0 passe par le sommet d'une facette donc 1 seule intersection avec un côté
-                    A,B=sup[0],inf[0]
-                    C=np.array([v for v in facet if v[2]==0])[0]
-                    I=self.get_coordinates_intersection_point_fluid_leved_facet_side(A,B)
-                    emerged_facets.append(np.array([I,C,A]))
-                    submerged_facets.append(np.array([I,C,B]))
-                    submerged_facet_normal.append(self.facet_normal[i])
-                elif sup_number==2 and inf_number==1: # triangle avec 2 sommets au dessus du plan z=0 et 1 en dessous
-                    A,B=sup
-                    C=inf[0]
-                    I=self.get_coordinates_intersection_point_fluid_leved_facet_side(A,C)
-                    J=self.get_coordinates_intersection_point_fluid_leved_facet_side(B,C)
-                    emerged_facets.append(np.array([I,J,A]))
-                    emerged_facets.append(np.array([A,B,J]))
-                    submerged_facets.append(np.array([I,J,C]))
-                    submerged_facet_normal.append(self.facet_normal[i])
-                else: # facette avec 2 sommet au dessous de z=0 et 1 au dessus
-                    A, B = inf
-                    C = sup[0]
-                    I = self.get_coordinates_intersection_point_fluid_leved_facet_side(A,C)
-                    J = self.get_coordinates_intersection_point_fluid_leved_facet_side(B,C)
-                    emerged_facets.append(np.array([I,J,C]))
-                    submerged_facets.append(np.array([I,J,A]))
-                    submerged_facet_normal.append(self.facet_normal[i])
-                    submerged_facets.append(np.array([A, B, J]))
-                    submerged_facet_normal.append(self.facet_normal[i])
-        self.emerged_facets,self.submerged_facets,self.submerged_facet_normal=np.array(emerged_facets),np.array(submerged_facets),np.array(submerged_facet_normal)
-        self.submerged_facets_number=len(submerged_facets)
-        self.term.addSuccessMessage('Separation of emerged and submerged facets complete')
\ No newline at end of file
+        if self.z_max_tree is None:
+            self.build_z_index()
+        level=-self.z_offset # niveau d'eau dans le repère de la table des sommets
+
+        self.emerged_start=int(np.searchsorted(self.sorted_z_min,level,side='left'))
+        self.submerged_prefix_number=int(np.searchsorted(self.sorted_z_max,level,side='left'))
+        # facettes dont le sommet le plus haut est sur le plan d'eau : immergées si un autre sommet est en dessous
+        touching=self.z_max_order[self.submerged_prefix_number:np.searchsorted(self.sorted_z_max,level,side='right')]
+        self.submerged_touching_indices=touching[self.facets_z_min[touching]<level]
+
+        band=self.get_crossing_facets_indices(level)
+        profiler.count('facets clipped',len(band))
+        band_vertex=self.vertices[self.triangles[band]]
+        band_normal=self.facet_normal[band]
+        self.emerged_clipped_facets,self.submerged_clipped_facets,self.submerged_clipped_facet_normal,self.emerged_clipped_facet_normal=self.clip_facets(band_vertex,band_normal,level)
+        self.emerged_clipped_facets[:,:,2]+=self.z_offset
+        self.submerged_clipped_facets[:,:,2]+=self.z_offset
+        self.facets_sorted=True
+        self.term.addSuccessMessage('Separation of emerged and submerged facets complete')
+
+    @profiled('STLModel.clip_facets','model')
+    def clip_facets(self,band_vertex,band_normal,level=0):
+        """
+        Découper en triangles, cas par cas, des facettes coupées par le plan z=level, sur toutes les facettes à la fois
+        :param band_vertex: numpy array (n,3,3) des sommets des facettes, chacune ayant un sommet de part et d'autre du plan
+        :param band_normal: numpy array (n,3) de leurs normales
+        :param level: altitude du plan
+        :return: numpy array des morceaux emergés, des morceaux immergés, des normales des morceaux immergés et des
+        normales des morceaux emergés
+        """
+        above,below=band_vertex[:,:,2]>level,band_vertex[:,:,2]<level
+        sup_number=np.count_nonzero(above,axis=1)
+        inf_number=np.count_nonzero(below,axis=1)
+
+        # sommets réordonnés dans chaque facette : au dessus du plan, sur le plan puis en dessous (ordre d'origine conservé)
+        order=np.argsort(np.where(above,0,np.where(below,2,1)),axis=1,kind='mergesort')
+        ordered_vertex=np.take_along_axis(band_vertex,order[:,:,np.newaxis],axis=1)
+
+        emerged_facets=[np.empty((0,3,3),dtype=band_vertex.dtype)]
+        submerged_facets=[np.empty((0,3,3),dtype=band_vertex.dtype)]
+        submerged_facet_normal=[np.empty((0,3),dtype=band_normal.dtype)]
+        emerged_facet_normal=[np.empty((0,3),dtype=band_normal.dtype)]
+
+        # plan d'eau passe par le sommet d'une facette donc 1 seule intersection avec un côté
+        crossing=(sup_number==1)&(inf_number==1)
+        A,C,B=ordered_vertex[crossing,0],ordered_vertex[crossing,1],ordered_vertex[crossing,2]
+        I=self.get_coordinates_intersection_point_fluid_leved_facet_side(A,B,level)
+        emerged_facets.append(np.stack([I,C,A],axis=1))
+        submerged_facets.append(np.stack([I,C,B],axis=1))
+        submerged_facet_normal.append(band_normal[crossing])
+        emerged_facet_normal.append(band_normal[crossing])
+
+        # triangle avec 2 sommets au dessus du plan d'eau et 1 en dessous
+        crossing=(sup_number==2)&(inf_number==1)
+        A,B,C=ordered_vertex[crossing,0],ordered_vertex[crossing,1],ordered_vertex[crossing,2]
+        I=self.get_coordinates_intersection_point_fluid_leved_facet_side(A,C,level)
+        J=self.get_coordinates_intersection_point_fluid_leved_facet_side(B,C,level)
+        emerged_facets.append(np.stack([I,J,A],axis=1))
+        emerged_facets.append(np.stack([A,B,J],axis=1))
+        submerged_facets.append(np.stack([I,J,C],axis=1))
+        submerged_facet_normal.append(band_normal[crossing])
+        emerged_facet_normal.append(band_normal[crossing])
+        emerged_facet_normal.append(band_normal[crossing])
+
+        # facette avec 2 sommet au dessous du plan d'eau et 1 au dessus
+        crossing=(sup_number==1)&(inf_number==2)
+        C,A,B=ordered_vertex[crossing,0],ordered_vertex[crossing,1],ordered_vertex[crossing,2]
+        I=self.get_coordinates_intersection_point_fluid_leved_facet_side(A,C,level)
+        J=self.get_coordinates_intersection_point_fluid_leved_facet_side(B,C,level)
+        emerged_facets.append(np.stack([I,J,C],axis=1))
+        submerged_facets.append(np.stack([I,J,A],axis=1))
+        submerged_facets.append(np.stack([A,B,J],axis=1))
+        submerged_facet_normal.append(band_normal[crossing])
+        submerged_facet_normal.append(band_normal[crossing])
+        emerged_facet_normal.append(band_normal[crossing])
+
+        return np.concatenate(emerged_facets),np.concatenate(submerged_facets),np.concatenate(submerged_facet_normal),np.concatenate(emerged_facet_normal)
+
+    def update_sorted_facets(self):
+        """
+        Trier les facettes si le modèle a été translaté depuis le dernier tri
+        """
+        if not self.facets_sorted:
+            self.sort_facets()
+
+    @property
+    def emerged_facets(self):
+        """
+        numpy array (n,3,3) des facettes emergées : facettes entières puis morceaux découpés
+        """
+        self.update_sorted_facets()
+        return np.concatenate([self.get_facets_vertex(self.triangles[self.z_min_order[self.emerged_start:]]),self.emerged_clipped_facets])
+
+    @property
+    def emerged_facet_normal(self):
+        """
+        numpy array (n,3) des normales des facettes emergées, dans le même ordre que emerged_facets
+        """
+        self.update_sorted_facets()
+        return np.concatenate([self.facet_normal[self.z_min_order[self.emerged_start:]],self.emerged_clipped_facet_normal])
+
+    @property
+    def submerged_whole_facets_indices(self):
+        self.update_sorted_facets()
+        return np.concatenate([self.z_max_order[:self.submerged_prefix_number],self.submerged_touching_indices])
+
+    @property
+    def submerged_facets(self):
+        """
+        numpy array (n,3,3) des facettes immergées : facettes entières puis morceaux découpés
+        """
+        return np.concatenate([self.get_facets_vertex(self.triangles[self.submerged_whole_facets_indices]),self.submerged_clipped_facets])
+
+    @property
+    def submerged_facet_normal(self):
+        """
+        numpy array (n,3) des normales des facettes immergées, dans le même ordre que submerged_facets
+        """
+        return np.concatenate([self.facet_normal[self.submerged_whole_facets_indices],self.submerged_clipped_facet_normal])
+
+    @property
+    def submerged_band_facets(self):
+        """
+        numpy array (n,3,3) des facettes immergées hors du début de l'ordre des z maximaux (submerged_prefix_number
+        premières facettes) : facettes entières touchant le plan d'eau puis morceaux découpés
+        """
+        self.update_sorted_facets()
+        return np.concatenate([self.get_facets_vertex(self.triangles[self.submerged_touching_indices]),self.submerged_clipped_facets])
+
+    @property
+    def submerged_band_facet_normal(self):
+        self.update_sorted_facets()
+        return np.concatenate([self.facet_normal[self.submerged_touching_indices],self.submerged_clipped_facet_normal])
+
+    @property
+    def submerged_facets_number(self):
+        self.update_sorted_facets()
+        return self.submerged_prefix_number+len(self.submerged_touching_indices)+len(self.submerged_clipped_facets)
+
+    def snapshot(self,max_facets=None):
+        """
+        Figer l'état courant du modèle pour l'affichage
+        :param max_facets: nombre maximal de facettes recopiées, un maillage simplifié étant figé au delà
+        :return: objet STLModelSnapshot
+        """
+        return STLModelSnapshot(self,self.get_level_of_detail(max_facets))
+
+class STLModelSnapshot:
+    """
+    Copie figée de l'état d'un STLModel à une étape de la simulation (étendue, position, facettes découpées), qui peut
+    être affichée ou envoyée à un autre processus pendant que le modèle continue d'être déplacé
+    Les facettes emergées et immergées y sont recopiées depuis la table des sommets, le décalage vertical du modèle appliqué
+    """
+    def __init__(self,stl_model,displayed_model=None):
+        """
+        :param stl_model: modèle dont l'étendue et la position sont figées
+        :param displayed_model: niveau de détail du modèle dont les facettes sont figées (le modèle lui-même par défaut)
+        """
+        displayed_model=displayed_model if displayed_model is not None else stl_model
+        self.x_range=list(stl_model.x_range)
+        self.y_range=list(stl_model.y_range)
+        self.height=stl_model.height
+        self.bottom_ref=stl_model.bottom_ref
+        self.emerged_facets=displayed_model.emerged_facets
+        self.emerged_facet_normal=displayed_model.emerged_facet_normal
+        self.submerged_facets=displayed_model.submerged_facets
+        self.submerged_facet_normal=displayed_model.submerged_facet_normal
+        self.submerged_facets_number=displayed_model.submerged_facets_number
+
+    def get_level_of_detail(self,max_facets):
+        """
+        :return: l'instantané lui-même, dont les facettes ont déjà été simplifiées à sa création
+        """
+        return self
\ No newline at end of file
@@ -1,43 +1,220 @@
 # import matplotlib; matplotlib.use("TkAgg")
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
-from PIL import Image
+from AnimationWriter import *
+import numpy as np
 import os
+from Profiler import *
+from SoftwareRenderer import *
 from configurations import *
 
+_frames_renderer=None # STLModelDisplay propre à chaque processus de rendu, dont les figures sont réutilisées d'une image à l'autre
+
+def _renderSimulationStep(step):
+    """
+    Rasteriser dans un processus de rendu les deux images d'une étape de la simulation
+    :param step: tuple (instantané du modèle, liste des tirants d'eau jusqu'à cette étape, afficher le tirant d'eau, précision)
+    :return: image du graphique 3d, image du graphique du tirant d'eau
+    """
+    global _frames_renderer
+    snapshot,Y,show_draught,dichotomy_precision=step
+    if _frames_renderer is None:
+        _frames_renderer=STLModelDisplay(snapshot,None)
+    _frames_renderer.stl_model=snapshot
+    return _frames_renderer.renderSTLModelGraph(show_draught),_frames_renderer.renderDraughGraph(list(range(len(Y))),Y,dichotomy_precision)
+
 class STLModelDisplay:
-    def __init__(self,stl_model,term):
+    def __init__(self,stl_model,term,max_facets=None):
+        """
+        :param stl_model: modèle affiché (STLModel ou STLModelSnapshot)
+        :param term: terminal recevant les messages
+        :param max_facets: nombre maximal de facettes affichées, un maillage simplifié étant affiché au delà (d'après la
+        taille des figures par défaut, sans limite si LOD_ENABLED est faux)
+        """
         self.stl_model=stl_model
         self.term=term
+        self.max_facets=max_facets if max_facets is not None else self.getFacetsBudget()
+        self.view_elev=VIEW_ELEV
+        self.view_azim=VIEW_AZIM
 
-    def prepareSTLModelGraph(self,show_draught=False):
+        self.stl_model_figure=None
+        self.draught_figure=None
+        self.software_renderer=None
+        self.software_rendered_model=None # modèle affiché et hauteur dont les facettes sont chargées dans le rendu logiciel
+
+    @staticmethod
+    def getFigurePixels():
         """
-        Créer le graphique 3d pour le fichier STL
-        :param show_draught: afficher ou non le trait permettant de visualiser le tirant d'eau
-        :return: l'objet figure
+        :return: largeur et hauteur en pixels d'une figure de la taille par défaut
+        """
+        width,height=plt.rcParams['figure.figsize']
+        dpi=plt.rcParams['figure.dpi']
+        return int(round(width*dpi)),int(round(height*dpi))
+
+    @staticmethod
+    def getFacetsBudget():
+        """
+        :return: nombre de facettes au delà duquel les détails ne sont plus visibles dans une figure de la taille par
+        défaut (LOD_PIXELS_PER_FACET pixels par facette), None si les niveaux de détail sont désactivés
+        """
+        if not LOD_ENABLED:
+            return None
+        width,height=STLModelDisplay.getFigurePixels()
+        return int(width*height/LOD_PIXELS_PER_FACET)
+
+    def orbit(self,delta_azim,delta_elev):
+        """
+        Tourner le point de vue du graphique 3d autour du modèle
+        :param delta_azim: variation de l'azimut en degrés
+        :param delta_elev: variation de l'élévation en degrés, l'élévation restant entre -90° et 90°
+        """
+        self.view_azim=(self.view_azim+delta_azim)%360
+        self.view_elev=min(max(self.view_elev+delta_elev,-90),90)
+
+    def getDisplayedModel(self):
+        """
+        :return: niveau de détail du modèle adapté à la taille des figures, placé à la même hauteur que le modèle
+        """
+        return self.stl_model.get_level_of_detail(self.max_facets)
+
+    def _setupSTLModelAxis(self,axis):
+        """
+        Régler les étiquettes, le point de vue et les limites du graphique 3d
+        :param axis: axes 3d à régler
         """
-        fig=plt.figure()
-        axis = fig.add_subplot(projection='3d')
         axis.set_xlabel('x-axis')
         axis.set_ylabel('y-axis')
         axis.set_zlabel('z-axis')
 
-        axis.view_init(elev=VIEW_ELEV, azim=VIEW_AZIM)
+        axis.view_init(elev=self.view_elev, azim=self.view_azim)
 
         axis.set_xlim3d(self.stl_model.x_range[0] - X_MARGIN, self.stl_model.x_range[1] + X_MARGIN)
         axis.set_ylim3d(self.stl_model.y_range[0] - Y_MARGIN, self.stl_model.y_range[1] + Y_MARGIN)
         axis.set_zlim3d(-self.stl_model.height if self.stl_model.height!=0 else -1,self.stl_model.height if self.stl_model.height!=0 else 1)
 
-        submerged_facets_flatten = self.stl_model.submerged_facets.reshape(3 * self.stl_model.submerged_facets_number,3)
-        axis.add_collection3d(Poly3DCollection(submerged_facets_flatten, linewidths=0.4, edgecolors=SUBMERGED_PART_BORDER_COLOR, facecolors=SUBMERGED_PART_COLOR))
+    def _setupDraughtAxis(self,axis):
+        """
+        Régler le titre, les étiquettes et les limites du graphique 2d du tirant d'eau
+        :param axis: axes 2d à régler
+        """
+        axis.set_title('Draught\'s evolution')
+        axis.set_xlabel('Number of iterations of the dichotomy algorithm')
+        axis.set_ylabel('Draught (m)')
+        axis.set_ylim(0,self.stl_model.height if self.stl_model.height!=0 else 1)
+
+    def _draughtText(self,Y,dichotomy_precision):
+        """
+        :return: texte de la valeur courante du tirant d'eau, arrondie à la précision
+        """
+        return 'Current draught value : '+str(round(Y[-1],str(float(dichotomy_precision)).count('0')))+' m'
+
+    def prepareSTLModelGraph(self,show_draught=False):
+        """
+        Créer le graphique 3d pour le fichier STL
+        :param show_draught: afficher ou non le trait permettant de visualiser le tirant d'eau
+        :return: l'objet figure
+        """
+        fig=plt.figure()
+        axis = fig.add_subplot(projection='3d')
+        self._setupSTLModelAxis(axis)
+        displayed_model=self.getDisplayedModel()
+
+        axis.add_collection3d(Poly3DCollection(displayed_model.submerged_facets, linewidths=0.4, edgecolors=SUBMERGED_PART_BORDER_COLOR, facecolors=SUBMERGED_PART_COLOR))
 
-        emerged_facets_flatten = self.stl_model.emerged_facets.reshape(3 * len(self.stl_model.emerged_facets), 3)
-        axis.add_collection3d(Poly3DCollection(emerged_facets_flatten, linewidths=0.4, edgecolors=EMERGED_PART_BORDER_COLOR, facecolors=EMERGED_PART_COLOR))
+        axis.add_collection3d(Poly3DCollection(displayed_model.emerged_facets, linewidths=0.4, edgecolors=EMERGED_PART_BORDER_COLOR, facecolors=EMERGED_PART_COLOR))
 
         if show_draught:
             axis.quiver(0,self.stl_model.y_range[0]-Y_MARGIN/2, 0, 0, 0, -1, length=-self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0, color=DRAUGHT_LINE_COLOR, arrow_length_ratio=0,pivot='tail')
         return fig
 
+    @profiled('STLModelDisplay.prepareRenderingContext','display')
+    def prepareRenderingContext(self):
+        """
+        Créer une seule fois les figures hors écran (moteur Agg, sans l'état global de pyplot) et leurs objets graphiques,
+        dont seules les données sont ensuite mises à jour à chaque image ; chaque instance ayant ses propres figures,
+        le rendu peut se faire depuis un autre thread
+        """
+        self.stl_model_figure=Figure()
+        FigureCanvasAgg(self.stl_model_figure)
+        axis=self.stl_model_figure.add_subplot(projection='3d')
+        self._setupSTLModelAxis(axis)
+        self.stl_model_axis=axis
+        displayed_model=self.getDisplayedModel()
+        self.submerged_collection=Poly3DCollection(displayed_model.submerged_facets, linewidths=0.4, edgecolors=SUBMERGED_PART_BORDER_COLOR, facecolors=SUBMERGED_PART_COLOR)
+        axis.add_collection3d(self.submerged_collection)
+        self.emerged_collection=Poly3DCollection(displayed_model.emerged_facets, linewidths=0.4, edgecolors=EMERGED_PART_BORDER_COLOR, facecolors=EMERGED_PART_COLOR)
+        axis.add_collection3d(self.emerged_collection)
+        self.draught_segment_y=self.stl_model.y_range[0]-Y_MARGIN/2
+        self.draught_segment,=axis.plot([0,0],[self.draught_segment_y,self.draught_segment_y],[0,0],color=DRAUGHT_LINE_COLOR)
+
+        self.draught_figure=Figure()
+        FigureCanvasAgg(self.draught_figure)
+        self.draught_axis=self.draught_figure.add_subplot()
+        self._setupDraughtAxis(self.draught_axis)
+        self.draught_line,=self.draught_axis.plot([],[],marker='p',color=DRAUGHT_LINE_COLOR)
+        self.draught_text=self.draught_axis.text(0,self.stl_model.height*0.9 if self.stl_model.height!=0 else 0.9,'',color=DRAUGHT_LINE_COLOR)
+
+    @profiled('STLModelDisplay.rasterize_figure','display')
+    def _rasterizeFigure(self,fig):
+        """
+        Rasteriser une figure avec le moteur Agg
+        :param fig: l'objet figure, attaché à un FigureCanvasAgg
+        :return: image sous forme de tuple (largeur, hauteur, octets RGBA)
+        """
+        fig.canvas.draw()
+        width,height=fig.canvas.get_width_height()
+        return (width,height,bytes(fig.canvas.buffer_rgba()))
+
+    @profiled('STLModelDisplay.renderSTLModelGraph','display')
+    def renderSTLModelGraph(self,show_draught=False):
+        """
+        Rasteriser en mémoire le graphique 3d du fichier STL en mettant à jour les facettes de la figure persistante
+        Au delà de max_facets facettes, celles d'un maillage simplifié sont affichées : la durée du rendu est bornée
+        Avec RENDER_BACKEND='software', le rendu logiciel numpy remplace matplotlib (renderSoftwareSTLModelGraph)
+        :param show_draught: afficher ou non le trait permettant de visualiser le tirant d'eau
+        :return: image sous forme de tuple (largeur, hauteur, octets RGBA)
+        """
+        if RENDER_BACKEND=='software':
+            return self.renderSoftwareSTLModelGraph(show_draught)
+        if self.stl_model_figure is None:
+            self.prepareRenderingContext()
+        displayed_model=self.getDisplayedModel()
+        self.stl_model_axis.view_init(elev=self.view_elev, azim=self.view_azim)
+        self.submerged_collection.set_verts(displayed_model.submerged_facets)
+        self.emerged_collection.set_verts(displayed_model.emerged_facets)
+        self.draught_segment.set_visible(show_draught)
+        if show_draught:
+            draught=-self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0
+            self.draught_segment.set_data_3d([0,0],[self.draught_segment_y,self.draught_segment_y],[0,-draught])
+        return self._rasterizeFigure(self.stl_model_figure)
+
+    @profiled('STLModelDisplay.renderSoftwareSTLModelGraph','display')
+    def renderSoftwareSTLModelGraph(self,show_draught=False):
+        """
+        Rasteriser le graphique 3d avec le rendu logiciel numpy (sans axes) : les facettes ne sont rechargées que si le
+        modèle affiché ou sa hauteur a changé, si bien que tourner autour du modèle ne fait que projeter et rasteriser
+        :param show_draught: afficher ou non le trait permettant de visualiser le tirant d'eau
+        :return: image sous forme de tuple (largeur, hauteur, octets RGBA)
+        """
+        if self.software_renderer is None:
+            self.software_renderer=SoftwareRenderer(*self.getFigurePixels())
+        displayed_model=self.getDisplayedModel()
+        if self.software_rendered_model is None or self.software_rendered_model[0] is not displayed_model or self.software_rendered_model[1]!=self.stl_model.bottom_ref:
+            self.software_renderer.setMesh([(displayed_model.submerged_facets,displayed_model.submerged_facet_normal,SUBMERGED_PART_COLOR),
+                                            (displayed_model.emerged_facets,displayed_model.emerged_facet_normal,EMERGED_PART_COLOR)])
+            self.software_rendered_model=(displayed_model,self.stl_model.bottom_ref)
+        # vue centrée sur le modèle au niveau de l'eau, à une échelle qui ne dépend ni du point de vue ni du tirant d'eau
+        x_range,y_range=self.stl_model.x_range,self.stl_model.y_range
+        self.software_renderer.setScene([(x_range[0]+x_range[1])/2,(y_range[0]+y_range[1])/2,0],
+                                        np.linalg.norm([(x_range[1]-x_range[0])/2,(y_range[1]-y_range[0])/2,self.stl_model.height]))
+        segments=[]
+        if show_draught:
+            draught=-self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0
+            draught_segment_y=self.stl_model.y_range[0]-Y_MARGIN/2
+            segments.append((np.array([[0,draught_segment_y,0],[0,draught_segment_y,-draught]]),DRAUGHT_LINE_COLOR))
+        return self.software_renderer.render(self.view_elev,self.view_azim,segments)
 
     def showSTLModel(self,show_draught=False):
         """
@@ -50,19 +227,6 @@ class STLModelDisplay:
         plt.close(fig)
         self.term.addSuccessMessage('3d model displayed')
 
-    def saveSTLModelGraph(self,folder,filename,show_draught=False):
-        """
-        Enregistrer une image du graphique 3d du fichier STL
-        :param folder: dossier destiné à accueillir l'image
-        :param filename: nom à donner au fichier image
-        :param show_draught: afficher ou non le trait permettant de visualiser le tirant d'eau
-        """
-        self.term.addProcessMessage('Recording the 3d graph \''+folder+filename+'.png\'')
-        fig=self.prepareSTLModelGraph(show_draught)
-        plt.savefig(folder+filename)
-        plt.close(fig)
-        self.term.addSuccessMessage('3d graph saved')
-
     def prepareDraughGraph(self,X,Y,dichotomy_precision):
         """
         Créer le graphique 2d pour tracer la courbe de l'évolution du tirant d'eau
@@ -73,18 +237,31 @@ class STLModelDisplay:
         fig = plt.figure()
 
         axis = fig.add_subplot()
-
-        axis.set_title('Draught\'s evolution')
-        axis.set_xlabel('Number of iterations of the dichotomy algorithm')
-        axis.set_ylabel('Draught (m)')
+        self._setupDraughtAxis(axis)
         axis.set_xticks(X)
-        axis.set_ylim(0,self.stl_model.height if self.stl_model.height!=0 else 1)
 
         axis.plot(X,Y,marker='p',color=DRAUGHT_LINE_COLOR)
-        plt.text(0,self.stl_model.height*0.9 if self.stl_model.height!=0 else 0.9,'Current draught value : '+str(round(Y[-1],str(float(dichotomy_precision)).count('0')))+' m',color=DRAUGHT_LINE_COLOR)
+        plt.text(0,self.stl_model.height*0.9 if self.stl_model.height!=0 else 0.9,self._draughtText(Y,dichotomy_precision),color=DRAUGHT_LINE_COLOR)
 
         return fig
 
+    @profiled('STLModelDisplay.renderDraughGraph','display')
+    def renderDraughGraph(self,X,Y,dichotomy_precision):
+        """
+        Rasteriser en mémoire le graphique 2d du tirant d'eau en mettant à jour la courbe de la figure persistante
+        :param X: liste des valeurs pour l'axe des abscisses
+        :param Y: liste des valeurs pour l'axe des ordonnées
+        :return: image sous forme de tuple (largeur, hauteur, octets RGBA)
+        """
+        if self.draught_figure is None:
+            self.prepareRenderingContext()
+        self.draught_line.set_data(X,Y)
+        self.draught_axis.set_xticks(X)
+        self.draught_axis.relim()
+        self.draught_axis.autoscale_view(scaley=False)
+        self.draught_text.set_text(self._draughtText(Y,dichotomy_precision))
+        return self._rasterizeFigure(self.draught_figure)
+
     def showDraughGraph(self,X,Y,dichotomy_precision):
         """
         Afficher le graphique 2d pour visualiser l'évolution du tirant d'eau en fonction du nombre de dichotomie effectuée
@@ -97,22 +274,113 @@ class STLModelDisplay:
         plt.close(fig)
         self.term.addSuccessMessage('Draught graph displayed')
 
-    def saveDraughGraph(self,filename,X,Y,dichotomy_precision):
+    def prepareGZGraph(self,heels,righting_levers):
+        """
+        Créer le graphique 2d de la courbe de stabilité (bras de levier de redressement GZ en fonction de la gîte)
+        :param heels: liste des gîtes en degrés
+        :param righting_levers: liste des bras de levier GZ correspondants
+        :return: l'objet figure
         """
-        Enregistrer une image du graphique 2d du tirant d'eau
+        fig = plt.figure()
+
+        axis = fig.add_subplot()
+        axis.set_title('Righting lever curve')
+        axis.set_xlabel('Heel (°)')
+        axis.set_ylabel('GZ (m)')
+        axis.axhline(0,color='black',linewidth=0.8)
+        axis.grid(True)
+
+        axis.plot(heels,righting_levers,color=GZ_LINE_COLOR)
+        maximum=int(np.argmax(righting_levers))
+        axis.plot(heels[maximum],righting_levers[maximum],marker='p',color=DRAUGHT_LINE_COLOR)
+        axis.text(0.02,0.94,'Maximal GZ : '+str(round(float(righting_levers[maximum]),3))+' m at '+str(heels[maximum])+'°',transform=axis.transAxes,color=DRAUGHT_LINE_COLOR)
+
+        return fig
+
+    def showGZGraph(self,heels,righting_levers):
+        """
+        Afficher le graphique 2d de la courbe de stabilité
+        :param heels: liste des gîtes en degrés
+        :param righting_levers: liste des bras de levier GZ correspondants
+        """
+        self.term.addProcessMessage('Preparing the display of the righting lever curve')
+        fig=self.prepareGZGraph(heels,righting_levers)
+        plt.show()
+        plt.close(fig)
+        self.term.addSuccessMessage('Righting lever curve displayed')
+
+    @profiled('STLModelDisplay.saveGZGraph','display')
+    def saveGZGraph(self,filename,heels,righting_levers):
+        """
+        Enregistrer une image du graphique 2d de la courbe de stabilité
         :param filename: nom à donner au fichier image
-        :param X: liste des valeurs pour l'axe des abscisses
-        :param Y: liste des valeurs pour l'axe des ordonnées
+        :param heels: liste des gîtes en degrés
+        :param righting_levers: liste des bras de levier GZ correspondants
         """
-        self.term.addProcessMessage('Recording the 2d graph \''+DRAUGHT_GRAPHS_FOLDER+filename+'.png\'')
-        fig=self.prepareDraughGraph(X,Y,dichotomy_precision)
-        plt.savefig(DRAUGHT_GRAPHS_FOLDER + filename)
+        self.term.addProcessMessage('Recording the 2d graph \''+GZ_GRAPHS_FOLDER+filename+'.png\'')
+        os.makedirs(GZ_GRAPHS_FOLDER,exist_ok=True)
+        fig=self.prepareGZGraph(heels,righting_levers)
+        plt.savefig(GZ_GRAPHS_FOLDER+filename+'.png')
         plt.close(fig)
         self.term.addSuccessMessage('2d graph saved')
 
-    def generateGIFAnimations(self):
+    def prepareHydrostaticsGraph(self,table):
         """
-        Génerer les GIF avec les images contenues dans les dossiers en question
+        Créer les courbes hydrostatiques, le tirant d'eau étant en ordonnée de chaque graphique
+        :param table: tableau hydrostatique (dictionnaire renvoyé par STLModelHydrostatics.calc_hydrostatics_table)
+        :return: l'objet figure
+        """
+        fig,axes=plt.subplots(2,3,sharey=True,figsize=(12,8))
+        fig.suptitle('Hydrostatic curves')
+        curves=[('Displacement (t)',['displacement']),
+                ('Vertical centres (m)',['KB','KMt']),
+                ('Longitudinal centres (m)',['LCB','LCF']),
+                ('Waterplane area (m²)',['waterplane_area']),
+                ('TPC (t/cm)',['TPC']),
+                ('MCT (t.m/cm)',['MCT'])]
+        for axis,(label,fields) in zip(axes.ravel(),curves):
+            for field,color in zip(fields,[GZ_LINE_COLOR,DRAUGHT_LINE_COLOR]):
+                axis.plot(table[field],table['draught'],color=color,label=field)
+            axis.set_xlabel(label)
+            axis.grid(True)
+            if len(fields)>1:
+                axis.legend()
+        for axis in axes[:,0]:
+            axis.set_ylabel('Draught (m)')
+        fig.tight_layout()
+        return fig
+
+    def showHydrostaticsGraph(self,table):
+        """
+        Afficher les courbes hydrostatiques
+        :param table: tableau hydrostatique
+        """
+        self.term.addProcessMessage('Preparing the display of the hydrostatic curves')
+        fig=self.prepareHydrostaticsGraph(table)
+        plt.show()
+        plt.close(fig)
+        self.term.addSuccessMessage('Hydrostatic curves displayed')
+
+    @profiled('STLModelDisplay.saveHydrostaticsGraph','display')
+    def saveHydrostaticsGraph(self,filename,table):
+        """
+        Enregistrer une image des courbes hydrostatiques
+        :param filename: nom à donner au fichier image
+        :param table: tableau hydrostatique
+        """
+        self.term.addProcessMessage('Recording the hydrostatic curves \''+HYDROSTATICS_GRAPHS_FOLDER+filename+'.png\'')
+        os.makedirs(HYDROSTATICS_GRAPHS_FOLDER,exist_ok=True)
+        fig=self.prepareHydrostaticsGraph(table)
+        plt.savefig(HYDROSTATICS_GRAPHS_FOLDER+filename+'.png')
+        plt.close(fig)
+        self.term.addSuccessMessage('Hydrostatic curves saved')
+
+    @profiled('STLModelDisplay.generateAnimations','display')
+    def generateGIFAnimations(self,stl_model_frames,draught_frames):
+        """
+        Génerer les GIF avec les images conservées en mémoire
+        :param stl_model_frames: FrameStore des images du graphique 3d
+        :param draught_frames: FrameStore des images du graphique du tirant d'eau
         """
         animations=os.listdir(ANIMATIONS_FOLDER)
         if len(animations)==0:
@@ -122,36 +390,32 @@ class STLModelDisplay:
             animations_saved_number=animations[-1]
         new_animation_folder=ANIMATIONS_FOLDER+ANIMATION_FOLDER_BASENAME+str(animations_saved_number+1)+'/'
         os.mkdir(new_animation_folder)
-        self.term.addProcessMessage('Creation of animations in gif format')
+        self.term.addProcessMessage('Creation of animations in '+ANIMATION_FORMAT+' format')
         self.term.addSubProcessMessage('Creation of the animation of the 3d model')
-        self._generateGIFAnimationFromFolder(STL_MODEL_GRAPHS_FOLDER,new_animation_folder,'3d_model_animation')
+        self._generateAnimationFromFrames(stl_model_frames,new_animation_folder,'3d_model_animation')
         self.term.addSubProcessMessage('Creation of the animation of the draught graph')
-        self._generateGIFAnimationFromFolder(DRAUGHT_GRAPHS_FOLDER,new_animation_folder,'draught_evolution_animation')
+        self._generateAnimationFromFrames(draught_frames,new_animation_folder,'draught_evolution_animation')
         self.term.addSuccessMessage('Creation of animations complete\nFiles saved in \''+new_animation_folder+'\'')
 
-    def _generateGIFAnimationFromFolder(self,fromfolder,tofolder,filename):
+    def _generateAnimationFromFrames(self,frames,tofolder,filename):
         """
-        Récupérer les images du dossier fromfolder, créer un GIF nommée filename et le sauvegarder dans tofolder
-        :param fromfolder: dossier contenant les images
-        :param tofolder: dossier dans lequel sera enregistré le GIF
-        :param filename: nom du fichier GIF enregistré
-        :return:
+        Encoder image par image l'animation nommée filename à partir des images en mémoire et la sauvegarder dans tofolder
+        :param frames: FrameStore contenant les images
+        :param tofolder: dossier dans lequel sera enregistrée l'animation
+        :param filename: nom du fichier enregistré, sans extension
         """
-        frames = os.listdir(fromfolder)
         frames_number = len(frames)
         if frames_number == 0:
-            self.term.addErrorMessage('Impossible to generate the animation from \'' + fromfolder + '\' : no recorded frames')
+            self.term.addErrorMessage('Impossible to generate the animation \'' + filename + '\' : no recorded frames')
             return
-        frames = sorted(frames, key=lambda frame: int(frame.replace(FRAMES_BASENAME,'').split('.')[0]))
-        converted_frames = [Image.open(fromfolder + frame) for frame in frames]
-        converted_frames[0].save(tofolder+filename+'.gif', format='GIF', append_images=converted_frames[1:], save_all=True, duration=GIF_DELAY_BETWEEN_TWO_FRAMES * frames_number, optimize=True, loop=0)
-
-    def emptyFolder(self,folder):
-        """
-        Vider le dossier folder
-        :param folder: chemin et nom du dossier à vider
-        """
-        frames = os.listdir(folder)
-        if len(frames) != 0:
+        writer,path = openAnimationWriter(tofolder+filename, ANIMATION_FORMAT, GIF_DELAY_BETWEEN_TWO_FRAMES * frames_number)
+        if writer is None:
+            self.term.addErrorMessage('Impossible to generate the animation \'' + filename + '\' : the '+ANIMATION_FORMAT+' format requires ffmpeg')
+            return
+        try:
             for frame in frames:
-                os.remove(folder + frame)
\ No newline at end of file
+                with profiler.span('AnimationWriter.addFrame','io'):
+                    writer.addFrame(frame)
+                profiler.count('frames written')
+        finally:
+            writer.close()
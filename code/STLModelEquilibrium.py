@@ -0,0 +1,307 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from STLModel import *
+from Profiler import *
+from STLModelPressure import *
+from configurations import *
+
+_GZ_worker=None # état propre à chaque processus de calcul de la courbe GZ : mémoires partagées et calcul d'équilibre
+
+def rotation_matrix(heel,trim):
+    """
+    Matrice de la rotation de gîte (autour de l'axe x) suivie de la rotation d'assiette (autour de l'axe y)
+    :param heel: angle de gîte (rad)
+    :param trim: angle d'assiette (rad)
+    :return: numpy array (3,3)
+    """
+    cos_heel,sin_heel,cos_trim,sin_trim=np.cos(heel),np.sin(heel),np.cos(trim),np.sin(trim)
+    heel_rotation=np.array([[1,0,0],[0,cos_heel,-sin_heel],[0,sin_heel,cos_heel]])
+    trim_rotation=np.array([[cos_trim,0,sin_trim],[0,1,0],[-sin_trim,0,cos_trim]])
+    return trim_rotation.dot(heel_rotation)
+
+def rotation_angles(rotation):
+    """
+    Retrouver la gîte et l'assiette d'une matrice de rotation de la forme rotation_matrix(heel,trim)
+    :return: angle de gîte (rad), angle d'assiette (rad)
+    """
+    return np.arctan2(-rotation[1,2],rotation[1,1]),np.arctan2(-rotation[2,0],rotation[0,0])
+
+def _init_GZ_worker(filepath,memories_description,mass,fluid_density,gravity_centre):
+    """
+    Initialiser un processus de calcul de la courbe GZ : rattacher le maillage indexé en mémoire partagée
+    :param filepath: chemin du fichier STL (uniquement informatif, le fichier n'est pas relu)
+    :param memories_description: liste des (nom du bloc de mémoire partagée, forme, type) de la table des sommets, des
+    indices des triangles et des normales
+    :param mass: masse de l'objet (kg)
+    :param fluid_density: densité du fluide (kg/m3)
+    :param gravity_centre: centre de gravité dans le repère du fichier STL
+    """
+    global _GZ_worker
+    memories=[shared_memory.SharedMemory(name=name) for name,shape,dtype in memories_description]
+    mesh_data=[np.ndarray(shape,dtype=dtype,buffer=memory.buf) for memory,(name,shape,dtype) in zip(memories,memories_description)]
+
+    from Batch import BatchTerminal # import local : Batch importe ce module
+    term=BatchTerminal()
+    stl_model=STLModel(filepath,term,mesh_data)
+    stl_model.weight=mass*GRAVITY
+    stl_model_pressure=STLModelPressure(stl_model,term)
+    stl_model_pressure.fluid_density=fluid_density
+    stl_model_equilibrium=STLModelEquilibrium(stl_model_pressure,term,gravity_centre)
+    _GZ_worker=(memories,stl_model_equilibrium)
+
+def _calc_GZ_point(parameters):
+    """
+    Calculer dans un processus de calcul un point de la courbe GZ
+    :param parameters: tuple (gîte en degrés, assiette en degrés)
+    :return: tuple (gîte en degrés, bras de levier GZ, tirant d'eau, volume déplacé)
+    """
+    heel,trim=parameters
+    return (heel,)+_GZ_worker[1].calc_righting_lever(np.radians(heel),np.radians(trim))
+
+class STLModelEquilibrium:
+    """
+    Rechercher la position d'équilibre complète du modèle (tirant d'eau, gîte, assiette) pour un centre de gravité donné
+    Le modèle est tourné autour de son centre de gravité G, qui reste sur l'axe z : à l'équilibre la poussée compense le
+    poids et le centre de carène est à la verticale de G. Chaque évaluation tourne la table des sommets, découpe les
+    facettes coupées par le plan d'eau et intègre en une passe la poussée, son moment en G et les intégrales du plan de
+    flottaison, qui donnent la jacobienne analytique de la méthode de Newton (matrice de raideur hydrostatique)
+    Les intégrales du plan de flottaison sont déduites des facettes immergées : le modèle doit être fermé
+    """
+    def __init__(self,stl_model_pressure,term,gravity_centre=None):
+        """
+        :param stl_model_pressure: objet STLModelPressure (densité du fluide, intégrales de pression, tirant d'eau initial)
+        :param term: terminal recevant les messages
+        :param gravity_centre: centre de gravité dans le repère du fichier STL (centre du volume par défaut)
+        """
+        self.stl_model_pressure=stl_model_pressure
+        self.stl_model=stl_model_pressure.stl_model
+        self.term=term
+        self.gravity_centre=self.calc_volume_centre() if gravity_centre is None else np.array(gravity_centre,dtype=np.float64)
+
+    def setGravityCentre(self,gravity_centre):
+        """
+        Définir le centre de gravité de l'objet
+        :param gravity_centre: coordonnées (x, y, z) dans le repère du fichier STL
+        """
+        self.term.addInformativeMessage('Centre of gravity set to '+str(list(gravity_centre)))
+        self.gravity_centre=np.array(gravity_centre,dtype=np.float64)
+
+    def calc_volume_centre(self):
+        """
+        Calculer le centre du volume du modèle (centre de gravité d'un objet plein homogène), dans le repère du fichier STL,
+        par le théorème de flux : le moment statique sur x vaut la somme sur les facettes de nx*intégrale(x²/2)
+        :return: numpy array du centre du volume
+        """
+        facets=self.stl_model.vertices[self.stl_model.triangles].astype(np.float64)
+        normal=self.stl_model.facet_normal
+        areas=self.stl_model.get_facets_areas()
+        volume=(areas*np.einsum('ij,ij->i',facets.mean(axis=1),normal)).sum()/3
+        static_moments=((areas/24)[:,np.newaxis]*((facets*facets).sum(axis=1)+facets.sum(axis=1)**2)*normal).sum(axis=0)
+        return static_moments/volume if volume!=0 else facets.reshape(-1,3).mean(axis=0)
+
+    def get_world_vertices(self,rotation,gravity_centre_z):
+        """
+        Placer la table des sommets : rotation autour du centre de gravité puis centre de gravité en (0, 0, gravity_centre_z)
+        :return: numpy array (n,3) des sommets dans le repère du fluide (plan d'eau z=0)
+        """
+        world_vertices=(self.stl_model.vertices-self.gravity_centre).dot(rotation.T)
+        world_vertices[:,2]+=gravity_centre_z
+        return world_vertices
+
+    def calc_submerged_facets(self,rotation,gravity_centre_z):
+        """
+        Séparer les facettes immergées du modèle placé, en découpant seulement celles coupées par le plan d'eau
+        :return: numpy array (n,3,3) des facettes immergées, numpy array (n,3) de leurs normales, numpy array de leurs surfaces
+        """
+        world_vertices=self.get_world_vertices(rotation,gravity_centre_z)
+        z=world_vertices[:,2][self.stl_model.triangles]
+        z_min=np.minimum(np.minimum(z[:,0],z[:,1]),z[:,2])
+        z_max=np.maximum(np.maximum(z[:,0],z[:,1]),z[:,2])
+        submerged=np.flatnonzero((z_max<=0)&(z_min<0))
+        band=np.flatnonzero((z_min<0)&(z_max>0))
+        world_normal=self.stl_model.facet_normal[np.concatenate([submerged,band])].dot(rotation.T)
+        clipped_facets,clipped_normal=self.stl_model.clip_facets(world_vertices[self.stl_model.triangles[band]],world_normal[len(submerged):])[1:3]
+        clipped_areas=np.linalg.norm(np.cross(clipped_facets[:,1]-clipped_facets[:,0],clipped_facets[:,2]-clipped_facets[:,0]),axis=1)/2
+        return (np.concatenate([world_vertices[self.stl_model.triangles[submerged]],clipped_facets]),
+                np.concatenate([world_normal[:len(submerged)],clipped_normal]),
+                np.concatenate([self.stl_model.get_facets_areas()[submerged],clipped_areas]))
+
+    def calc_waterplane_integrals(self,facets,normal,areas):
+        """
+        Calculer les intégrales du plan de flottaison à partir des facettes immergées : la surface mouillée fermée par le
+        plan de flottaison étant fermée, l'intégrale de f*nz sur le plan vaut moins celle sur les facettes immergées
+        :return: surface, moments statiques (Sx, Sy), moments quadratiques (Ixx=intégrale de x², Iyy=intégrale de y², Ixy)
+        """
+        weights=-areas*normal[:,2]
+        x,y=np.ascontiguousarray(facets[:,:,0]),np.ascontiguousarray(facets[:,:,1])
+        x_sums,y_sums=x[:,0]+x[:,1]+x[:,2],y[:,0]+y[:,1]+y[:,2]
+        area=weights.sum()
+        static_moments=np.array([weights.dot(x_sums),weights.dot(y_sums)])/3
+        inertias=np.array([weights.dot(np.einsum('ij,ij->i',x,x)+x_sums*x_sums),weights.dot(np.einsum('ij,ij->i',y,y)+y_sums*y_sums),weights.dot(np.einsum('ij,ij->i',x,y)+x_sums*y_sums)])/12
+        return area,static_moments,inertias
+
+    @profiled('STLModelEquilibrium.calc_equilibrium_residuals','equilibrium')
+    def calc_equilibrium_residuals(self,rotation,gravity_centre_z):
+        """
+        Évaluer l'écart à l'équilibre du modèle placé et sa jacobienne
+        Résidus : poussée verticale moins poids, moments en G de la poussée autour des axes x et y
+        Pour des petites variations (dz de G, rotations autour des axes x et y passant par G), la jacobienne vaut
+        rho*g*[[-A,-Sy,Sx],[-Sy,-(Iyy+V(zB-zG)),Ixy],[Sx,Ixy,-(Ixx+V(zB-zG))]]
+        :return: numpy array des résidus, numpy array (3,3) de la jacobienne, volume déplacé, centre de carène
+        """
+        facets,normal,areas=self.calc_submerged_facets(rotation,gravity_centre_z)
+        pressure_coefficient=self.stl_model_pressure.fluid_density*GRAVITY
+        if len(facets)==0:
+            return np.array([-self.stl_model.weight,0,0]),-pressure_coefficient*np.eye(3),0,np.full(3,np.nan)
+        force_integral,moment_integral,volume_z_moment=self.stl_model_pressure.calc_facets_pressure_integrals(facets,normal,areas)
+        volume=force_integral[2]
+        buoyancy_centre=np.array([-moment_integral[1],moment_integral[0],volume_z_moment])/volume if volume!=0 else np.full(3,np.nan)
+        # moment en G = moment en l'origine, la poussée étant verticale et G sur l'axe z
+        residuals=np.array([pressure_coefficient*volume-self.stl_model.weight,pressure_coefficient*moment_integral[0],pressure_coefficient*moment_integral[1]])
+
+        area,(x_moment,y_moment),(x_inertia,y_inertia,xy_inertia)=self.calc_waterplane_integrals(facets,normal,areas)
+        lever=volume*(buoyancy_centre[2]-gravity_centre_z)
+        jacobian=pressure_coefficient*np.array([[-area,-y_moment,x_moment],
+                                                 [-y_moment,-(y_inertia+lever),xy_inertia],
+                                                 [x_moment,xy_inertia,-(x_inertia+lever)]])
+        return residuals,jacobian,volume,buoyancy_centre
+
+    def get_draught(self,rotation,gravity_centre_z):
+        """
+        :return: profondeur du point le plus bas du modèle placé sous le plan d'eau
+        """
+        return max(0.0,-float(self.get_world_vertices(rotation,gravity_centre_z)[:,2].min()))
+
+    @profiled('STLModelEquilibrium.solve_equilibrium','equilibrium')
+    def solve_equilibrium(self,precision=EQUILIBRIUM_PRECISION,max_iterations=EQUILIBRIUM_MAX_ITERATIONS):
+        """
+        Rechercher la position d'équilibre par la méthode de Newton, en partant du tirant d'eau d'équilibre sans gîte ni
+        assiette ; un pas qui n'améliore pas les résidus est divisé par 2, et les rotations sont limitées à chaque pas
+        :param precision: précision relative souhaitée sur les résidus (rapportés au poids, et au poids fois la hauteur du modèle pour les moments)
+        :param max_iterations: nombre maximal d'évaluations de Newton
+        :return: liste des positions successives (tirant d'eau, gîte en degrés, assiette en degrés), la dernière étant l'équilibre
+        """
+        self.term.addProcessMessage('Launching the equilibrium solver')
+        if self.stl_model.weight<=0:
+            self.term.addErrorMessage('The object must have a positive mass')
+            return []
+        self.stl_model_pressure.reset_draught_range()
+        draught=float(self.stl_model_pressure.newton(DEFAULT_DICHOTOMY_PRECISION*1e-3)[-1])
+        bottom_ref=self.stl_model.bottom_ref-self.stl_model.z_offset # bas du modèle dans le repère du fichier STL
+        rotation=np.eye(3)
+        gravity_centre_z=self.gravity_centre[2]-bottom_ref-draught
+        scales=np.array([1,self.stl_model.height or 1,self.stl_model.height or 1])*self.stl_model.weight
+
+        residuals,jacobian,volume,buoyancy_centre=self.calc_equilibrium_residuals(rotation,gravity_centre_z)
+        positions=[(draught,0.0,0.0)]
+        for iteration in range(max_iterations):
+            if np.all(np.abs(residuals)<=precision*scales):
+                break
+            step=np.linalg.lstsq(jacobian,-residuals,rcond=None)[0]
+            step[1:]*=min(1,np.radians(EQUILIBRIUM_MAX_ANGLE_STEP)/max(np.abs(step[1:]).max(),1e-300))
+            step_length=1
+            while True:
+                new_rotation=rotation_matrix(step_length*step[1],step_length*step[2]).dot(rotation)
+                new_gravity_centre_z=gravity_centre_z+step_length*step[0]
+                new_residuals,new_jacobian,new_volume,new_buoyancy_centre=self.calc_equilibrium_residuals(new_rotation,new_gravity_centre_z)
+                if np.abs(new_residuals/scales).max()<np.abs(residuals/scales).max() or step_length<1/16:
+                    break
+                step_length/=2
+            rotation,gravity_centre_z=new_rotation,new_gravity_centre_z
+            residuals,jacobian,volume,buoyancy_centre=new_residuals,new_jacobian,new_volume,new_buoyancy_centre
+            heel,trim=rotation_angles(rotation)
+            positions.append((self.get_draught(rotation,gravity_centre_z),float(np.degrees(heel)),float(np.degrees(trim))))
+        else:
+            self.term.addErrorMessage('The equilibrium solver did not converge after '+str(max_iterations)+' iterations')
+
+        self.rotation,self.gravity_centre_z=rotation,gravity_centre_z
+        self.volume,self.buoyancy_centre=volume,buoyancy_centre
+        self.term.addSuccessMessage('Equilibrium found after '+str(len(positions)-1)+' iterations : draught '+str(positions[-1][0])+' m, heel '+str(positions[-1][1])+'°, trim '+str(positions[-1][2])+'°')
+        return positions
+
+    def get_heeled_model_pressure(self,rotation):
+        """
+        Construire le modèle tourné autour de son centre de gravité, centre de gravité à l'origine : sa table des sommets
+        est recopiée tournée mais il partage les indices des triangles du modèle, et le calcul du tirant d'eau de
+        STLModelPressure s'y applique sans changement
+        :param rotation: matrice de rotation
+        :return: objet STLModelPressure du modèle tourné
+        """
+        heeled_mesh=((self.stl_model.vertices-self.gravity_centre).dot(rotation.T),self.stl_model.triangles,self.stl_model.facet_normal.dot(rotation.T))
+        heeled_model=STLModel(self.stl_model.filepath,self.term,heeled_mesh)
+        heeled_model.facets_areas=self.stl_model.get_facets_areas()
+        heeled_model.weight=self.stl_model.weight
+        heeled_model_pressure=STLModelPressure(heeled_model,self.term)
+        heeled_model_pressure.fluid_density=self.stl_model_pressure.fluid_density
+        return heeled_model_pressure
+
+    @profiled('STLModelEquilibrium.calc_righting_lever','equilibrium')
+    def calc_righting_lever(self,heel,trim=0,precision=DEFAULT_DICHOTOMY_PRECISION*1e-3):
+        """
+        Calculer le bras de levier de redressement GZ pour une gîte imposée : l'assiette est fixée et le tirant d'eau est
+        ajusté pour que la poussée compense le poids, puis la poussée est intégrée exactement sur les facettes immergées
+        GZ est la distance horizontale entre G et le centre de carène B, positive quand le couple ramène le modèle droit
+        :param heel: angle de gîte (rad)
+        :param trim: angle d'assiette (rad)
+        :param precision: précision souhaitée sur le tirant d'eau
+        :return: bras de levier GZ (m), tirant d'eau, volume déplacé
+        """
+        rotation=rotation_matrix(heel,trim)
+        heeled_model_pressure=self.get_heeled_model_pressure(rotation)
+        draught=float(heeled_model_pressure.newton(precision)[-1])
+        gravity_centre_z=-draught-heeled_model_pressure.stl_model.bottom_ref
+        facets,normal,areas=self.calc_submerged_facets(rotation,gravity_centre_z)
+        if len(facets)==0:
+            return 0.0,draught,0.0
+        force_integral,moment_integral,volume_z_moment=self.stl_model_pressure.calc_facets_pressure_integrals(facets,normal,areas)
+        volume=force_integral[2]
+        # B est en y=moment_integral[0]/volume : une gîte positive relève le côté des y positifs
+        return (float(-moment_integral[0]/volume) if volume!=0 else 0.0),draught,float(volume)
+
+    @profiled('STLModelEquilibrium.calc_GZ_curve','equilibrium')
+    def calc_GZ_curve(self,heels=None,trim=0,processes=GZ_CURVE_PROCESSES,progress_callback=None):
+        """
+        Calculer la courbe de stabilité : bras de levier de redressement GZ pour chaque gîte, l'assiette étant fixée
+        Les gîtes sont indépendantes et réparties sur un groupe de processus qui partagent le maillage indexé
+        :param heels: liste des gîtes en degrés (de 0 à GZ_CURVE_MAX_HEEL par pas de GZ_CURVE_HEEL_STEP par défaut)
+        :param trim: assiette en degrés
+        :param processes: nombre de processus (0 pour tous les coeurs, 1 pour un calcul sans processus)
+        :param progress_callback: fonction appelée avec le nombre de gîtes calculées et le nombre total de gîtes
+        :return: liste des tuples (gîte en degrés, bras de levier GZ, tirant d'eau, volume déplacé)
+        """
+        if heels is None:
+            heels=np.arange(0,GZ_CURVE_MAX_HEEL+GZ_CURVE_HEEL_STEP/2,GZ_CURVE_HEEL_STEP)
+        heels=[float(heel) for heel in heels]
+        self.term.addProcessMessage('Calculation of the righting lever curve over '+str(len(heels))+' heel angles')
+        if self.stl_model.weight<=0:
+            self.term.addErrorMessage('The object must have a positive mass')
+            return []
+        processes=min(processes if processes>0 else multiprocessing.cpu_count(),len(heels))
+
+        curve=[]
+        if processes<=1:
+            for heel in heels:
+                curve.append((heel,)+self.calc_righting_lever(np.radians(heel),np.radians(trim)))
+                if progress_callback is not None:
+                    progress_callback(len(curve),len(heels))
+        else:
+            self.term.addSubProcessMessage('Sharing the 3d model with '+str(processes)+' processes')
+            mesh_data=[self.stl_model.vertices,self.stl_model.triangles,self.stl_model.facet_normal]
+            memories=[shared_memory.SharedMemory(create=True,size=max(1,array.nbytes)) for array in mesh_data]
+            try:
+                for memory,array in zip(memories,mesh_data):
+                    np.ndarray(array.shape,dtype=array.dtype,buffer=memory.buf)[:]=array
+                memories_description=[(memory.name,array.shape,array.dtype.str) for memory,array in zip(memories,mesh_data)]
+                initargs=(self.stl_model.filepath,memories_description,self.stl_model.weight/GRAVITY,self.stl_model_pressure.fluid_density,self.gravity_centre)
+                with multiprocessing.Pool(processes,initializer=_init_GZ_worker,initargs=initargs) as pool:
+                    for point in pool.imap(_calc_GZ_point,[(heel,trim) for heel in heels]):
+                        curve.append(point)
+                        if progress_callback is not None:
+                            progress_callback(len(curve),len(heels))
+            finally:
+                for memory in memories:
+                    memory.close()
+                    memory.unlink()
+        self.term.addSuccessMessage('Righting lever curve complete : maximal GZ '+str(max(point[1] for point in curve))+' m')
+        return curve
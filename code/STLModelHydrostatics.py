@@ -0,0 +1,190 @@
+import numpy as np
+from STLModel import *
+from Profiler import *
+from STLModelPressure import *
+from configurations import *
+
+HYDROSTATICS_FIELDS=['draught','displaced_volume','displacement','KB','LCB','TCB','waterplane_area','LCF','TCF',
+                     'transverse_inertia','longitudinal_inertia','BMt','BMl','KMt','KMl','waterline_length','TPC','MCT']
+
+class STLModelHydrostatics:
+    """
+    Calculer les courbes hydrostatiques du modèle droit (sans gîte ni assiette) pour une série de tirants d'eau, par un
+    balayage des niveaux d'eau dans l'ordre des z maximaux des facettes, sans déplacer le modèle
+    Par le théorème de flux, le volume, ses moments statiques et les intégrales du plan de flottaison s'écrivent comme
+    des sommes sur les facettes immergées de termes propres à chaque facette : ceux des facettes entièrement immergées
+    sont lus dans des sommes cumulées calculées une seule fois, seules les facettes coupées par un niveau sont découpées
+    Les axes sont ceux du fichier STL : x longitudinal, y transversal ; le modèle doit être fermé
+    """
+    def __init__(self,stl_model_pressure,term):
+        """
+        :param stl_model_pressure: objet STLModelPressure (densité du fluide)
+        :param term: terminal recevant les messages
+        """
+        self.stl_model_pressure=stl_model_pressure
+        self.stl_model=stl_model_pressure.stl_model
+        self.term=term
+        self.keel=self.stl_model.bottom_ref-self.stl_model.z_offset # bas du modèle dans le repère de la table des sommets
+        self.terms_prefix_sums=None # construites au premier calcul
+
+    @staticmethod
+    def calc_facets_terms(facets,normal,areas):
+        """
+        Calculer les termes de chaque facette dont les sommes sur les facettes immergées donnent les intégrales
+        hydrostatiques ; pour un triangle de surface S et de sommets Pi, l'intégrale de xj*xk vaut S/12*(somme(xj*xk)+somme(xj)*somme(xk))
+        :param facets: numpy array (n,3,3) des facettes, z mesuré depuis le bas du modèle ou depuis le niveau d'eau
+        :param normal: numpy array (n,3) de leurs normales
+        :param areas: numpy array de leurs surfaces
+        :return: numpy array (n,10) : S*nz, S*nz*zmoyen, intégrale de z²/2*nz, intégrales de x²/2*nx et de y²/2*ny
+        (moments statiques du volume), puis intégrales de x*nz, y*nz, x²*nz, y²*nz et x*y*nz (plan de flottaison au signe près)
+        """
+        x,y,z=np.ascontiguousarray(facets[:,:,0]),np.ascontiguousarray(facets[:,:,1]),np.ascontiguousarray(facets[:,:,2])
+        x_sums,y_sums,z_sums=x[:,0]+x[:,1]+x[:,2],y[:,0]+y[:,1]+y[:,2],z[:,0]+z[:,1]+z[:,2]
+        x_squares=np.einsum('ij,ij->i',x,x)+x_sums*x_sums
+        y_squares=np.einsum('ij,ij->i',y,y)+y_sums*y_sums
+        vertical=areas*normal[:,2]
+        return np.stack([vertical,
+                         vertical*z_sums/3,
+                         vertical*(np.einsum('ij,ij->i',z,z)+z_sums*z_sums)/24,
+                         areas*normal[:,0]*x_squares/24,
+                         areas*normal[:,1]*y_squares/24,
+                         vertical*x_sums/3,
+                         vertical*y_sums/3,
+                         vertical*x_squares/12,
+                         vertical*y_squares/12,
+                         vertical*(np.einsum('ij,ij->i',x,y)+x_sums*y_sums)/12],axis=1)
+
+    @profiled('STLModelHydrostatics.prepare_terms_prefix_sums','hydrostatics')
+    def prepare_terms_prefix_sums(self):
+        """
+        Précalculer les sommes cumulées des termes des facettes dans l'ordre des z maximaux, z mesuré depuis le bas du modèle
+        """
+        self.term.addSubProcessMessage('Preparation of the cumulative hydrostatic integrals')
+        if self.stl_model.z_max_tree is None:
+            self.stl_model.build_z_index()
+        z_max_order=self.stl_model.z_max_order
+        facets=self.stl_model.vertices[self.stl_model.triangles[z_max_order]].astype(np.float64)
+        facets[:,:,2]-=self.keel
+        # une ligne de zéros en tête : la somme des n premières facettes est à la ligne n
+        self.terms_prefix_sums=np.zeros((len(z_max_order)+1,10))
+        self.terms_prefix_sums[1:]=self.calc_facets_terms(facets,self.stl_model.facet_normal[z_max_order],self.stl_model.get_facets_areas()[z_max_order])
+        np.cumsum(self.terms_prefix_sums,axis=0,out=self.terms_prefix_sums)
+
+    def calc_level_integrals(self,draught):
+        """
+        Sommer les termes des facettes immergées sous un niveau d'eau, z étant ramené au niveau d'eau
+        :param draught: tirant d'eau (hauteur du niveau d'eau au dessus du bas du modèle)
+        :return: numpy array des 10 sommes (voir calc_facets_terms), longueur de la flottaison
+        """
+        if self.terms_prefix_sums is None:
+            self.prepare_terms_prefix_sums()
+        level=self.keel+draught # niveau d'eau dans le repère de la table des sommets
+        prefix_number=np.searchsorted(self.stl_model.sorted_z_max,level,side='left')
+        # facettes dont le sommet le plus haut est sur le plan d'eau : immergées si un autre sommet est en dessous
+        touching=self.stl_model.z_max_order[prefix_number:np.searchsorted(self.stl_model.sorted_z_max,level,side='right')]
+        touching=touching[self.stl_model.facets_z_min[touching]<level]
+        touching_facets=self.get_keel_facets(touching)
+        whole_integrals=self.terms_prefix_sums[prefix_number]+self.calc_facets_terms(touching_facets,self.stl_model.facet_normal[touching],self.stl_model.get_facets_areas()[touching]).sum(axis=0)
+        # passage du bas du modèle au niveau d'eau des termes dépendant de z
+        h=draught
+        integrals=whole_integrals.copy()
+        integrals[1]=whole_integrals[1]-h*whole_integrals[0]
+        integrals[2]=whole_integrals[2]-h*whole_integrals[1]+h*h/2*whole_integrals[0]
+
+        band=self.stl_model.get_crossing_facets_indices(level)
+        profiler.count('facets clipped',len(band))
+        band_facets=self.get_keel_facets(band)
+        band_facets[:,:,2]-=h
+        clipped_facets,clipped_normal=self.stl_model.clip_facets(band_facets,self.stl_model.facet_normal[band])[1:3]
+        clipped_areas=np.linalg.norm(np.cross(clipped_facets[:,1]-clipped_facets[:,0],clipped_facets[:,2]-clipped_facets[:,0]),axis=1)/2
+        integrals+=self.calc_facets_terms(clipped_facets,clipped_normal,clipped_areas).sum(axis=0)
+
+        # points de la flottaison : intersections des côtés avec le plan d'eau et sommets sur le plan
+        waterline_x=np.concatenate([clipped_facets[:,:,0][clipped_facets[:,:,2]==0],band_facets[:,:,0][band_facets[:,:,2]==0],touching_facets[:,:,0][touching_facets[:,:,2]==h]])
+        waterline_length=float(waterline_x.max()-waterline_x.min()) if len(waterline_x)>0 else 0.0
+        return integrals,waterline_length
+
+    def get_keel_facets(self,indices):
+        """
+        :param indices: numpy array des indices des facettes
+        :return: numpy array (n,3,3) des facettes, z mesuré depuis le bas du modèle
+        """
+        facets=self.stl_model.vertices[self.stl_model.triangles[indices]].astype(np.float64)
+        facets[:,:,2]-=self.keel
+        return facets
+
+    def get_default_draughts(self,levels_number=HYDROSTATICS_LEVELS):
+        """
+        :return: numpy array de levels_number tirants d'eau régulièrement espacés jusqu'à la hauteur du modèle
+        """
+        return np.linspace(0,self.stl_model.height,levels_number+1)[1:]
+
+    @profiled('STLModelHydrostatics.calc_hydrostatic_integrals','hydrostatics')
+    def calc_hydrostatic_integrals(self,draughts,cache=None):
+        """
+        Calculer les intégrales de chaque niveau d'eau, qui ne dépendent que de la géométrie : elles sont mémorisées
+        dans le cache pour ce fichier et ces tirants d'eau
+        :param draughts: numpy array des tirants d'eau
+        :param cache: objet ModelCache où les intégrales sont recherchées avant d'être calculées
+        :return: numpy array (K,10) des intégrales, numpy array des longueurs de la flottaison
+        """
+        parameters={'draughts':[float(draught) for draught in draughts]}
+        if cache is not None:
+            cached_integrals=cache.loadArrays(self.stl_model.filepath,'hydrostatics',parameters,['integrals','waterline_lengths'])
+            if cached_integrals is not None:
+                self.term.addSubProcessMessage('Hydrostatic integrals recovered from the cache')
+                return np.array(cached_integrals[0]),np.array(cached_integrals[1])
+        integrals=np.empty((len(draughts),10))
+        waterline_lengths=np.empty(len(draughts))
+        for i,draught in enumerate(draughts):
+            integrals[i],waterline_lengths[i]=self.calc_level_integrals(draught)
+        if cache is not None:
+            cache.storeArrays(self.stl_model.filepath,'hydrostatics',parameters,{'integrals':integrals,'waterline_lengths':waterline_lengths})
+        return integrals,waterline_lengths
+
+    @profiled('STLModelHydrostatics.calc_hydrostatics_table','hydrostatics')
+    def calc_hydrostatics_table(self,draughts=None,cache=None):
+        """
+        Calculer le tableau hydrostatique : volume et déplacement, centre de carène (KB depuis le bas du modèle, LCB, TCB),
+        surface de flottaison et son centre (LCF, TCF), inerties de la flottaison autour de son centre, rayons
+        métacentriques et hauteurs des métacentres, tonnes par centimètre d'immersion (TPC) et moment pour changer
+        l'assiette d'un centimètre (MCT), approché par rho*IL/(100*Lwl) en prenant GMl égal à BMl
+        :param draughts: liste des tirants d'eau (HYDROSTATICS_LEVELS niveaux jusqu'à la hauteur du modèle par défaut)
+        :param cache: objet ModelCache où les intégrales sont recherchées avant d'être calculées
+        :return: dictionnaire {champ de HYDROSTATICS_FIELDS: numpy array}, masses en tonnes
+        """
+        draughts=self.get_default_draughts() if draughts is None else np.asarray(draughts,dtype=np.float64)
+        self.term.addProcessMessage('Calculation of the hydrostatic table over '+str(len(draughts))+' draughts')
+        integrals,waterline_lengths=self.calc_hydrostatic_integrals(draughts,cache)
+        fluid_density=self.stl_model_pressure.fluid_density
+
+        with np.errstate(divide='ignore',invalid='ignore'):
+            volume=integrals[:,1]
+            area=-integrals[:,0]
+            LCF,TCF=-integrals[:,5]/area,-integrals[:,6]/area
+            transverse_inertia=-integrals[:,8]-area*TCF*TCF
+            longitudinal_inertia=-integrals[:,7]-area*LCF*LCF
+            KB=draughts+integrals[:,2]/volume
+            BMt,BMl=transverse_inertia/volume,longitudinal_inertia/volume
+            table={
+                'draught':draughts,
+                'displaced_volume':volume,
+                'displacement':fluid_density*volume/1000,
+                'KB':KB,
+                'LCB':integrals[:,3]/volume,
+                'TCB':integrals[:,4]/volume,
+                'waterplane_area':area,
+                'LCF':LCF,
+                'TCF':TCF,
+                'transverse_inertia':transverse_inertia,
+                'longitudinal_inertia':longitudinal_inertia,
+                'BMt':BMt,
+                'BMl':BMl,
+                'KMt':KB+BMt,
+                'KMl':KB+BMl,
+                'waterline_length':waterline_lengths,
+                'TPC':fluid_density*area/1e5,
+                'MCT':fluid_density*longitudinal_inertia/1000/(100*waterline_lengths)
+            }
+        self.term.addSuccessMessage('Calculation of the hydrostatic table complete')
+        return table
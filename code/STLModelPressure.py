@@ -1,4 +1,6 @@
+import bisect
 import numpy as np
+from Profiler import *
 from configurations import *
 
 class STLModelPressure:
@@ -6,10 +8,16 @@ class STLModelPressure:
         self.stl_model=stl_model
         self.term=term
 
-        self.draught_range=[-DEPTH_COEFFICIENT*self.stl_model.height if self.stl_model.height!=0 else -1,0]
-        self.dichotomy_achieved=0
+        self.reset_draught_range()
 
         self.fluid_density=DEFAULT_FLUID_DENSITY
+        self.draught_solver=DEFAULT_DRAUGHT_SOLVER
+
+        self.prepare_displaced_volume_function()
+        # volumes déjà calculés, indépendants de la masse et du fluide : {tirant d'eau: (volume, surface de flottaison)}
+        self.volume_samples={}
+        self.sampled_draughts=[]
+        self.hydrostatic_prefix_sums=None # construites au premier calcul de la résultante sur le modèle déplacé
 
     def setFluidDensity(self,fluid_density):
         """
@@ -19,54 +27,124 @@ class STLModelPressure:
         self.term.addInformativeMessage('Fluid density set to '+str(fluid_density)+' kg/m3')
         self.fluid_density=fluid_density
 
-    def calc_submerged_facets_surfaces(self):
+    def setDraughtSolver(self,draught_solver):
         """
-        Calculer les surfaces de toutes les facettes immergées
-        :return: numpy array des surfaces des facettes immergées
+        Définir la méthode de résolution du tirant d'eau
+        :param draught_solver: 'newton' (fonction volume précalculée, modèle non déplacé) ou 'dichotomy' (méthode de référence)
         """
-        self.term.addSubProcessMessage('Calculation of submerged facet surfaces')
-        submerged_facet_surfaces=[]
-        for i in range(self.stl_model.submerged_facets_number):
-            A,B,C=self.stl_model.submerged_facets[i]
-            submerged_facet_surfaces.append(np.linalg.norm(np.cross(B-A,C-A))/2*self.stl_model.submerged_facet_normal[i])
-        return np.array(submerged_facet_surfaces)
+        self.term.addInformativeMessage('Draught solver set to '+draught_solver)
+        self.draught_solver=draught_solver
 
-    def calc_submerged_facets_z_means(self):
+    def reset_draught_range(self):
         """
-        Calculer les altitudes moyennes des facettes immergées
-        :return: numpy array des z moyens des facettes immergées
+        Réinitialiser l'intervalle de recherche du tirant d'eau avant une nouvelle résolution
         """
-        self.term.addSubProcessMessage('Calculation of z-means of submerged facets')
-        z_means=[]
-        for vertex in self.stl_model.submerged_facets:
-            z_means.append(sum(vertex[:,2])/3)
-        return np.array(z_means)
+        self.draught_range=[-DEPTH_COEFFICIENT*self.stl_model.height if self.stl_model.height!=0 else -1,0]
+        self.dichotomy_achieved=0
 
-    def calc_submerged_facets_pressure_forces(self):
+    @profiled('STLModelPressure.calc_facets_pressure_integrals','pressure')
+    def calc_facets_pressure_integrals(self,facets,normal,areas=None):
         """
-        Calculer les forces de pression exercées sur chaque facette immergée
-        :return: numpy array des forces de pression exercées sur chaque facette immergée
+        Intégrer sur des facettes immergées les termes de la résultante et du moment en l'origine des forces de pression
+        La pression étant linéaire en z, son intégrale sur un triangle de surface S et de sommets Pi vaut
+        S/12*(somme(zi*Pi)+somme(zi)*somme(Pi)) pour le moment, ce qui rend le calcul exact
+        :param facets: numpy array (n,3,3) des facettes immergées
+        :param normal: numpy array (n,3) de leurs normales
+        :param areas: numpy array des surfaces des facettes, calculées si non fournies
+        :return: somme des S*zmoyen*n, somme des moments, moment statique du volume sur z (à multiplier par rho*g sauf le dernier)
         """
-        self.term.addSubProcessMessage('Calculation of the pressure forces exerted on the submerged facets')
-        if self.stl_model.submerged_facets_number>0:
-            z_means = self.calc_submerged_facets_z_means()
-            submerged_facets_surfaces = self.calc_submerged_facets_surfaces()
-            submerged_facets_pressure = []
-            for i in range(self.stl_model.submerged_facets_number):
-                submerged_facets_pressure.append(self.fluid_density*GRAVITY*z_means[i]*submerged_facets_surfaces[i])
-            return submerged_facets_pressure
-        return np.array([0,0,0])
+        profiler.count('facets integrated',len(facets))
+        if areas is None:
+            areas=np.linalg.norm(np.cross(facets[:,1]-facets[:,0],facets[:,2]-facets[:,0]),axis=1)/2
+        z=np.ascontiguousarray(facets[:,:,2])
+        z_sums=z[:,0]+z[:,1]+z[:,2]
+        force_integral=(areas*z_sums/3).dot(normal)
+        pressure_first_moments=(areas/12)[:,np.newaxis]*(np.einsum('ij,ijk->ik',z,facets)+z_sums[:,np.newaxis]*(facets[:,0]+facets[:,1]+facets[:,2]))
+        # somme des produits vectoriels à partir de la matrice somme(Pi*ni^T)
+        products=pressure_first_moments.T.dot(normal)
+        moment_integral=np.array([products[1,2]-products[2,1],products[2,0]-products[0,2],products[0,1]-products[1,0]])
+        # moment statique du volume sur z : théorème de flux appliqué à z²/2
+        volume_z_moment=((areas/24)*(np.einsum('ij,ij->i',z,z)+z_sums*z_sums)).dot(normal[:,2])
+        return force_integral,moment_integral,volume_z_moment
+
+    @profiled('STLModelPressure.prepare_hydrostatic_prefix_sums','pressure')
+    def prepare_hydrostatic_prefix_sums(self):
+        """
+        Précalculer, dans l'ordre des z maximaux des facettes, les sommes cumulées des termes de calc_facets_pressure_integrals
+        Exprimés dans le repère de la table des sommets (zi, Pi), ils ne dépendent pas du décalage vertical o du modèle :
+        pour une facette entièrement immergée, S*zmoyen*n devient S*somme(zi)/3*n+o*S*n et le moment en l'origine
+        S/12*(somme(zi*Pi)+somme(zi)*somme(Pi))^n+o/3*S*somme(Pi)^n+o/3*S*somme(zi)*ez^n+o²*S*ez^n
+        """
+        self.term.addSubProcessMessage('Preparation of the cumulative pressure integrals')
+        z_max_order=self.stl_model.z_max_order
+        facets=self.stl_model.vertices[self.stl_model.triangles[z_max_order]].astype(np.float64)
+        normal=self.stl_model.facet_normal[z_max_order]
+        areas=self.stl_model.get_facets_areas()[z_max_order]
+        z=facets[:,:,2]
+        z_sums=z.sum(axis=1)
+        vertex_sums=facets.sum(axis=1)
+        terms=[
+            (areas*z_sums)[:,np.newaxis]*normal,
+            areas[:,np.newaxis]*normal,
+            np.cross((areas/12)[:,np.newaxis]*(np.einsum('ij,ijk->ik',z,facets)+z_sums[:,np.newaxis]*vertex_sums),normal),
+            np.cross(areas[:,np.newaxis]*vertex_sums,normal),
+            ((areas/24)*((z*z).sum(axis=1)+z_sums*z_sums)*normal[:,2])[:,np.newaxis]
+        ]
+        # une ligne de zéros en tête : la somme des n premières facettes est à la ligne n
+        self.hydrostatic_prefix_sums=[np.concatenate([np.zeros((1,term.shape[1])),np.cumsum(term,axis=0)]) for term in terms]
+
+    def calc_submerged_prefix_integrals(self):
+        """
+        Calculer les termes de calc_facets_pressure_integrals pour les facettes entièrement immergées au début de l'ordre
+        des z maximaux, à partir des sommes cumulées et sans les parcourir
+        :return: somme des S*zmoyen*n, somme des moments, moment statique du volume sur z
+        """
+        if self.hydrostatic_prefix_sums is None:
+            self.prepare_hydrostatic_prefix_sums()
+        n=self.stl_model.submerged_prefix_number
+        o=self.stl_model.z_offset
+        z_force,force,z_moment,vertex_moment,volume_z_moment=[prefix_sum[n] for prefix_sum in self.hydrostatic_prefix_sums]
+        vertical=np.array([0,0,1])
+        force_integral=z_force/3+o*force
+        moment_integral=z_moment+o/3*vertex_moment+o/3*np.cross(vertical,z_force)+o*o*np.cross(vertical,force)
+        return force_integral,moment_integral,volume_z_moment[0]+o/3*z_force[2]+o*o/2*force[2]
+
+    @profiled('STLModelPressure.calc_hydrostatic_resultant','pressure')
+    def calc_hydrostatic_resultant(self):
+        """
+        Calculer la résultante et le moment en l'origine des forces de pression sur toutes les facettes immergées
+        Les facettes entièrement immergées sont prises en compte par les sommes cumulées, seules les facettes coupées par
+        le plan d'eau (ou le touchant) sont intégrées une à une
+        :return: numpy array de la résultante, numpy array du moment en l'origine, numpy array du centre de carène
+        """
+        self.term.addSubProcessMessage('Calculation of the pressure forces and moments exerted on the submerged facets')
+        if self.stl_model.submerged_facets_number==0:
+            return np.zeros(3),np.zeros(3),np.full(3,np.nan)
+        force_integral,moment_integral,volume_z_moment=self.calc_submerged_prefix_integrals()
+        facets=self.stl_model.submerged_band_facets
+        if len(facets)>0:
+            band_integrals=self.calc_facets_pressure_integrals(facets,self.stl_model.submerged_band_facet_normal)
+            force_integral,moment_integral,volume_z_moment=force_integral+band_integrals[0],moment_integral+band_integrals[1],volume_z_moment+band_integrals[2]
+        pressure_coefficient=self.fluid_density*GRAVITY
+
+        force=pressure_coefficient*force_integral
+        moment=pressure_coefficient*moment_integral
+        # centre de carène : x et y se déduisent du moment, z du moment statique du volume
+        buoyancy_centre=np.array([-moment[1]/force[2],moment[0]/force[2],pressure_coefficient*volume_z_moment/force[2]]) if force[2]!=0 else np.full(3,np.nan)
+        return force,moment,buoyancy_centre
 
     def calc_Archimedes_push(self):
         """
         Déterminer le vecteur poussée d'Archimède
+        Le moment en l'origine et le centre de carène obtenus lors du même calcul sont conservés
         :return: numpy array de la poussée d'Archimède
         """
         self.term.addProcessMessage('Calculation of the Archimedes force')
-        archimedes_push=sum(self.calc_submerged_facets_pressure_forces())
+        archimedes_push,self.archimedes_moment,self.buoyancy_centre=self.calc_hydrostatic_resultant()
         self.term.addSuccessMessage('Calculation of the Archimedes force complete')
         return archimedes_push
 
+    @profiled('STLModelPressure.dichotomy','pressure')
     def dichotomy(self):
         """
         Réduire l'intervalle du tirant d'eau de moitié
@@ -81,4 +159,208 @@ class STLModelPressure:
             self.draught_range=[self.draught_range[0],middle_range]
         else:
             self.draught_range = [middle_range,self.draught_range[1]]
-        return -self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0
\ No newline at end of file
+        return -self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0
+
+    @profiled('STLModelPressure.prepare_displaced_volume_function','pressure')
+    def prepare_displaced_volume_function(self):
+        """
+        Précalculer pour chaque facette les coefficients du volume déplacé en fonction du tirant d'eau
+        Pour une facette d'altitudes triées z0<=z1<=z2 (mesurées depuis le bas du modèle), la contribution au volume
+        sous le niveau h est -S*g(h) où S est la surface projetée signée de la facette et g un polynôme par morceaux :
+        0 si h<=z0, (h-z0)^3/(3d(z1-z0)) entre z0 et z1, h-zm+(z2-h)^3/(3d(z2-z1)) entre z1 et z2, h-zm au dessus
+        (d=z2-z0, zm altitude moyenne), ce qui évite de déplacer et redécouper le modèle à chaque évaluation
+        """
+        self.term.addProcessMessage('Preparation of the displaced volume function')
+        self.facets_projected_surfaces=self.stl_model.get_facets_areas()*self.stl_model.facet_normal[:,2]
+        # seules les altitudes des sommets sont utiles : pas de recopie des facettes entières
+        self.facets_z=np.sort(self.stl_model.vertices[:,2][self.stl_model.triangles],axis=1)+(self.stl_model.z_offset-self.stl_model.bottom_ref)
+        self.facets_z_means=self.facets_z.mean(axis=1)
+        self.term.addSuccessMessage('Preparation of the displaced volume function complete')
+
+    def calc_displaced_volume(self,draught):
+        """
+        Calculer le volume déplacé et la surface de flottaison pour un tirant d'eau donné, sans déplacer le modèle
+        Le résultat est mémorisé : il ne dépend que de la géométrie et sert donc à toutes les résolutions sur ce modèle
+        :param draught: tirant d'eau (hauteur du niveau d'eau au dessus du bas du modèle)
+        :return: volume déplacé, surface de flottaison (dérivée du volume par rapport au tirant d'eau)
+        """
+        sample=self.volume_samples.get(draught)
+        if sample is None:
+            sample=self.integrate_displaced_volume(draught)
+            self.volume_samples[draught]=sample
+            bisect.insort(self.sampled_draughts,draught)
+        return sample
+
+    @profiled('STLModelPressure.integrate_displaced_volume','pressure')
+    def integrate_displaced_volume(self,draught):
+        """
+        Sommer sur toutes les facettes le volume déplacé et la surface de flottaison (voir prepare_displaced_volume_function)
+        :param draught: tirant d'eau
+        :return: volume déplacé, surface de flottaison
+        """
+        z0,z1,z2=self.facets_z[:,0],self.facets_z[:,1],self.facets_z[:,2]
+        h=draught
+
+        submerged=z2<=h
+        volume=-self.facets_projected_surfaces[submerged].dot(h-self.facets_z_means[submerged])
+        waterplane_area=-self.facets_projected_surfaces[submerged].sum()
+
+        lower=(z0<h)&(h<z1)
+        z0l,z1l,z2l=z0[lower],z1[lower],z2[lower]
+        denominators=(z2l-z0l)*(z1l-z0l)
+        volume-=self.facets_projected_surfaces[lower].dot((h-z0l)**3/(3*denominators))
+        waterplane_area-=self.facets_projected_surfaces[lower].dot((h-z0l)**2/denominators)
+
+        upper=(z1<=h)&(h<z2)
+        z0u,z1u,z2u=z0[upper],z1[upper],z2[upper]
+        denominators=(z2u-z0u)*(z2u-z1u)
+        volume-=self.facets_projected_surfaces[upper].dot(h-self.facets_z_means[upper]+(z2u-h)**3/(3*denominators))
+        waterplane_area-=self.facets_projected_surfaces[upper].dot(1-(z2u-h)**2/denominators)
+        return volume,waterplane_area
+
+    def narrow_draught_range(self,volume,low,high):
+        """
+        Resserrer l'encadrement du tirant d'eau donnant un volume à l'aide des volumes déjà calculés (croissants avec
+        le tirant d'eau)
+        :param volume: volume déplacé cherché
+        :param low: borne inférieure du tirant d'eau
+        :param high: borne supérieure du tirant d'eau
+        :return: nouvelles bornes inférieure et supérieure
+        """
+        volumes=[self.volume_samples[draught][0] for draught in self.sampled_draughts]
+        below_number=bisect.bisect_right(volumes,volume)
+        if below_number>0 and low<self.sampled_draughts[below_number-1]<high:
+            low=self.sampled_draughts[below_number-1]
+        if below_number<len(volumes) and low<self.sampled_draughts[below_number]<high:
+            high=self.sampled_draughts[below_number]
+        return low,high
+
+    def get_bound_volume(self,draught):
+        """
+        :param draught: borne de l'encadrement du tirant d'eau
+        :return: volume déplacé à cette borne, nul sous le bas du modèle, calculé s'il n'est pas encore connu
+        """
+        return 0.0 if draught<=0 else self.calc_displaced_volume(draught)[0]
+
+    def get_volume_interpolant(self,low,high):
+        """
+        Polynôme d'Hermite cubique du volume entre deux tirants d'eau déjà calculés, à partir des volumes et des surfaces
+        de flottaison (dérivées) aux deux bornes
+        :return: coefficients du polynôme en t=(tirant d'eau-low)/(high-low), du degré 3 au degré 0
+        """
+        volume_low,area_low=self.volume_samples[low]
+        volume_high,area_high=self.volume_samples[high]
+        length=high-low
+        return np.array([2*volume_low+length*area_low-2*volume_high+length*area_high,
+                         -3*volume_low-2*length*area_low+3*volume_high-length*area_high,
+                         length*area_low,
+                         volume_low])
+
+    @staticmethod
+    def interpolate_draught(volume,low,high,low_volume,high_volume):
+        """
+        Fausse position : tirant d'eau où la corde entre les deux bornes de l'encadrement atteint le volume cherché
+        :param volume: volume déplacé cherché
+        :param low: borne inférieure du tirant d'eau
+        :param high: borne supérieure du tirant d'eau
+        :param low_volume: volume déplacé à la borne inférieure
+        :param high_volume: volume déplacé à la borne supérieure
+        :return: tirant d'eau estimé, milieu de l'encadrement si la corde ne le coupe pas strictement à l'intérieur
+        """
+        draught=low+(volume-low_volume)/(high_volume-low_volume)*(high-low) if high_volume>low_volume else (low+high)/2
+        return draught if low<draught<high else (low+high)/2
+
+    def estimate_draught(self,volume,low,high,precision):
+        """
+        Estimer le tirant d'eau donnant un volume à partir des bornes déjà calculées de l'encadrement :
+        - une borne dont le pas de Newton (écart de volume divisé par la surface de flottaison) est inférieur à la
+          moitié de la précision est déjà la solution
+        - inversion de l'interpolant d'Hermite si les deux bornes ont été calculées
+        - pas de Newton depuis la borne calculée la plus proche en volume s'il reste dans l'encadrement
+        - fausse position entre les bornes sinon
+        :param volume: volume déplacé cherché
+        :param low: borne inférieure du tirant d'eau
+        :param high: borne supérieure du tirant d'eau
+        :param precision: précision souhaitée sur le tirant d'eau
+        :return: tirant d'eau estimé
+        """
+        sampled=sorted([draught for draught in (low,high) if draught in self.volume_samples],key=lambda draught:abs(self.volume_samples[draught][0]-volume))
+        for draught in sampled:
+            sample_volume,waterplane_area=self.volume_samples[draught]
+            if waterplane_area>0 and abs(volume-sample_volume)<waterplane_area*precision/2:
+                return draught
+        if len(sampled)==2 and high>low:
+            coefficients=self.get_volume_interpolant(low,high)
+            coefficients[3]-=volume
+            roots=[root.real for root in np.roots(coefficients) if abs(root.imag)<1e-12 and 0<root.real<1]
+            if roots:
+                return low+min(roots)*(high-low)
+        if sampled:
+            sample_volume,waterplane_area=self.volume_samples[sampled[0]]
+            draught=sampled[0]+(volume-sample_volume)/waterplane_area if waterplane_area>0 else low
+            if low<draught<high:
+                return draught
+        return self.interpolate_draught(volume,low,high,self.get_bound_volume(low),self.get_bound_volume(high))
+
+    def newton(self,precision,step_callback=None):
+        """
+        Résoudre poussée(tirant d'eau)=poids par la méthode de Newton (dérivée = surface de flottaison), sécurisée par
+        un encadrement : une itération qui sort de l'encadrement est remplacée par une fausse position
+        La résolution s'arrête sur un tirant d'eau calculé, qui est mémorisé comme tous les autres
+        :param precision: précision souhaitée sur le tirant d'eau
+        :param step_callback: fonction appelée avec chaque nouveau tirant d'eau, la résolution s'arrêtant si elle renvoie False
+        :return: liste des tirants d'eau successifs, le dernier étant la solution
+        """
+        low,high=-self.draught_range[1],-self.draught_range[0]
+        pressure_coefficient=self.fluid_density*GRAVITY
+        if self.stl_model.weight<=0 or pressure_coefficient*self.calc_displaced_volume(high)[0]<=self.stl_model.weight:
+            draughts=[low if self.stl_model.weight<=0 else high] # objet sans poids, ou qui coule
+            if step_callback is not None:
+                step_callback(draughts[0])
+            return draughts
+
+        # les volumes calculés lors des résolutions précédentes resserrent l'encadrement et donnent le point de départ
+        target_volume=self.stl_model.weight/pressure_coefficient
+        low,high=self.narrow_draught_range(target_volume,low,high)
+        draughts=[]
+        draught=self.estimate_draught(target_volume,low,high,precision)
+        while True:
+            self.dichotomy_achieved+=1
+            volume,waterplane_area=self.calc_displaced_volume(draught)
+            draughts.append(draught)
+            if step_callback is not None and step_callback(draught) is False:
+                return draughts
+            residual=volume-target_volume
+            if residual>0:
+                high=draught
+            else:
+                low=draught
+            step=-residual/waterplane_area if waterplane_area>0 else None
+            if (step is not None and abs(step)<precision/2) or high-low<precision:
+                return draughts
+            if step is not None and low<draught+step<high:
+                draught+=step
+            else:
+                draught=self.interpolate_draught(target_volume,low,high,self.get_bound_volume(low),self.get_bound_volume(high))
+
+    @profiled('STLModelPressure.solve_draught','pressure')
+    def solve_draught(self,precision,step_callback=None):
+        """
+        Déterminer le tirant d'eau d'équilibre avec la méthode de résolution choisie
+        En mode 'dichotomy' le modèle est déplacé à chaque étape, en mode 'newton' il n'est jamais déplacé
+        :param precision: précision souhaitée sur le tirant d'eau
+        :param step_callback: fonction appelée avec chaque nouveau tirant d'eau, la résolution s'arrêtant si elle renvoie False
+        :return: liste des tirants d'eau successifs, le dernier étant la solution (ou le dernier calculé si la résolution
+        a été arrêtée)
+        """
+        self.term.addProcessMessage('Launching the '+self.draught_solver+' algorithm')
+        if self.draught_solver=='dichotomy':
+            draughts=[]
+            while self.draught_range[1]-self.draught_range[0]>precision:
+                draughts.append(self.dichotomy())
+                if step_callback is not None and step_callback(draughts[-1]) is False:
+                    break
+        else:
+            draughts=self.newton(precision,step_callback)
+        self.term.addSuccessMessage('Draught found after '+str(len(draughts))+' iterations : '+str(draughts[-1] if draughts else 0)+' m')
+        return draughts
\ No newline at end of file
@@ -0,0 +1,212 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import queue
+import threading
+from STLModelDisplay import _renderSimulationStep
+from Profiler import *
+from configurations import *
+
+class SimulationStep:
+    """
+    Étape de la simulation figée par le thread de calcul : instantané du modèle (facettes découpées), tirants d'eau
+    jusqu'à cette étape et poussée d'Archimède, qui ne changent plus une fois l'étape envoyée au rendu
+    """
+    def __init__(self,index,snapshot,draughts,archimedes_push,show_draught):
+        self.index=index
+        self.snapshot=snapshot
+        self.draughts=draughts
+        self.archimedes_push=archimedes_push
+        self.show_draught=show_draught
+
+class SimulationPipeline:
+    """
+    Préparation de la simulation en flux : un thread de calcul résout le tirant d'eau et envoie chaque étape figée dans
+    une file bornée, un thread de rendu les rasterise au fur et à mesure et envoie les images dans une seconde file bornée
+    que l'interface vide pour les afficher en direct
+    Seul le thread de calcul déplace le modèle ; quand une file est pleine, le thread qui la remplit attend (la mémoire
+    des étapes en attente reste bornée) ; cancel() arrête les deux threads à l'étape suivante
+    """
+    def __init__(self,stl_model,stl_model_pressure,term,solve_function,dichotomy_precision,show_draught=False,max_facets=None,
+                 stl_model_frames=None,draught_frames=None,processes=FRAME_RENDERING_PROCESSES,queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        :param stl_model: modèle, déplacé uniquement par le thread de calcul une fois le flux démarré
+        :param stl_model_pressure: objet STLModelPressure du modèle
+        :param term: terminal recevant les messages
+        :param solve_function: fonction résolvant le tirant d'eau, appelée avec la fonction à appeler à chaque étape
+        (qui renvoie False si la préparation est annulée) et renvoyant la liste des tirants d'eau successifs
+        :param dichotomy_precision: précision du tirant d'eau affiché
+        :param show_draught: afficher le tirant d'eau sur les images des étapes de la résolution
+        :param max_facets: nombre maximal de facettes recopiées dans chaque instantané (maillage simplifié au delà)
+        :param stl_model_frames: FrameStore recevant les images du graphique 3d, dans l'ordre des étapes
+        :param draught_frames: FrameStore recevant les images du graphique du tirant d'eau
+        :param processes: nombre maximal de processus de rendu (0 pour tous les coeurs, 1 pour un rendu dans le thread de rendu)
+        :param queue_size: nombre maximal d'étapes, et d'images, en attente dans chaque file
+        """
+        self.stl_model=stl_model
+        self.stl_model_pressure=stl_model_pressure
+        self.term=term
+        self.solve_function=solve_function
+        self.dichotomy_precision=dichotomy_precision
+        self.show_draught=show_draught
+        self.max_facets=max_facets
+        self.stl_model_frames=stl_model_frames
+        self.draught_frames=draught_frames
+        self.processes=processes if processes>0 else os.cpu_count()
+
+        self.steps_queue=queue.Queue(queue_size)
+        self.frames_queue=queue.Queue(queue_size)
+        self.cancel_event=threading.Event()
+        self.solver_thread=threading.Thread(target=self._solve,daemon=True)
+        self.renderer_thread=threading.Thread(target=self._render,daemon=True)
+        self.draughts=None # tirants d'eau successifs, connus à la fin de la résolution
+        self.steps_number=0
+        self.rendered_steps_number=0
+        self.failed=False
+
+    def start(self):
+        self.solver_thread.start()
+        self.renderer_thread.start()
+
+    def cancel(self):
+        """
+        Demander l'arrêt du calcul et du rendu, qui s'arrêtent à l'étape en cours
+        """
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def isFinished(self):
+        """
+        :return: True si les deux threads sont terminés et toutes les images rendues ont été lues
+        """
+        return not self.solver_thread.is_alive() and not self.renderer_thread.is_alive() and self.frames_queue.empty()
+
+    def getFrame(self):
+        """
+        Lire sans attendre la prochaine image rendue (à appeler depuis le thread de l'interface)
+        :return: tuple (étape, image du graphique 3d, image du graphique du tirant d'eau), None si aucune n'est prête
+        """
+        try:
+            return self.frames_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _put(self,items_queue,item):
+        """
+        Ajouter un élément à une file en attendant qu'une place se libère, sauf si la préparation est annulée
+        :return: True si l'élément a été ajouté
+        """
+        while not self.cancelled:
+            try:
+                items_queue.put(item,timeout=PIPELINE_POLL_INTERVAL/1000)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self,items_queue):
+        """
+        Retirer un élément d'une file en attendant qu'il arrive, sauf si la préparation est annulée
+        :return: l'élément, None si la préparation est annulée
+        """
+        while not self.cancelled:
+            try:
+                return items_queue.get(timeout=PIPELINE_POLL_INTERVAL/1000)
+            except queue.Empty:
+                pass
+        return None
+
+    def _sendStep(self,draughts,show_draught):
+        """
+        Figer l'état courant du modèle et l'envoyer au thread de rendu
+        :return: True si l'étape a été envoyée, False si la préparation est annulée
+        """
+        with profiler.span('SimulationPipeline.sendStep','pipeline'):
+            archimedes_push=self.stl_model_pressure.calc_Archimedes_push()
+            step=SimulationStep(self.steps_number,self.stl_model.snapshot(self.max_facets),list(draughts),archimedes_push,show_draught)
+        self.steps_number+=1
+        return self._put(self.steps_queue,step)
+
+    def _solve(self):
+        """
+        Thread de calcul : étape initiale, puis une étape par tirant d'eau de la résolution, et None en fin de flux
+        """
+        try:
+            draughts=[-self.stl_model.bottom_ref if self.stl_model.bottom_ref<0 else 0]
+            if self._sendStep(draughts,False):
+                def step_callback(draught):
+                    if self.cancelled:
+                        return False
+                    self.stl_model.setDraught(draught)
+                    draughts.append(draught)
+                    return self._sendStep(draughts,self.show_draught)
+                solution=self.solve_function(step_callback)
+                if not self.cancelled:
+                    self.draughts=solution
+        except Exception as error:
+            self.failed=True
+            self.term.addErrorMessage('Resolution of the draught interrupted : '+repr(error))
+            self.cancel()
+        finally:
+            self._put(self.steps_queue,None)
+
+    def _render(self):
+        """
+        Thread de rendu : rasteriser les étapes dans l'ordre, dans ce thread tant que le rendu suit la résolution, puis
+        réparties sur un groupe de processus si processes>1, en gardant au plus 2 étapes par processus en cours de rendu
+        Le groupe n'est créé que lorsque des étapes attendent leur rendu, avec au plus un processus par étape en attente :
+        démarrer un processus, qui importe matplotlib, coûte plus que le rendu des quelques étapes d'une résolution
+        """
+        executor=None
+        workers_number=0
+        pending=deque()
+        try:
+            while True:
+                step=self._get(self.steps_queue)
+                if step is None:
+                    break
+                task=(step.snapshot,step.draughts,step.show_draught,self.dichotomy_precision)
+                waiting_steps_number=self.steps_queue.qsize()
+                if executor is None and self.processes>1 and waiting_steps_number>0:
+                    workers_number=min(self.processes,waiting_steps_number+1)
+                    # 'spawn' : les processus de rendu ne doivent pas hériter de l'état de Qt du processus principal
+                    executor=ProcessPoolExecutor(workers_number,mp_context=multiprocessing.get_context('spawn'))
+                if executor is None:
+                    if not self._sendFrames(step,_renderSimulationStep(task)):
+                        break
+                    continue
+                pending.append((step,executor.submit(_renderSimulationStep,task)))
+                while pending and (pending[0][1].done() or len(pending)>=2*workers_number):
+                    step,future=pending.popleft()
+                    if not self._sendFrames(step,future.result()):
+                        break
+            while pending and not self.cancelled:
+                step,future=pending.popleft()
+                self._sendFrames(step,future.result())
+        except Exception as error:
+            self.failed=True
+            self.term.addErrorMessage('Rendering of the frames interrupted : '+repr(error))
+            self.cancel()
+        finally:
+            for step,future in pending:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def _sendFrames(self,step,frames):
+        """
+        Conserver les images d'une étape rendue et les envoyer à l'interface
+        :return: True si les images ont été envoyées, False si la préparation est annulée
+        """
+        stl_model_frame,draught_frame=frames
+        if self.stl_model_frames is not None:
+            self.stl_model_frames.append(stl_model_frame)
+        if self.draught_frames is not None:
+            self.draught_frames.append(draught_frame)
+        self.rendered_steps_number+=1
+        profiler.count('frames rendered',2)
+        return self._put(self.frames_queue,(step,stl_model_frame,draught_frame))
@@ -0,0 +1,212 @@
+import numpy as np
+from Profiler import *
+from configurations import *
+
+def hex_to_rgb(color):
+    """
+    :param color: couleur au format '#rrggbb'
+    :return: numpy array des composantes rouge, vert, bleu (0 à 255)
+    """
+    return np.array([int(color[i:i+2],16) for i in (1,3,5)],dtype=np.float32)
+
+def pack_rgba(rgb):
+    """
+    Ranger des couleurs opaques dans des entiers de 32 bits dont les octets en mémoire sont R, G, B, A
+    :param rgb: numpy array (n,3) des composantes (0 à 255)
+    :return: numpy array (n,) de type '<u4'
+    """
+    rgb=np.clip(rgb,0,255).astype(np.uint32)
+    return (rgb[:,0]|(rgb[:,1]<<8)|(rgb[:,2]<<16)|np.uint32(255<<24)).astype('<u4')
+
+class SoftwareRenderer:
+    """
+    Rendu 3d logiciel en numpy, sans matplotlib : les sommets de toutes les facettes sont projetés (projection
+    orthographique) par un seul produit matriciel, les faces arrière retirées d'après leurs normales, puis chaque
+    facette est rasterisée sur les centres de pixels de son rectangle englobant, les facettes étant traitées ensemble
+    par classes de taille ; le z-buffer est résolu par un tri des fragments codés en entiers (pixel, profondeur,
+    facette) et chaque facette a une couleur unique éclairée d'après sa normale (ombrage plat)
+    L'image est un tampon RGBA (largeur, hauteur, octets) utilisable directement par un QImage
+    """
+    def __init__(self,width,height):
+        """
+        :param width: largeur de l'image en pixels
+        :param height: hauteur de l'image en pixels
+        """
+        self.width=width
+        self.height=height
+        self.background=pack_rgba(hex_to_rgb(SOFTWARE_RENDER_BACKGROUND_COLOR)[np.newaxis])[0]
+        self.centre=np.zeros(3,dtype=np.float32)
+        self.scale=1.0
+        self.setMesh([])
+
+    def setScene(self,centre,radius):
+        """
+        Cadrer la vue : le point centre est au milieu de l'image et une sphère de rayon radius autour de lui tient dans
+        l'image quelle que soit l'orientation, pour que l'échelle ne change pas en tournant autour du modèle
+        :param centre: coordonnées du point visé
+        :param radius: rayon de la sphère à faire tenir dans l'image
+        """
+        self.centre=np.asarray(centre,dtype=np.float32)
+        self.scale=SOFTWARE_RENDER_FILL_RATIO*min(self.width,self.height)/2/(radius if radius>0 else 1)
+
+    @profiled('SoftwareRenderer.setMesh','display')
+    def setMesh(self,facets_groups):
+        """
+        Définir les facettes à afficher, conservées d'une image à l'autre tant que le modèle ne bouge pas
+        :param facets_groups: liste de triplets (numpy array (n,3,3) des facettes, numpy array (n,3) de leurs normales,
+        couleur '#rrggbb')
+        """
+        facets_groups=[(facets,normal,color) for facets,normal,color in facets_groups if len(facets)>0]
+        if not facets_groups:
+            self.vertex=np.empty((3,3,0),dtype=np.float32)
+            self.facet_normal=np.empty((0,3),dtype=np.float32)
+            self.colors=np.empty((0,3),dtype=np.float32)
+            return
+        # rangement par coordonnée puis par sommet (3,3,n) : chaque coordonnée projetée d'un même sommet des facettes est contiguë
+        self.vertex=np.ascontiguousarray(np.concatenate([facets for facets,normal,color in facets_groups]).astype(np.float32,copy=False).transpose(2,1,0))
+        normal=np.concatenate([normal for facets,normal,color in facets_groups]).astype(np.float32,copy=False)
+        norms=np.linalg.norm(normal,axis=1)
+        self.facet_normal=normal/np.where(norms>0,norms,1)[:,np.newaxis]
+        self.colors=np.concatenate([np.broadcast_to(hex_to_rgb(color),(len(facets),3)) for facets,normal,color in facets_groups])
+
+    @staticmethod
+    def getViewBasis(elev,azim):
+        """
+        :param elev: élévation du point de vue en degrés
+        :param azim: azimut du point de vue en degrés (mêmes conventions que matplotlib)
+        :return: numpy array (3,3) dont les lignes sont la droite de l'écran, le haut de l'écran et la direction vers
+        l'observateur
+        """
+        elev,azim=np.radians(elev),np.radians(azim)
+        return np.array([[-np.sin(azim),np.cos(azim),0],
+                         [-np.sin(elev)*np.cos(azim),-np.sin(elev)*np.sin(azim),np.cos(elev)],
+                         [np.cos(elev)*np.cos(azim),np.cos(elev)*np.sin(azim),np.sin(elev)]],dtype=np.float32)
+
+    @profiled('SoftwareRenderer.render','display')
+    def render(self,elev,azim,segments=()):
+        """
+        Rasteriser les facettes vues depuis un point de vue
+        :param elev: élévation du point de vue en degrés
+        :param azim: azimut du point de vue en degrés
+        :param segments: liste de couples (numpy array (2,3) des extrémités, couleur '#rrggbb') tracés par dessus les facettes
+        :return: image sous forme de tuple (largeur, hauteur, octets RGBA)
+        """
+        basis=self.getViewBasis(elev,azim)
+        image=np.full(self.width*self.height,self.background,dtype='<u4')
+        visible=np.flatnonzero(self.facet_normal.dot(basis[2])>=0) if SOFTWARE_RENDER_BACKFACE_CULLING else np.arange(len(self.facet_normal))
+        if len(visible)>0:
+            x,y,z=self.project(self.vertex[:,:,visible].reshape(3,-1),basis).reshape(3,3,-1)
+            pixels,depths,facets=self.rasterize(x,y,z)
+            if len(pixels)>0:
+                pixels,facets=self.resolveDepth(pixels,depths,facets,len(visible))
+                facets=visible[facets]
+                # lumière venant de l'observateur, un peu au dessus et à gauche
+                light=basis[2]+0.5*basis[1]-0.3*basis[0]
+                light/=np.linalg.norm(light)
+                intensity=SOFTWARE_RENDER_AMBIENT+(1-SOFTWARE_RENDER_AMBIENT)*np.abs(self.facet_normal[facets].dot(light))
+                image[pixels]=pack_rgba(self.colors[facets]*intensity[:,np.newaxis])
+        for segment,color in segments:
+            self.drawSegment(image,self.project(np.asarray(segment,dtype=np.float32).T,basis).T,color)
+        return (self.width,self.height,image.tobytes())
+
+    def project(self,points,basis):
+        """
+        :param points: numpy array (3,n) des coordonnées de n points
+        :param basis: base de la vue (getViewBasis)
+        :return: numpy array (3,n) des abscisses et ordonnées en pixels et des profondeurs (plus grandes vers l'observateur)
+        """
+        matrix=basis*np.array([[self.scale],[-self.scale],[self.scale]],dtype=np.float32)
+        offset=np.array([self.width/2,self.height/2,0],dtype=np.float32)-matrix.dot(self.centre)
+        return matrix.dot(points)+offset[:,np.newaxis]
+
+    def rasterize(self,x,y,z):
+        """
+        Trouver les centres de pixels couverts par chaque facette projetée, par classes de facettes dont le rectangle
+        englobant fait au plus 1, 2, 4, 8... pixels de côté : chaque classe est testée d'un coup sur une grille de
+        pixels de cette taille par facette
+        :param x: numpy array (3,n) des abscisses projetées des 3 sommets des facettes
+        :param y: numpy array (3,n) des ordonnées projetées
+        :param z: numpy array (3,n) des profondeurs
+        :return: numpy arrays des indices des pixels, des profondeurs et des numéros des facettes de chaque fragment
+        """
+        # centres de pixels i+0.5 compris dans le rectangle englobant, limités à l'image
+        first_column=np.maximum(np.ceil(np.minimum(np.minimum(x[0],x[1]),x[2])-0.5),0).astype(np.int32)
+        last_column=np.minimum(np.floor(np.maximum(np.maximum(x[0],x[1]),x[2])-0.5),self.width-1).astype(np.int32)
+        first_row=np.maximum(np.ceil(np.minimum(np.minimum(y[0],y[1]),y[2])-0.5),0).astype(np.int32)
+        last_row=np.minimum(np.floor(np.maximum(np.maximum(y[0],y[1]),y[2])-0.5),self.height-1).astype(np.int32)
+        size=np.maximum(last_column-first_column,last_row-first_row)+1
+        pixels,depths,facets=[],[],[]
+        class_size=1
+        candidates=(last_column>=first_column)&(last_row>=first_row)
+        while candidates.any():
+            in_class=np.flatnonzero(candidates&(size<=class_size))
+            if len(in_class)>0:
+                offsets=np.arange(class_size,dtype=np.int32)
+                columns=(first_column[in_class,np.newaxis]+np.tile(offsets,class_size)).ravel()
+                rows=(first_row[in_class,np.newaxis]+np.repeat(offsets,class_size)).ravel()
+                facets_indices=np.repeat(in_class,class_size*class_size)
+                if class_size>1:
+                    inside_box=(columns<=last_column[facets_indices])&(rows<=last_row[facets_indices])
+                    columns,rows,facets_indices=columns[inside_box],rows[inside_box],facets_indices[inside_box]
+                fragments=self.coverFragments(x[:,facets_indices],y[:,facets_indices],z[:,facets_indices],columns+0.5,rows+0.5)
+                pixels.append(rows[fragments[0]]*self.width+columns[fragments[0]])
+                depths.append(fragments[1])
+                facets.append(facets_indices[fragments[0]])
+            candidates&=size>class_size
+            class_size*=2
+        if not pixels:
+            return np.empty(0,dtype=np.int64),np.empty(0,dtype=np.float32),np.empty(0,dtype=np.int64)
+        return np.concatenate(pixels),np.concatenate(depths),np.concatenate(facets)
+
+    @staticmethod
+    def coverFragments(x,y,z,px,py):
+        """
+        Tester si des points sont dans des triangles (fonctions d'arête de même signe, quel que soit le sens de
+        parcours du triangle) et interpoler la profondeur en ces points
+        :param x: numpy array (3,n) des abscisses des sommets
+        :param y: numpy array (3,n) des ordonnées des sommets
+        :param z: numpy array (3,n) des profondeurs des sommets
+        :param px: numpy array (n,) des abscisses des points
+        :param py: numpy array (n,) des ordonnées des points
+        :return: indices des points couverts, profondeurs en ces points
+        """
+        x0,x1,x2=x
+        y0,y1,y2=y
+        w0=(x2-x1)*(py-y1)-(y2-y1)*(px-x1)
+        w1=(x0-x2)*(py-y2)-(y0-y2)*(px-x2)
+        w2=(x1-x0)*(py-y0)-(y1-y0)*(px-x0)
+        area=w0+w1+w2
+        inside=np.flatnonzero(((w0>=0)&(w1>=0)&(w2>=0)|(w0<=0)&(w1<=0)&(w2<=0))&(area!=0))
+        w0,w1,w2=w0[inside],w1[inside],w2[inside]
+        return inside,(w0*z[0,inside]+w1*z[1,inside]+w2*z[2,inside])/area[inside]
+
+    def resolveDepth(self,pixels,depths,facets,facets_number):
+        """
+        Garder pour chaque pixel le fragment le plus proche de l'observateur : un seul tri d'entiers de 64 bits
+        (pixel, profondeur quantifiée inversée, facette) range les fragments de chaque pixel du plus proche au plus lointain
+        :return: numpy arrays des pixels couverts et des facettes visibles en ces pixels
+        """
+        facet_bits=max(int(facets_number).bit_length(),1)
+        pixel_bits=int(self.width*self.height).bit_length()
+        depth_bits=min(63-facet_bits-pixel_bits,24)
+        lowest,highest=depths.min(),depths.max()
+        quantized=((highest-depths)*((2**depth_bits-1)/(highest-lowest if highest>lowest else 1))).astype(np.int64)
+        keys=(pixels.astype(np.int64)<<(depth_bits+facet_bits))|(quantized<<facet_bits)|facets.astype(np.int64)
+        keys.sort()
+        pixels=keys>>(depth_bits+facet_bits)
+        first=np.ones(len(keys),dtype=bool)
+        np.not_equal(pixels[1:],pixels[:-1],out=first[1:])
+        return pixels[first],keys[first]&((1<<facet_bits)-1)
+
+    def drawSegment(self,image,ends,color):
+        """
+        Tracer un segment d'un pixel d'épaisseur, sans test de profondeur
+        :param image: numpy array des pixels de l'image
+        :param ends: numpy array (2,3) des extrémités projetées
+        :param color: couleur '#rrggbb'
+        """
+        length=int(np.ceil(np.abs(ends[1,:2]-ends[0,:2]).max()))+1
+        t=np.linspace(0,1,length,dtype=np.float32)[:,np.newaxis]
+        points=np.floor(ends[0,:2]+t*(ends[1,:2]-ends[0,:2])).astype(np.int64)
+        points=points[(points[:,0]>=0)&(points[:,0]<self.width)&(points[:,1]>=0)&(points[:,1]<self.height)]
+        image[points[:,1]*self.width+points[:,0]]=pack_rgba(hex_to_rgb(color)[np.newaxis])[0]
@@ -1,6 +1,10 @@
 from PySide2.QtWidgets import QWidget, QVBoxLayout, QTextEdit
-from PySide2.QtCore import QCoreApplication
+from PySide2.QtCore import QCoreApplication, QTimer
 from PySide2.QtGui import QTextCursor
+from collections import deque
+import threading
+import time
+from Profiler import *
 from configurations import *
 
 class Terminal(QWidget):
@@ -21,24 +25,76 @@ class Terminal(QWidget):
 
         self.textarea.append('WELCOME IN THE TERMINAL !\nHere you will follow the running process.')
 
-    def _addMessage(self,color,message):
+        self.verbosity=DEFAULT_TERMINAL_VERBOSITY
+        # file des messages en attente d'affichage : deque.append et deque.popleft sont atomiques, n'importe quel thread peut donc y écrire
+        self.messages_queue=deque()
+        self.last_flush_time=time.perf_counter()
+        self.flush_timer=QTimer(self)
+        self.flush_timer.timeout.connect(self.flushMessages)
+        self.flush_timer.start(TERMINAL_REFRESH_INTERVAL)
+
+    def setVerbosity(self,verbosity):
+        """
+        Définir le niveau de détail des messages affichés
+        :param verbosity: TERMINAL_VERBOSITY_ERRORS, TERMINAL_VERBOSITY_PROCESSES ou TERMINAL_VERBOSITY_DETAILS
+        """
+        self.verbosity=verbosity
+
+    def isVerbose(self,verbosity):
+        """
+        Savoir si les messages d'un niveau de détail donné sont affichés, pour éviter de les formater inutilement
+        :param verbosity: niveau de détail du message
+        :return: True si le message serait affiché
+        """
+        return verbosity<=self.verbosity
+
+    def flushMessages(self):
+        """
+        Afficher par lots les messages en attente, en regroupant les messages consécutifs de même couleur
+        Doit être appelée depuis le thread de l'interface graphique
+        """
+        self.last_flush_time=time.perf_counter()
+        if not self.messages_queue:
+            return
+        with profiler.span('Terminal.flushMessages','terminal'):
+            self._flushMessages()
+
+    def _flushMessages(self):
+        color,messages=None,[]
+        while self.messages_queue:
+            message_color,message=self.messages_queue.popleft()
+            if message_color!=color and messages:
+                self.textarea.setTextColor(color)
+                self.textarea.append('\n'.join(messages))
+                messages=[]
+            color=message_color
+            messages.append(message)
+            profiler.count('terminal messages')
         self.textarea.setTextColor(color)
-        self.textarea.append(message)
+        self.textarea.append('\n'.join(messages))
         self.textarea.moveCursor(QTextCursor.EndOfBlock)
-        QCoreApplication.processEvents()
 
+    def _addMessage(self,color,message,verbosity):
+        if verbosity>self.verbosity:
+            return
+        self.messages_queue.append((color,message))
+        # un calcul bloquant le thread graphique empêche le minuteur de se déclencher : l'affichage est alors
+        # rafraîchi ici, sans dépasser la fréquence TERMINAL_REFRESH_INTERVAL
+        if threading.current_thread() is threading.main_thread() and (time.perf_counter()-self.last_flush_time)*1000>=TERMINAL_REFRESH_INTERVAL:
+            self.flushMessages()
+            QCoreApplication.processEvents()
 
     def addErrorMessage(self,error_message):
-        self._addMessage(TERMINAL_ERROR_MESSAGE_COLOR,error_message)
+        self._addMessage(TERMINAL_ERROR_MESSAGE_COLOR,error_message,TERMINAL_VERBOSITY_ERRORS)
 
     def addSuccessMessage(self,success_message):
-        self._addMessage(TERMINAL_SUCCESS_MESSAGE_COLOR,success_message)
+        self._addMessage(TERMINAL_SUCCESS_MESSAGE_COLOR,success_message,TERMINAL_VERBOSITY_PROCESSES)
 
     def addProcessMessage(self,process_message):
-        self._addMessage(TERMINAL_PROCESS_MESSAGE_COLOR,'\n'+process_message)
+        self._addMessage(TERMINAL_PROCESS_MESSAGE_COLOR,'\n'+process_message,TERMINAL_VERBOSITY_PROCESSES)
 
     def addSubProcessMessage(self, sub_process_message):
-        self._addMessage(TERMINAL_PROCESS_MESSAGE_COLOR,'\t'+sub_process_message)
+        self._addMessage(TERMINAL_PROCESS_MESSAGE_COLOR,'\t'+sub_process_message,TERMINAL_VERBOSITY_DETAILS)
 
     def addInformativeMessage(self,informative_message):
-        self._addMessage(TERMINAL_INFORMATIVE_MESSAGE_COLOR,'\n'+informative_message)
\ No newline at end of file
+        self._addMessage(TERMINAL_INFORMATIVE_MESSAGE_COLOR,'\n'+informative_message,TERMINAL_VERBOSITY_DETAILS)
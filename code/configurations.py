@@ -8,11 +8,20 @@ Y_MARGIN=1
 DEPTH_COEFFICIENT=1
 VIEW_ELEV=15
 VIEW_AZIM=-40
+RENDER_BACKEND='matplotlib' # 'matplotlib' (axes gradués) ou 'software' (rendu numpy, assez rapide pour tourner autour du modèle)
+ORBIT_SENSITIVITY=0.5 # degrés de rotation de la vue par pixel de déplacement de la souris sur l'aperçu
+
+### SOFTWARE RENDERING SETTINGS ###
+SOFTWARE_RENDER_BACKGROUND_COLOR='#ffffff'
+SOFTWARE_RENDER_FILL_RATIO=0.9 # part de l'image occupée par la sphère englobant le modèle et son tirant d'eau
+SOFTWARE_RENDER_AMBIENT=0.3 # part de la lumière qui ne dépend pas de l'orientation des facettes
+SOFTWARE_RENDER_BACKFACE_CULLING=True # ne pas rasteriser les facettes dont la normale est opposée à l'observateur
 
 ### COLORS SETTINGS ###
 EMERGED_PART_COLOR='#f1c40f'
 EMERGED_PART_BORDER_COLOR='#d35400'
 DRAUGHT_LINE_COLOR='#d35400'
+GZ_LINE_COLOR='#3498db'
 
 SUBMERGED_PART_COLOR='#3498db'
 SUBMERGED_PART_BORDER_COLOR='#2c3e50'
@@ -23,6 +32,12 @@ TERMINAL_SUCCESS_MESSAGE_COLOR='#2ecc71'
 TERMINAL_PROCESS_MESSAGE_COLOR='#fff'
 TERMINAL_INFORMATIVE_MESSAGE_COLOR='#3498db'
 
+### TERMINAL SETTINGS ###
+TERMINAL_REFRESH_INTERVAL=50 # ms, les messages en attente sont affichés par lots à cette fréquence au maximum
+TERMINAL_VERBOSITY_ERRORS=0
+TERMINAL_VERBOSITY_PROCESSES=1 # messages de succès et d'étapes
+TERMINAL_VERBOSITY_DETAILS=2 # messages de sous-étapes et informatifs
+
 """
 FILE PARAMETERS
 """
@@ -35,18 +50,36 @@ DEFAULT_DRAUGHT_GRAPH_FOLDER='ressources/graphs/default_graphs/default_draught_g
 
 STL_MODEL_GRAPHS_FOLDER='ressources/graphs/STL_model_graphs/'
 DRAUGHT_GRAPHS_FOLDER='ressources/graphs/draught_graphs/'
+GZ_GRAPHS_FOLDER='ressources/graphs/GZ_graphs/'
+HYDROSTATICS_GRAPHS_FOLDER='ressources/graphs/hydrostatics_graphs/'
 
 STL_MODEL_LOADED_VIEW_FOLDER='ressources/graphs/STL_model_loaded_view/'
 
 FRAMES_BASENAME='frame_'
+SPILL_FRAMES_TO_DISK=False # les images de l'animation sont gardées en mémoire, les écrire aussi dans les dossiers ci-dessus
 
 ANIMATIONS_FOLDER='animations/'
 ANIMATION_FOLDER_BASENAME='animation_'
 
+MODEL_CACHE_ENABLED=True # maillages extraits et résultats déjà calculés relus depuis le disque à la réouverture d'un fichier
+MODEL_CACHE_FOLDER='cache/'
+MODEL_CACHE_MAX_SIZE=1024 # Mo, les entrées les moins récemment utilisées sont supprimées au delà
+
 """
 ANIMATION PARAMETERS
 """
 GIF_DELAY_BETWEEN_TWO_FRAMES=10 # ms
+GIF_PALETTE_SEED_COLORS=[SUBMERGED_PART_COLOR,SUBMERGED_PART_BORDER_COLOR,EMERGED_PART_COLOR,EMERGED_PART_BORDER_COLOR,DRAUGHT_LINE_COLOR,GZ_LINE_COLOR] # couleurs toujours présentes dans la palette globale du GIF
+GIF_PALETTE_SEED_SHADES=16 # teintes de chacune de ces couleurs, de la plus sombre à la couleur elle-même
+GIF_PALETTE_SEED_MIXES=8 # proportions du mélange de chaque teinte avec une autre de ces couleurs ou le fond blanc (bords lissés)
+GIF_PALETTE_DARKEST_SHADE=0.3 # teinte la plus sombre, en fraction de la couleur (ombrage des facettes)
+GIF_LOCAL_PALETTE_THRESHOLD=6 # écart moyen (0 à 255) des pixels modifiés à la palette globale au delà duquel une image a sa propre palette
+PLAYBACK_FPS=10 # images par seconde de la lecture de l'animation dans l'interface
+ANIMATION_FORMAT='gif' # 'gif', 'apng' (PNG animé sans perte) ou 'mp4'/'webm' (nécessite le programme ffmpeg)
+FRAME_RENDERING_PROCESSES=0 # nombre maximal de processus de rendu des images, limité au nombre d'étapes en attente (0 pour tous les coeurs, 1 pour un rendu sans processus)
+PIPELINE_QUEUE_SIZE=8 # étapes figées en attente de rendu, et images en attente d'affichage, au plus pendant la préparation
+PIPELINE_POLL_INTERVAL=50 # ms, fréquence à laquelle un thread en attente d'une file vérifie si la préparation est annulée
+PIPELINE_DISPLAY_INTERVAL=50 # ms, intervalle minimal entre deux images affichées en direct pendant la préparation
 
 """
 CONSTANTS
@@ -61,8 +94,52 @@ DEFAULT CALCULOUS PARAMETERS
 DEFAULT_OBJECT_MASS=1000.0
 DEFAULT_DICHOTOMY_PRECISION=1e-3
 DEFAULT_FLUID_DENSITY=FRESHWATER_DENSITY
+DRAUGHT_SOLVERS=['newton','dichotomy'] # 'dichotomy' : méthode de référence déplaçant le modèle à chaque étape
+DEFAULT_DRAUGHT_SOLVER='newton'
+EQUILIBRIUM_PRECISION=1e-6 # résidus rapportés au poids (force) et au poids fois la hauteur du modèle (moments)
+EQUILIBRIUM_MAX_ITERATIONS=30
+EQUILIBRIUM_MAX_ANGLE_STEP=10 # degrés, rotation maximale à chaque itération
+GZ_CURVE_MAX_HEEL=90 # degrés
+GZ_CURVE_HEEL_STEP=1 # degrés
+GZ_CURVE_PROCESSES=0 # nombre de processus se partageant les gîtes (0 pour tous les coeurs, 1 pour un calcul sans processus)
+HYDROSTATICS_LEVELS=50 # nombre de tirants d'eau du tableau hydrostatique, régulièrement espacés jusqu'à la hauteur du modèle
+
+"""
+PROFILING PARAMETERS
+"""
+PROFILING_ENABLED=False # mesurer les étapes de la simulation, exporter la trace et en afficher le résumé en fin de calcul
+PROFILING_TRACK_MEMORY=True # suivre aussi le pic de mémoire allouée (tracemalloc, ralentit les allocations)
+PROFILING_DEFAULT_CATEGORY='simulation'
+PROFILING_TRACES_FOLDER='traces/'
+
+"""
+BENCHMARK PARAMETERS
+"""
+BENCHMARK_MESHES_FOLDER='benchmarks/meshes/' # maillages générés, réutilisés d'une exécution à l'autre
+BENCHMARK_RESULTS_FILE='benchmarks/results.jsonl' # une ligne JSON par exécution, pour comparer les commits
+BENCHMARK_SIZES=[1000,10000,100000,1000000] # nombres de facettes visés (jusqu'à 10M en ligne de commande)
+BENCHMARK_DRAUGHT_RATIO=0.4 # tirant d'eau des mesures, en fraction de la hauteur de la coque
+BENCHMARK_RENDER_MAX_FACETS=100000 # au delà, le rendu matplotlib n'est pas mesuré
+BENCHMARK_REGRESSION_THRESHOLD=0.2 # ralentissement relatif signalé lors d'une comparaison
+
+"""
+MESH PARAMETERS
+"""
+INDEXED_MESH=True # fusionner les sommets communs aux facettes : table de sommets uniques et indices des triangles
+INDEXED_MESH_DTYPE='float64' # 'float32' divise encore par 2 la mémoire de la table de sommets, au prix de la précision
+
+"""
+LEVEL OF DETAIL PARAMETERS
+"""
+LOD_ENABLED=True # afficher des maillages simplifiés au delà d'un nombre de facettes, les calculs utilisant le maillage complet
+LOD_PIXELS_PER_FACET=16 # nombre de facettes affichées au plus : pixels des figures (640x480 par défaut) / ce nombre
+LOD_REDUCTION_FACTOR=4 # rapport du nombre de facettes entre deux niveaux de détail successifs
+LOD_MIN_FACETS=1000 # niveau de détail le plus simple
+LOD_CLUSTERING_ITERATIONS=6 # essais d'ajustement de la grille de regroupement des sommets pour chaque niveau
+LOD_TARGET_TOLERANCE=0.7 # un niveau est accepté dès qu'il a entre cette fraction et la totalité des facettes visées
 
 """
 DEFAULT DISPLAY PARAMETERS
 """
-DEFAULT_SHOW_DRAUGHT=False
\ No newline at end of file
+DEFAULT_SHOW_DRAUGHT=False
+DEFAULT_TERMINAL_VERBOSITY=TERMINAL_VERBOSITY_DETAILS
\ No newline at end of file
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from AnimationWriter import *
+from configurations import *
+
+COLOR_TOLERANCE=8 # écart maximal (0 à 255) d'une couleur après la réduction à 255 couleurs
+
+def make_frame(pixels):
+    """
+    :param pixels: numpy array (hauteur, largeur, 3) des couleurs
+    :return: image en mémoire (largeur, hauteur, octets RGBA)
+    """
+    height,width=pixels.shape[:2]
+    rgba=np.concatenate([pixels,np.full((height,width,1),255,dtype=np.uint8)],axis=2)
+    return (width,height,rgba.tobytes())
+
+def hex_color(color):
+    return np.array([int(color[i:i+2],16) for i in (1,3,5)],dtype=np.uint8)
+
+def write_and_read_gif(frames):
+    """
+    Encoder des images avec GIFStreamWriter puis les relire avec Pillow
+    :return: liste des images relues, numpy arrays (hauteur, largeur, 3)
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        path=os.path.join(folder,'animation.gif')
+        writer=GIFStreamWriter(path,GIF_DELAY_BETWEEN_TWO_FRAMES)
+        for pixels in frames:
+            writer.addFrame(make_frame(pixels))
+        writer.close()
+        decoded=[]
+        with Image.open(path) as image:
+            for i in range(image.n_frames):
+                image.seek(i)
+                decoded.append(np.array(image.convert('RGB')))
+    return decoded
+
+def first_frame():
+    """
+    Première image d'une simulation : fond blanc et partie emergée seulement, sans la couleur de la partie immergée
+    """
+    pixels=np.full((60,80,3),255,dtype=np.uint8)
+    pixels[10:50,20:60]=hex_color(EMERGED_PART_COLOR)
+    return pixels
+
+def test_configured_color_introduced_after_first_frame():
+    frames=[first_frame(),first_frame()]
+    frames[1][30:50,20:60]=hex_color(SUBMERGED_PART_COLOR)
+    decoded=write_and_read_gif(frames)
+    assert len(decoded)==2
+    assert np.abs(decoded[1][30:50,20:60].astype(int)-hex_color(SUBMERGED_PART_COLOR)).max()<=COLOR_TOLERANCE
+    assert np.array_equal(decoded[1][10:30],decoded[0][10:30])
+
+def test_unknown_colors_introduced_after_first_frame():
+    frames=[first_frame() for i in range(3)]
+    # dégradé de couleurs absentes de la palette globale
+    gradient=np.stack(np.meshgrid(np.linspace(40,200,40),np.linspace(90,160,20)),axis=2)
+    frames[1][30:50,20:60]=np.concatenate([gradient,np.full((20,40,1),120)],axis=2).astype(np.uint8)
+    frames[2][30:50,20:60]=(120,60,180)
+    decoded=write_and_read_gif(frames)
+    assert np.abs(decoded[1].astype(int)-frames[1]).mean()<2
+    assert np.abs(decoded[2][30:50,20:60].astype(int)-(120,60,180)).max()<=COLOR_TOLERANCE
+    assert np.abs(decoded[2].astype(int)-frames[2]).mean()<2
+
+def test_unchanged_frame_keeps_displayed_image():
+    frames=[first_frame(),first_frame()]
+    decoded=write_and_read_gif(frames)
+    assert np.array_equal(decoded[0],decoded[1])
+
+def simulation_frames():
+    """
+    Images d'une simulation : coque qui s'enfonce sous le trait du tirant d'eau, dégradé sur deux images, image répétée
+    """
+    frames=[]
+    for i in range(8):
+        pixels=np.full((60,80,3),255,dtype=np.uint8)
+        top=5+4*i
+        pixels[top:top+30,20:60]=hex_color(EMERGED_PART_COLOR)
+        pixels[max(top,35):top+30,20:60]=hex_color(SUBMERGED_PART_COLOR)
+        pixels[35,:]=hex_color(DRAUGHT_LINE_COLOR)
+        if i in (3,4):
+            pixels[45:55,5:75]=np.linspace(0,255,70)[np.newaxis,:,np.newaxis].astype(np.uint8)
+        if i==5:
+            pixels=frames[-1].copy()
+        frames.append(pixels)
+    return frames
+
+def test_multiple_frames_round_trip():
+    frames=simulation_frames()
+    decoded=write_and_read_gif(frames)
+    assert len(decoded)==len(frames)
+    for pixels,decoded_pixels in zip(frames,decoded):
+        errors=np.abs(decoded_pixels.astype(int)-pixels)
+        assert errors.mean()<2
+        assert errors[:45].max()<=COLOR_TOLERANCE
+        assert errors[55:].max()<=COLOR_TOLERANCE
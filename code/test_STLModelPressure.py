@@ -0,0 +1,43 @@
+import os
+import tempfile
+import pytest
+from Batch import BatchTerminal
+from HullGenerator import *
+from STLModel import *
+from STLModelPressure import *
+from configurations import *
+
+RERUN_MASSES=[200,250,260,261,200,120,261,380,120] # kg, sphere de rayon 0.5 m (523 kg immergée dans l'eau douce)
+
+@pytest.fixture(scope='module')
+def sphere_model():
+    with tempfile.TemporaryDirectory() as folder:
+        path=os.path.join(folder,'sphere.stl')
+        generate_sphere(20000).writeSTL(path,'binary')
+        yield STLModel(path,BatchTerminal())
+
+def solve(stl_model_pressure,mass,precision=DEFAULT_DICHOTOMY_PRECISION):
+    """
+    Résoudre le tirant d'eau pour une masse avec la méthode de Newton
+    :return: nombre de volumes calculés (ceux déjà mémorisés ne comptent pas), tirant d'eau trouvé
+    """
+    stl_model_pressure.stl_model.setMass(mass)
+    stl_model_pressure.reset_draught_range()
+    samples_number=len(stl_model_pressure.volume_samples)
+    draughts=stl_model_pressure.solve_draught(precision)
+    return len(stl_model_pressure.volume_samples)-samples_number,draughts[-1]
+
+def test_rerun_never_needs_more_evaluations_than_cold_solve(sphere_model):
+    stl_model_pressure=STLModelPressure(sphere_model,BatchTerminal())
+    for precision in [DEFAULT_DICHOTOMY_PRECISION,DEFAULT_DICHOTOMY_PRECISION*1e-3]:
+        for mass in RERUN_MASSES:
+            evaluations,draught=solve(stl_model_pressure,mass,precision)
+            cold_evaluations,cold_draught=solve(STLModelPressure(sphere_model,BatchTerminal()),mass,precision)
+            assert evaluations<=cold_evaluations
+            assert abs(draught-cold_draught)<precision
+
+def test_rerun_with_same_mass_reuses_solution(sphere_model):
+    stl_model_pressure=STLModelPressure(sphere_model,BatchTerminal())
+    evaluations,draught=solve(stl_model_pressure,200)
+    assert draught in stl_model_pressure.volume_samples # la solution est calculée et mémorisée
+    assert solve(stl_model_pressure,200)==(0,draught)